@@ -8,6 +8,7 @@ print(f"DEBUG: PORT={os.getenv('PORT', 'NOT SET')}", file=sys.stderr)
 
 from flask import Flask
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
 from services.db import init_db
 from routes.tickets import tickets_bp
@@ -17,12 +18,19 @@ from routes.payments_api import payments_api_bp
 from routes.customers import customers_bp
 from routes.auth import auth_bp
 from routes.alerts import alerts_bp
+from routes.jobs import jobs_bp
+from routes.report_jobs import report_jobs_bp
+from services.background_jobs import resume_stale_jobs
 
 print(f"DEBUG: Config created, SECRET_KEY={Config.SECRET_KEY}", file=sys.stderr)
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
+# Use the client address from X-Forwarded-For behind a proxy (sign-in limits key on it)
+if Config.TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.TRUSTED_PROXIES)
+
 # Enable CORS with allowed origins from config
 CORS(app, resources={
     r"/api/*": {
@@ -44,6 +52,14 @@ app.register_blueprint(payments_api_bp)
 app.register_blueprint(customers_bp)
 app.register_blueprint(auth_bp)
 app.register_blueprint(alerts_bp)
+app.register_blueprint(jobs_bp)
+app.register_blueprint(report_jobs_bp)
+
+# Pick up background jobs interrupted by a restart
+try:
+    resume_stale_jobs()
+except Exception as e:
+    print(f"Could not resume background jobs: {e}", file=sys.stderr)
 
 @app.route('/')
 def health_check():
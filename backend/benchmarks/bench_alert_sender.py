@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the asyncio bulk alert sender.
+
+Starts a local mock Fast2SMS gateway in a separate process that answers each
+request after a simulated gateway latency, then sends N messages:
+
+- from a thread pool calling send_sms_via_fast2sms (pooled requests session)
+- from an event loop calling send_sms_via_fast2sms_async on one aiohttp session,
+  with a semaphore bounding the messages in flight
+
+It also times writing the alert_messages log for N messages one document().set()
+at a time versus one batch per CHUNK_SIZE messages, on the local database.
+
+Usage: python benchmarks/bench_alert_sender.py [messages] [latency_ms]
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PORT = 8766
+os.environ['FAST2SMS_API_URL'] = f'http://127.0.0.1:{PORT}/dev/bulkV2'
+os.environ['FAST2SMS_API_KEY'] = 'benchmark'
+os.environ['ENVIRONMENT'] = 'development'
+# The local database writes its JSON files under the working directory
+os.chdir(tempfile.mkdtemp())
+
+from services.db import ChunkedBatch
+from services.local_db import local_db
+from services.messaging import async_http_session
+from services.alert_queue import CHUNK_SIZE
+from routes.alerts import send_sms_via_fast2sms, send_sms_via_fast2sms_async
+
+class MockGateway(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    latency = 0.05
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.latency)
+        body = b'{"return": true, "request_id": "mock"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class MockGatewayServer(ThreadingHTTPServer):
+    request_queue_size = 512
+    daemon_threads = True
+
+def serve(latency):
+    MockGateway.latency = latency
+    MockGatewayServer(('127.0.0.1', PORT), MockGateway).serve_forever()
+
+def thread_pool(count, concurrency):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda index: send_sms_via_fast2sms('9876543210', f'Reminder {index}'), range(count)))
+    return sum(1 for result in results if result)
+
+async def event_loop(count, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    session = async_http_session(concurrency)
+
+    async def send(index):
+        async with semaphore:
+            return await send_sms_via_fast2sms_async(session, '9876543210', f'Reminder {index}')
+
+    try:
+        results = await asyncio.gather(*(send(index) for index in range(count)))
+    finally:
+        await session.close()
+    return sum(1 for result in results if result)
+
+def measure(name, run, count):
+    wall, cpu = time.perf_counter(), time.process_time()
+    sent = run()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    print(f"{name:<32} {sent:6d} sent  {count / wall:8.0f} msg/s  {cpu / count * 1000:6.2f} ms cpu/msg")
+
+def log_entry(index):
+    return {'customerId': f'c{index}', 'phoneNumber': '+919876543210', 'method': 'sms',
+            'message': f'Reminder {index}', 'timestamp': '2026-01-01T10:00:00', 'status': 'sent'}
+
+def log_per_message(db, count):
+    for index in range(count):
+        db.collection('alert_messages').document().set(log_entry(index))
+
+def log_per_chunk(db, count):
+    for start in range(0, count, CHUNK_SIZE):
+        writer = ChunkedBatch(db)
+        for index in range(start, min(start + CHUNK_SIZE, count)):
+            writer.set(db.collection('alert_messages').document(), log_entry(index))
+        writer.commit()
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 50
+    server = multiprocessing.Process(target=serve, args=(latency_ms / 1000,), daemon=True)
+    server.start()
+    time.sleep(0.5)
+    try:
+        print(f"{count} messages, mock gateway latency {latency_ms:g} ms")
+        for concurrency in (20, 100):
+            measure(f'thread pool ({concurrency} threads)', lambda: thread_pool(count, concurrency), count)
+            measure(f'asyncio (semaphore {concurrency})', lambda: asyncio.run(event_loop(count, concurrency)), count)
+    finally:
+        server.terminate()
+
+    log_count = min(count, 1000)
+    db = local_db
+    print(f"\nalert_messages log for {log_count} messages (local database)")
+    for name, write in (('document().set() per message', log_per_message), (f'one batch per {CHUNK_SIZE}', log_per_chunk)):
+        started = time.perf_counter()
+        write(db, log_count)
+        print(f"{name:<32} {(time.perf_counter() - started) * 1000:8.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark for API latency under concurrent logins.
+
+Starts the app on a threaded local server in a separate process, once hashing
+passwords on the request threads (PASSWORD_HASH_WORKERS=0) and once on the bounded
+hashing pool. While `logins` clients sign in back to back for `seconds` (waiting
+Retry-After when rejected), a probe requests the health check every 20 ms.
+Reports the probe latency, completed logins and 429 rejections, then times a
+burst of failed logins for one username from one client.
+
+Usage: python benchmarks/bench_login.py [logins] [seconds]
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+PORT = 8767
+BASE_URL = f'http://127.0.0.1:{PORT}'
+PROBE_INTERVAL = 0.02
+
+SERVER = f'''
+import sys
+sys.path.insert(0, {BACKEND_DIR!r})
+from werkzeug.serving import make_server
+from app import app
+make_server('127.0.0.1', {PORT}, app, threaded=True).serve_forever()
+'''
+
+def seed_users(count):
+    """Write `count` users with known passwords to the local database."""
+    from routes.auth import hash_password
+    from services.local_db import local_db
+
+    password_hash = hash_password('benchmark')
+    for index in range(count):
+        local_db.collection('users').document(f'user{index}').set({
+            'username': f'user{index}', 'password_hash': password_hash, 'name': f'User {index}',
+            'email': '', 'role': 'user', 'isActive': True
+        })
+
+def start_server(hash_workers):
+    env = {**os.environ, 'ENVIRONMENT': 'development', 'PASSWORD_HASH_WORKERS': str(hash_workers)}
+    server = subprocess.Popen([sys.executable, '-c', SERVER], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    import requests
+    for _ in range(100):
+        try:
+            requests.get(BASE_URL, timeout=1)
+            return server
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError('Server did not start')
+
+def run_load(logins, seconds):
+    import requests
+
+    stop = threading.Event()
+    statuses = []
+    probe_latencies = []
+
+    def sign_in(index):
+        session = requests.Session()
+        while not stop.is_set():
+            response = session.post(f'{BASE_URL}/api/auth/login',
+                                    json={'username': f'user{index}', 'password': 'benchmark'})
+            statuses.append(response.status_code)
+            if response.status_code == 429:
+                stop.wait(float(response.headers.get('Retry-After', 1)))
+
+    def probe():
+        session = requests.Session()
+        while not stop.is_set():
+            started = time.perf_counter()
+            session.get(BASE_URL)
+            probe_latencies.append((time.perf_counter() - started) * 1000)
+            time.sleep(PROBE_INTERVAL)
+
+    threads = [threading.Thread(target=sign_in, args=(index,)) for index in range(logins)]
+    threads.append(threading.Thread(target=probe))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return statuses, probe_latencies
+
+def failed_burst(attempts):
+    """Time `attempts` wrong-password logins for one username from one client."""
+    import requests
+
+    session = requests.Session()
+    statuses = []
+    started = time.perf_counter()
+    for _ in range(attempts):
+        statuses.append(session.post(f'{BASE_URL}/api/auth/login',
+                                     json={'username': 'user0', 'password': 'wrong'}).status_code)
+    return statuses, (time.perf_counter() - started) * 1000
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    # The local database and the server share this working directory
+    os.environ['ENVIRONMENT'] = 'development'
+    os.chdir(tempfile.mkdtemp())
+    seed_users(logins)
+
+    print(f"{logins} concurrent logins for {seconds:g}s, {os.cpu_count()} CPUs, health check probed every {PROBE_INTERVAL * 1000:g} ms")
+    for name, hash_workers in (('request threads', 0), ('hashing pool', max(1, (os.cpu_count() or 2) // 2))):
+        server = start_server(hash_workers)
+        try:
+            statuses, latencies = run_load(logins, seconds)
+            burst, burst_ms = failed_burst(50)
+        finally:
+            server.terminate()
+            server.wait()
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(f"{name:<16} health p50 {quantiles[49]:7.1f} ms  p95 {quantiles[94]:7.1f} ms  max {max(latencies):7.1f} ms  "
+              f"| logins {statuses.count(200) / seconds:6.1f}/s  429 {statuses.count(429):5d}  "
+              f"| 50 failed logins {burst_ms:7.0f} ms ({burst.count(429)} rejected early)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the pooled gateway session in services.messaging.
+
+Starts a local fake Fast2SMS server in a separate process and sends N messages
+with a new connection per message (requests.post, as before) and through the
+shared keep-alive session, sequentially and from a small thread pool. Reports
+wall time and client CPU time per message.
+
+With --tls the fake server uses a throwaway self-signed certificate (made with
+the openssl CLI), which is closer to the real HTTPS gateways: every new
+connection then also pays for a TLS handshake.
+
+Usage: python benchmarks/bench_messaging.py [messages] [--tls]
+"""
+import os
+import ssl
+import sys
+import time
+import subprocess
+import tempfile
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PORT = 8765
+TLS = '--tls' in sys.argv
+CA_BUNDLE = None
+os.environ['FAST2SMS_API_URL'] = f"{'https' if TLS else 'http'}://127.0.0.1:{PORT}/dev/bulkV2"
+
+import requests
+from services import messaging
+
+class FakeGateway(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = b'{"return": true, "request_id": "fake"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def make_certificate(directory):
+    cert, key = os.path.join(directory, 'cert.pem'), os.path.join(directory, 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                    '-subj', '/CN=127.0.0.1', '-addext', 'subjectAltName=IP:127.0.0.1', '-keyout', key, '-out', cert],
+                   check=True, capture_output=True)
+    return cert, key
+
+def serve(certificate):
+    server = ThreadingHTTPServer(('127.0.0.1', PORT), FakeGateway)
+    if certificate:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*certificate)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+    server.serve_forever()
+
+def per_message_connection(index):
+    requests.post(messaging.FAST2SMS_API_URL, headers={'authorization': 'key'},
+                  data={'variables_values': f'Reminder {index}', 'route': 'otp', 'numbers': '9876543210'},
+                  verify=CA_BUNDLE or True)
+
+def pooled_session(index):
+    messaging.post_fast2sms('key', '9876543210', f'Reminder {index}')
+
+def measure(send, count, threads):
+    wall, cpu = time.perf_counter(), time.process_time()
+    if threads == 1:
+        for index in range(count):
+            send(index)
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(send, range(count)))
+    return time.perf_counter() - wall, time.process_time() - cpu
+
+def main():
+    args = [arg for arg in sys.argv[1:] if arg != '--tls']
+    count = int(args[0]) if args else 1000
+    global CA_BUNDLE
+    certificate = make_certificate(tempfile.mkdtemp()) if TLS else None
+    if TLS:
+        # Trust the throwaway self-signed certificate
+        CA_BUNDLE = certificate[0]
+        messaging.http_session().verify = CA_BUNDLE
+        # Otherwise REQUESTS_CA_BUNDLE from the environment takes precedence
+        messaging.http_session().trust_env = False
+
+    server = multiprocessing.Process(target=serve, args=(certificate,), daemon=True)
+    server.start()
+    time.sleep(0.5)
+    try:
+        pooled_session(0)
+        print(f"{count} messages to a local fake gateway ({'https' if TLS else 'http'})")
+        for threads in (1, 8):
+            baseline = None
+            for name, send in (('connection per message', per_message_connection), ('pooled session', pooled_session)):
+                wall, cpu = measure(send, count, threads)
+                baseline = baseline or wall
+                print(f"{name:<24} threads={threads}  {wall / count * 1000:6.2f} ms/msg wall  "
+                      f"{cpu / count * 1000:6.2f} ms/msg cpu  {baseline / wall:4.1f}x")
+    finally:
+        server.terminate()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Delete expired login sessions in batches.
+
+Usage (from the backend directory, e.g. daily from cron):
+    python cleanup_sessions.py
+"""
+import os
+import sys
+
+# Add the backend directory to the python path to allow imports from services
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from services.db import init_db
+from services.sessions import cleanup_expired_sessions
+
+app = Flask(__name__)
+db = init_db(app)
+
+def main():
+    deleted = cleanup_expired_sessions(db)
+    print(f"Deleted {deleted} expired sessions")
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"Error during session cleanup: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
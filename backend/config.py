@@ -12,6 +12,9 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY') or 'dev-secret-key-v2'
     FIREBASE_CREDENTIALS_PATH = os.getenv('FIREBASE_CREDENTIALS_PATH', 'serviceAccountKey.json')
     
+    # Number of proxies in front of the app whose X-Forwarded-For is trusted (1 on Cloud Run)
+    TRUSTED_PROXIES = int(os.getenv('TRUSTED_PROXIES', '0'))
+    
     # CORS Configuration - Allow GitHub Pages frontend and local development
     CORS_ORIGINS = [
         'https://nitheshkg.github.io',
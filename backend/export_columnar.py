@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Export tickets, payments and customers as Parquet (or Arrow IPC) files.
+
+Usage (from the backend directory):
+    python export_columnar.py                                  # all collections, Parquet, current dir
+    python export_columnar.py payments --format arrow --out exports/
+"""
+import argparse
+import os
+import sys
+import time
+
+# Add the backend directory to the python path to allow imports from services
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from services.db import init_db
+from services.columnar_export import write_collection, EXPORT_COLUMNS, FORMATS
+
+app = Flask(__name__)
+db = init_db(app)
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Export collections as columnar files.')
+    arg_parser.add_argument('collections', nargs='*', help=f"any of {', '.join(EXPORT_COLUMNS)} (defaults to all)")
+    arg_parser.add_argument('--format', choices=list(FORMATS), default='parquet')
+    arg_parser.add_argument('--out', default='.', help='output directory')
+    args = arg_parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    extension = FORMATS[args.format][0]
+    for collection in args.collections or list(EXPORT_COLUMNS):
+        path = os.path.join(args.out, f'{collection}{extension}')
+        started = time.perf_counter()
+        rows = write_collection(db, collection, path, args.format)
+        elapsed = time.perf_counter() - started
+        print(f"{collection}: {rows} rows -> {path} ({os.path.getsize(path)} bytes, {elapsed:.2f}s)")
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"Error during export: {e}")
+        import traceback
+        traceback.print_exc()
@@ -71,10 +71,7 @@ def create_admin_user():
             'email': email,
             'role': 'admin',
             'isActive': True,
-            'createdAt': datetime.now().isoformat(),
-            'lastLogin': None,
-            'authToken': None,
-            'tokenExpiry': None
+            'createdAt': datetime.now().isoformat()
         }
         
         users_ref.add(user_data)
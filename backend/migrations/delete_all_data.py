@@ -5,6 +5,7 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from services.db import init_db
+from services.data_versions import bump_data_versions
 from flask import Flask
 
 app = Flask(__name__)
@@ -46,7 +47,7 @@ def delete_all_data():
     Delete all data from specific collections.
     """
     # Collections to wipe
-    collections_to_wipe = ['customers', 'tickets', 'payments', 'alert_messages']
+    collections_to_wipe = ['customers', 'customer_keys', 'tickets', 'payments', 'rollups', 'overdue', 'overdue_runs', 'alert_messages', 'alert_message_stats', 'alert_queue', 'jobs']
     
     print("WARNING: This script will PERMANENTLY DELETE all data from the following collections:")
     for col in collections_to_wipe:
@@ -74,6 +75,9 @@ def delete_all_data():
         print(f"Done. Removed {deleted_count} documents from '{collection_name}'.")
         total_deleted_docs += deleted_count
 
+    # Versions are bumped rather than wiped so report caches cannot match an old version again
+    bump_data_versions(None, db, 'customers', 'tickets', 'payments')
+
     print("-" * 50)
     print(f"Data reset complete. Total documents deleted: {total_deleted_docs}")
 
@@ -0,0 +1,64 @@
+"""
+Migration script to build the alert_message_stats count summaries from the
+existing alert_messages log.
+
+New messages keep the summaries current as they are written; run this once for
+messages logged before the summaries existed, or to repair them.
+
+Usage (from the backend directory):
+    python migrations/migrate_alert_message_stats.py
+"""
+import sys
+import os
+from collections import Counter, defaultdict
+
+# Add the backend directory to the python path to allow imports from services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.db import init_db, ChunkedBatch
+from services.alert_messages import ALERT_MESSAGES_COLLECTION, ALERT_STATS_COLLECTION, all_messages_shard, message_counters
+from flask import Flask
+
+app = Flask(__name__)
+
+# Initialize Firebase
+init_app = init_db(app)
+db = init_app
+
+def migrate_alert_message_stats():
+    """
+    Recount every message and overwrite the summary documents. The whole-log
+    counts go to the first shard; the other shards and the old unsharded
+    document are deleted.
+    """
+    print("Starting migration to build alert message stats...")
+
+    counts = defaultdict(Counter)
+    message_count = 0
+    for doc in db.collection(ALERT_MESSAGES_COLLECTION).stream():
+        message = doc.to_dict()
+        message_count += 1
+        for counter in message_counters(message):
+            counts[all_messages_shard(0)][counter] += 1
+            if message.get('customerId'):
+                counts[message['customerId']][counter] += 1
+
+    print(f"Found {message_count} messages for {len(counts) - 1 if counts else 0} customers")
+
+    writer = ChunkedBatch(db)
+    for doc in db.collection(ALERT_STATS_COLLECTION).stream():
+        if doc.id not in counts:
+            writer.delete(db.collection(ALERT_STATS_COLLECTION).document(doc.id))
+    for doc_id, counters in counts.items():
+        writer.set(db.collection(ALERT_STATS_COLLECTION).document(doc_id), dict(counters))
+    writer.commit()
+
+    print(f"\nMigration complete! Wrote {len(counts)} summary documents.")
+
+if __name__ == '__main__':
+    try:
+        migrate_alert_message_stats()
+    except Exception as e:
+        print(f"Error during migration: {e}")
+        import traceback
+        traceback.print_exc()
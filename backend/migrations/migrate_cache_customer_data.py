@@ -1,8 +1,12 @@
 """
 Migration script to cache customer data in ticket documents
 for faster queries.
+
+Customer edits are propagated to tickets and payments by the customer_propagate
+background job (routes/customers.py); this script is only needed for a full backfill.
 """
 from services.db import init_db
+from services.data_versions import bump_data_versions
 from flask import Flask
 
 app = Flask(__name__)
@@ -50,6 +54,9 @@ def migrate_cache_customer_data():
         else:
             print(f"Warning: Customer {customer_id} not found for ticket {ticket_doc.id}")
     
+    if updated_count:
+        bump_data_versions(None, db, 'tickets')
+    
     print(f"\nMigration complete! Updated {updated_count} tickets with cached customer data.")
 
 if __name__ == '__main__':
@@ -0,0 +1,73 @@
+"""
+Migration script to build the customer_keys unique-key index
+for customers created before the index existed.
+
+Customers are processed oldest first, so when legacy data already contains
+duplicates the oldest customer keeps the claim and the rest are reported.
+"""
+import sys
+import os
+
+# Add the backend directory to the python path to allow imports from services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.db import init_db
+from services.customer_keys import KEYS_COLLECTION, customer_key_ids
+from flask import Flask
+
+app = Flask(__name__)
+
+# Initialize Firebase
+init_app = init_db(app)
+db = init_app
+
+def migrate_customer_keys(batch_size=400):
+    """Claim customer_keys documents for every existing customer."""
+    print("Starting migration to build customer unique keys...")
+
+    owners = {doc.id: doc.to_dict().get('customerId') for doc in db.collection(KEYS_COLLECTION).stream()}
+    customers = list(db.collection('customers').stream())
+    customers.sort(key=lambda doc: doc.to_dict().get('createdAt') or '')
+
+    print(f"Found {len(customers)} customers and {len(owners)} existing keys")
+
+    batch = db.batch()
+    pending = 0
+    claimed_count = 0
+    duplicates = []
+
+    for customer_doc in customers:
+        for field, key_id in customer_key_ids(customer_doc.to_dict()).items():
+            owner = owners.get(key_id)
+            if owner == customer_doc.id:
+                continue
+            if owner:
+                duplicates.append((customer_doc.id, key_id, owner))
+                print(f"Duplicate: customer {customer_doc.id} shares {key_id} with customer {owner}")
+                continue
+
+            owners[key_id] = customer_doc.id
+            batch.set(db.collection(KEYS_COLLECTION).document(key_id), {
+                'customerId': customer_doc.id,
+                'field': field
+            })
+            pending += 1
+            claimed_count += 1
+            if pending >= batch_size:
+                batch.commit()
+                batch = db.batch()
+                pending = 0
+
+    if pending:
+        batch.commit()
+
+    print(f"\nMigration complete! Claimed {claimed_count} keys, found {len(duplicates)} duplicates.")
+    return duplicates
+
+if __name__ == '__main__':
+    try:
+        migrate_customer_keys()
+    except Exception as e:
+        print(f"Error during migration: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,57 @@
+"""
+Migration script to backfill the searchTokens array used by
+GET /api/customers/search on existing customer documents.
+"""
+import sys
+import os
+
+# Add the backend directory to the python path to allow imports from services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.db import init_db
+from services.customer_search import build_search_tokens
+from flask import Flask
+
+app = Flask(__name__)
+
+# Initialize Firebase
+init_app = init_db(app)
+db = init_app
+
+def migrate_customer_search_tokens(batch_size=400):
+    """Rebuild searchTokens on every customer whose tokens are missing or stale."""
+    print("Starting migration to build customer search tokens...")
+
+    customers = list(db.collection('customers').stream())
+    print(f"Found {len(customers)} customers")
+
+    batch = db.batch()
+    pending = 0
+    updated_count = 0
+
+    for customer_doc in customers:
+        customer = customer_doc.to_dict()
+        tokens = build_search_tokens(customer)
+        if customer.get('searchTokens') == tokens:
+            continue
+
+        batch.update(db.collection('customers').document(customer_doc.id), {'searchTokens': tokens})
+        pending += 1
+        updated_count += 1
+        if pending >= batch_size:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        batch.commit()
+
+    print(f"\nMigration complete! Updated search tokens on {updated_count} customers.")
+
+if __name__ == '__main__':
+    try:
+        migrate_customer_search_tokens()
+    except Exception as e:
+        print(f"Error during migration: {e}")
+        import traceback
+        traceback.print_exc()
@@ -1,8 +1,29 @@
 """
 Migration script to cache ticket stats in customer documents
 for faster queries.
+
+The stats are maintained incrementally by the ticket, payment and close routes;
+this script verifies them against the tickets and rebuilds any that drifted. Each
+customer is rebuilt in a transaction that reads its tickets, so increments written
+while the script runs are not lost. A full run records `migratedAt` on
+meta/customer_stats, after which GET /api/customers serves the stored stats.
+
+Usage (from the backend directory):
+    python migrations/migrate_customer_stats.py             # rebuild drifted stats
+    python migrations/migrate_customer_stats.py --verify    # report only
 """
-from services.db import init_db
+import sys
+import os
+from datetime import datetime
+
+# Add the backend directory to the python path to allow imports from services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.db import init_db, run_transaction
+from services.data_versions import bump_data_versions
+from services.customer_stats import (
+    EMPTY_CUSTOMER_STATS, compute_customer_stats, rebuild_customer_stats, customer_stats_meta_ref
+)
 from flask import Flask
 
 app = Flask(__name__)
@@ -11,58 +32,48 @@ app = Flask(__name__)
 init_app = init_db(app)
 db = init_app
 
-def migrate_cache_customer_stats():
-    """Add ticket stats to customer documents."""
+TOLERANCE = 0.005
+
+def migrate_cache_customer_stats(verify_only=False):
+    """Verify ticket stats on customer documents and rebuild the ones that drifted."""
     print("Starting migration to cache customer stats...")
-    
-    # Fetch all tickets
-    tickets_ref = db.collection('tickets')
-    all_tickets = list(tickets_ref.stream())
-    
-    print(f"Found {len(all_tickets)} tickets")
-    
-    # Group tickets by customerId
-    tickets_by_customer = {}
-    for ticket_doc in all_tickets:
-        ticket = ticket_doc.to_dict()
-        customer_id = ticket.get('customerId')
-        if customer_id:
-            if customer_id not in tickets_by_customer:
-                tickets_by_customer[customer_id] = []
-            tickets_by_customer[customer_id].append(ticket)
-    
+
+    # Calculate stats per customer in a single pass over the tickets
+    stats_by_customer = compute_customer_stats(db.collection('tickets').stream())
+
     # Fetch all customers
-    customers_ref = db.collection('customers')
-    customers = list(customers_ref.stream())
-    
+    customers = list(db.collection('customers').stream())
+
     print(f"Found {len(customers)} customers")
-    
-    updated_count = 0
-    
+
+    drifted = []
     for customer_doc in customers:
-        customer_id = customer_doc.id
-        customer_tickets = tickets_by_customer.get(customer_id, [])
-        
-        # Calculate stats
-        total_tickets = len(customer_tickets)
-        active_tickets = sum(1 for t in customer_tickets if t.get('status') == 'Active')
-        total_outstanding = sum(t.get('pendingPrincipal', 0) for t in customer_tickets if t.get('status') == 'Active')
-        
-        # Update customer with stats
-        customer_doc.reference.update({
-            'totalTickets': total_tickets,
-            'activeTickets': active_tickets,
-            'totalOutstanding': total_outstanding
-        })
-        
-        print(f"Updated customer {customer_doc.id}: {total_tickets} tickets, {active_tickets} active, ₹{total_outstanding} outstanding")
-        updated_count += 1
-    
-    print(f"\nMigration complete! Updated {updated_count} customers with cached stats.")
+        customer = customer_doc.to_dict()
+        expected = stats_by_customer.get(customer_doc.id, EMPTY_CUSTOMER_STATS)
+
+        if any(abs((customer.get(field) or 0) - value) > TOLERANCE for field, value in expected.items()):
+            drifted.append((customer_doc.id, expected))
+            print(f"Customer {customer_doc.id}: stored {customer.get('totalTickets')} tickets, "
+                  f"{customer.get('activeTickets')} active, ₹{customer.get('totalOutstanding')} outstanding; "
+                  f"expected {expected['totalTickets']}, {expected['activeTickets']}, ₹{expected['totalOutstanding']}")
+
+    if verify_only:
+        print(f"\nVerification complete! {len(drifted)} of {len(customers)} customers have drifted stats.")
+        return drifted
+
+    # The scan only finds candidates; each rebuild re-reads the tickets in a transaction
+    for customer_id, _ in drifted:
+        run_transaction(rebuild_customer_stats, db, customer_id)
+    if drifted:
+        bump_data_versions(None, db, 'customers')
+    customer_stats_meta_ref(db).set({'migratedAt': datetime.now().isoformat()})
+
+    print(f"\nMigration complete! Updated {len(drifted)} of {len(customers)} customers with cached stats.")
+    return drifted
 
 if __name__ == '__main__':
     try:
-        migrate_cache_customer_stats()
+        migrate_cache_customer_stats(verify_only='--verify' in sys.argv)
     except Exception as e:
         print(f"Error during migration: {e}")
         import traceback
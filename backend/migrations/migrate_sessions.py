@@ -0,0 +1,64 @@
+"""
+Migration script to move auth tokens from the users collection to sessions.
+
+Each unexpired authToken on a user document becomes a sessions/{sha256(token)}
+document, so users stay signed in, and the authToken/tokenExpiry fields are
+cleared on the user documents.
+
+Usage (from the backend directory):
+    python migrations/migrate_sessions.py
+"""
+import sys
+import os
+from datetime import datetime
+
+# Add the backend directory to the python path to allow imports from services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.db import init_db, ChunkedBatch
+from services.sessions import session_ref, session_data
+from flask import Flask
+
+app = Flask(__name__)
+
+# Initialize Firebase
+init_app = init_db(app)
+db = init_app
+
+def migrate_sessions():
+    """Create a session for every unexpired user token and clear the token fields."""
+    print("Starting migration to move auth tokens to sessions...")
+
+    now = datetime.now()
+    writer = ChunkedBatch(db)
+    migrated = 0
+    expired = 0
+    for doc in db.collection('users').stream():
+        user = doc.to_dict()
+        if 'authToken' not in user and 'tokenExpiry' not in user:
+            continue
+
+        token = user.get('authToken')
+        try:
+            expires_at = datetime.fromisoformat(user['tokenExpiry']) if user.get('tokenExpiry') else None
+        except ValueError:
+            expires_at = None
+
+        if token and expires_at and expires_at > now:
+            writer.set(session_ref(db, token), session_data(doc.id, user, expires_at, now))
+            migrated += 1
+        elif token:
+            expired += 1
+
+        writer.update(db.collection('users').document(doc.id), {'authToken': None, 'tokenExpiry': None})
+    writer.commit()
+
+    print(f"\nMigration complete! Created {migrated} sessions, dropped {expired} expired tokens.")
+
+if __name__ == '__main__':
+    try:
+        migrate_sessions()
+    except Exception as e:
+        print(f"Error during migration: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,58 @@
+"""
+Rebuild the monthly payment rollups (rollups/monthly_YYYY-MM) from the
+payments collection. Payment routes keep the rollups up to date incrementally;
+run this after deploying the rollups or to repair drift. Each month is rebuilt
+in its own transaction, so payments recorded while the script runs are not lost,
+and `rebuiltAt` is recorded only after every month has been rebuilt.
+"""
+import sys
+import os
+from datetime import datetime
+
+# Add the backend directory to the python path to allow imports from services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.db import init_db, run_transaction
+from services.rollups import ROLLUPS_COLLECTION, month_key, rebuild_monthly_rollup, rollups_meta_ref
+from flask import Flask
+
+app = Flask(__name__)
+
+# Initialize Firebase
+init_app = init_db(app)
+db = init_app
+
+def rebuild_monthly_rollups():
+    """Recompute every monthly rollup that has payments or an existing rollup document."""
+    print("Rebuilding monthly payment rollups...")
+
+    months = set()
+    skipped = 0
+    for payment_doc in db.collection('payments').stream():
+        month = month_key(payment_doc.to_dict().get('date'))
+        if month:
+            months.add(month)
+        else:
+            skipped += 1
+
+    # Months that no longer have payments are reset to zero
+    for rollup_doc in db.collection(ROLLUPS_COLLECTION).where('period', '==', 'monthly').stream():
+        month = rollup_doc.to_dict().get('month')
+        if month:
+            months.add(month)
+
+    for month in sorted(months):
+        run_transaction(rebuild_monthly_rollup, db, month)
+
+    # Reports trust the rollups as totals only once this marker exists
+    rollups_meta_ref(db).set({'rebuiltAt': datetime.now().isoformat()})
+
+    print(f"\nRebuild complete! Rebuilt {len(months)} monthly rollups, skipped {skipped} payments without a date.")
+
+if __name__ == '__main__':
+    try:
+        rebuild_monthly_rollups()
+    except Exception as e:
+        print(f"Error during rebuild: {e}")
+        import traceback
+        traceback.print_exc()
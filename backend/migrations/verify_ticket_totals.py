@@ -0,0 +1,93 @@
+"""
+Consistency checker for ticket totals.
+
+Payment edits and deletes adjust totalInterestReceived, interestReceivedMonths and
+pendingPrincipal on the ticket with atomic increments instead of re-summing every
+payment. This script re-sums all payments per ticket and reports any drift.
+
+Usage (from the backend directory):
+    python migrations/verify_ticket_totals.py          # report only
+    python migrations/verify_ticket_totals.py --fix    # also rewrite drifted totals
+"""
+import sys
+import os
+
+# Add the backend directory to the python path to allow imports from services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.db import init_db
+from services.data_versions import bump_data_versions
+from flask import Flask
+
+app = Flask(__name__)
+
+# Initialize Firebase
+init_app = init_db(app)
+db = init_app
+
+TOLERANCE = 0.005
+
+def verify_ticket_totals(fix=False, batch_size=400):
+    """Compare stored ticket totals against the sum of their payments."""
+    print("Verifying ticket totals against payments...")
+
+    # Sum all payments per ticket in a single pass
+    sums_by_ticket = {}
+    for payment_doc in db.collection('payments').stream():
+        payment = payment_doc.to_dict()
+        ticket_id = payment.get('ticketId')
+        if not ticket_id:
+            continue
+        sums = sums_by_ticket.setdefault(ticket_id, {'interest': 0, 'months': 0, 'principal': 0})
+        sums['interest'] += payment.get('interestPaid', 0) or 0
+        sums['months'] += payment.get('monthsPaid', 0) or 0
+        sums['principal'] += payment.get('principalPaid', 0) or 0
+
+    tickets = list(db.collection('tickets').stream())
+    print(f"Found {len(tickets)} tickets with payments for {len(sums_by_ticket)} tickets")
+
+    mismatches = []
+    for ticket_doc in tickets:
+        ticket = ticket_doc.to_dict()
+        sums = sums_by_ticket.get(ticket_doc.id, {'interest': 0, 'months': 0, 'principal': 0})
+
+        expected = {
+            'totalInterestReceived': sums['interest'],
+            'interestReceivedMonths': sums['months'],
+            'pendingPrincipal': (ticket.get('principal', 0) or 0) - sums['principal']
+        }
+        drifted = {
+            field: value for field, value in expected.items()
+            if abs((ticket.get(field, 0) or 0) - value) > TOLERANCE
+        }
+
+        if drifted:
+            mismatches.append((ticket_doc.id, drifted))
+            for field, value in drifted.items():
+                print(f"Ticket {ticket_doc.id}: {field} is {ticket.get(field)}, expected {value}")
+
+    if fix and mismatches:
+        batch = db.batch()
+        pending = 0
+        for ticket_id, drifted in mismatches:
+            batch.update(db.collection('tickets').document(ticket_id), drifted)
+            pending += 1
+            if pending >= batch_size:
+                batch.commit()
+                batch = db.batch()
+                pending = 0
+        if pending:
+            batch.commit()
+        bump_data_versions(None, db, 'tickets')
+        print(f"Fixed {len(mismatches)} tickets")
+
+    print(f"\nVerification complete! {len(mismatches)} of {len(tickets)} tickets have drifted totals.")
+    return mismatches
+
+if __name__ == '__main__':
+    try:
+        verify_ticket_totals(fix='--fix' in sys.argv)
+    except Exception as e:
+        print(f"Error during verification: {e}")
+        import traceback
+        traceback.print_exc()
@@ -1,14 +1,32 @@
 from flask import Blueprint, request, jsonify
 from services.db import get_db
+from services.overdue_index import OVERDUE_COLLECTION, ensure_overdue_index_current, sweep_overdue_index
+from services.overdue_job import run_overdue_job, recent_overdue_runs
+from services.alert_queue import (
+    register_alert_provider, alert_methods, enqueue_campaign,
+    stored_campaign_counts, campaign_failed_items, ALERT_CAMPAIGN_JOB, DEFAULT_CONCURRENCY
+)
+from services.background_jobs import get_job
+from services.alert_messages import (
+    record_alert_message, message_history_page, message_counts, matching_total,
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, HISTORY_FILTERS
+)
+from services.alert_throttle import reserve_alert, release_alert, recently_alerted, mark_alerted
+from services.messaging import post_fast2sms, twilio_client, post_fast2sms_async, async_twilio_client
+from config import Config
 from datetime import datetime
-from dateutil import parser
 from dateutil.relativedelta import relativedelta
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
 from dotenv import load_dotenv
+import asyncio
+import hmac
+import random
 import re
+import time
+import uuid
 
 load_dotenv()
 
@@ -83,13 +101,11 @@ def send_twilio_whatsapp(customer_phone, message):
             print("[TWILIO] Credentials not configured. Install twilio and set TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN in .env")
             return False
         
-        from twilio.rest import Client
-        
         # Normalize phone number
         normalized_phone = normalize_phone_number(customer_phone)
         to_number = f'whatsapp:{normalized_phone}'
         
-        client = Client(twilio_account_sid, twilio_auth_token)
+        client = twilio_client(twilio_account_sid, twilio_auth_token)
         
         message_obj = client.messages.create(
             from_=twilio_whatsapp_number,
@@ -118,22 +134,10 @@ def send_sms_via_fast2sms(phone_number, message):
             print("[FAST2SMS] API key not configured. Get free account at https://www.fast2sms.com/")
             return False
         
-        import requests
-        
         normalized_phone = normalize_phone_number(phone_number)
         
-        url = "https://www.fast2sms.com/dev/bulkV2"
-        headers = {
-            "authorization": api_key,
-            "Content-Type": "application/x-www-form-urlencoded"
-        }
-        payload = {
-            "variables_values": message,
-            "route": "otp",
-            "numbers": normalized_phone.replace('+91', '')  # Fast2SMS wants 10 digit number
-        }
-        
-        response = requests.post(url, headers=headers, data=payload)
+        # Fast2SMS wants 10 digit number
+        response = post_fast2sms(api_key, normalized_phone.replace('+91', ''), message)
         
         if response.status_code == 200:
             return {
@@ -148,106 +152,124 @@ def send_sms_via_fast2sms(phone_number, message):
         print(f"Fast2SMS failed: {str(e)}")
         return False
 
+async def send_twilio_whatsapp_async(session, customer_phone, message):
+    """send_twilio_whatsapp on an aiohttp session, for bulk sends from an event loop."""
+    try:
+        twilio_account_sid = os.getenv('TWILIO_ACCOUNT_SID')
+        twilio_auth_token = os.getenv('TWILIO_AUTH_TOKEN')
+        twilio_whatsapp_number = os.getenv('TWILIO_WHATSAPP_NUMBER', 'whatsapp:+14155238886')
+        
+        if not twilio_account_sid or not twilio_auth_token:
+            return False
+        
+        normalized_phone = normalize_phone_number(customer_phone)
+        client = async_twilio_client(twilio_account_sid, twilio_auth_token, session)
+        
+        message_obj = await client.messages.create_async(
+            from_=twilio_whatsapp_number,
+            body=message,
+            to=f'whatsapp:{normalized_phone}'
+        )
+        
+        return {
+            'success': True,
+            'message_id': message_obj.sid,
+            'phone': normalized_phone
+        }
+    except Exception as e:
+        print(f"Twilio WhatsApp failed: {str(e)}")
+        return False
+
+async def send_sms_via_fast2sms_async(session, phone_number, message):
+    """send_sms_via_fast2sms on an aiohttp session, for bulk sends from an event loop."""
+    try:
+        api_key = os.getenv('FAST2SMS_API_KEY')
+        if not api_key:
+            return False
+        
+        normalized_phone = normalize_phone_number(phone_number)
+        status, body = await post_fast2sms_async(session, api_key, normalized_phone.replace('+91', ''), message)
+        
+        if status == 200:
+            return {
+                'success': True,
+                'phone': normalized_phone,
+                'service': 'fast2sms'
+            }
+        else:
+            print(f"Fast2SMS error: {body}")
+            return False
+    except Exception as e:
+        print(f"Fast2SMS failed: {str(e)}")
+        return False
+
+def send_stub_message(customer_name, phone_number, message):
+    """
+    Local stub provider for testing bulk dispatch without a real gateway.
+    ALERT_STUB_LATENCY_MS simulates gateway latency and ALERT_STUB_FAILURE_RATE
+    (0-1) makes that fraction of sends fail so retries can be exercised.
+    """
+    time.sleep(float(os.getenv('ALERT_STUB_LATENCY_MS', '0')) / 1000)
+    if random.random() < float(os.getenv('ALERT_STUB_FAILURE_RATE', '0')):
+        raise RuntimeError('Stub provider simulated failure')
+    print(f"[STUB ALERT] {customer_name} ({phone_number}): {message}")
+    return {
+        'success': True,
+        'message_id': f'stub-{uuid.uuid4().hex[:12]}',
+        'phone': normalize_phone_number(phone_number)
+    }
+
+async def send_stub_message_async(session, customer_name, phone_number, message):
+    """send_stub_message without blocking the event loop."""
+    await asyncio.sleep(float(os.getenv('ALERT_STUB_LATENCY_MS', '0')) / 1000)
+    if random.random() < float(os.getenv('ALERT_STUB_FAILURE_RATE', '0')):
+        raise RuntimeError('Stub provider simulated failure')
+    return {
+        'success': True,
+        'message_id': f'stub-{uuid.uuid4().hex[:12]}',
+        'phone': normalize_phone_number(phone_number)
+    }
+
+def stub_provider_enabled():
+    """The stub provider is available in development or when ALERT_STUB_PROVIDER is set."""
+    return Config.ENVIRONMENT == 'development' or os.getenv('ALERT_STUB_PROVIDER', '').lower() in ('1', 'true', 'yes')
+
+register_alert_provider('sms', lambda name, phone, message: send_sms_via_fast2sms(phone, message),
+                        lambda: bool(os.getenv('FAST2SMS_API_KEY')),
+                        lambda session, name, phone, message: send_sms_via_fast2sms_async(session, phone, message))
+register_alert_provider('whatsapp', lambda name, phone, message: send_twilio_whatsapp(phone, message),
+                        lambda: bool(os.getenv('TWILIO_ACCOUNT_SID') and os.getenv('TWILIO_AUTH_TOKEN')),
+                        lambda session, name, phone, message: send_twilio_whatsapp_async(session, phone, message))
+register_alert_provider('email', lambda name, phone, message: {'success': send_email_alert(name, phone, message)},
+                        lambda: True)
+register_alert_provider('stub', send_stub_message, stub_provider_enabled, send_stub_message_async)
+
+def render_alert_message(template, entry):
+    """Fill {customerName}, {ticketCount} and {monthsPending} in a bulk message from an overdue index entry."""
+    months_pending = max((ticket.get('monthsPending', 0) for ticket in entry.get('tickets', [])), default=0)
+    return (template
+            .replace('{customerName}', str(entry.get('customerName') or ''))
+            .replace('{ticketCount}', str(entry.get('ticketCount', 0)))
+            .replace('{monthsPending}', f'{months_pending:g}'))
+
 @alerts_bp.route('/overdue-interests', methods=['GET'])
 def get_overdue_interests():
     """
     Get customers with pending interests based on item type:
     - Gold: >= 12 months
     - Silver: >= 6 months
-    Returns a list of customers with pending interest details.
+    Returns a list of customers with pending interest details, read from the
+    overdue index (swept first if it has not been swept today).
     """
     try:
-        from routes.tickets import calculate_completed_months
-        
         db = get_db()
-        tickets_ref = db.collection('tickets')
-        docs = tickets_ref.stream()
+        ensure_overdue_index_current(db)
         
         overdue_customers = []
-        current_date = datetime.now()
-        
-        for doc in docs:
-            ticket = doc.to_dict()
-            
-            # Only consider active tickets
-            if ticket.get('status') != 'Active':
-                continue
-            
-            # Get the start date of the ticket
-            start_date_str = ticket.get('startDate')
-            if not start_date_str:
-                continue
-            
-            # Handle both date (YYYY-MM-DD) and datetime (ISO format) strings
-            try:
-                if 'T' in start_date_str:
-                    # ISO datetime format
-                    start_date = datetime.fromisoformat(start_date_str.replace('Z', '+00:00'))
-                else:
-                    # Simple date format (YYYY-MM-DD)
-                    start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
-            except Exception as e:
-                print(f"Error parsing date {start_date_str}: {e}")
-                continue
-            
-            # Calculate total elapsed months since ticket was created
-            completed_months = calculate_completed_months(start_date, current_date)
-            
-            # Get interest received months
-            interest_received_months = ticket.get('interestReceivedMonths', 0)
-            
-            # Calculate actual pending interest months
-            pending_interest_months = max(0, completed_months - interest_received_months)
-            
-            # Determine threshold based on item type
-            item_type = ticket.get('itemType', 'Silver')
-            threshold_months = 12 if item_type.lower() == 'gold' else 6
-            
-            # Check if pending interest months exceed threshold
-            if pending_interest_months >= threshold_months:
-                # Check if this customer already exists in overdue_customers
-                customer_exists = False
-                for existing_customer in overdue_customers:
-                    if existing_customer['customerId'] == ticket.get('customerId'):
-                        # Add ticket to existing customer
-                        existing_customer['tickets'].append({
-                            'id': doc.id,
-                            'articleName': ticket.get('articleName'),
-                            'principal': ticket.get('principal'),
-                            'pendingPrincipal': ticket.get('pendingPrincipal'),
-                            'interestPercentage': ticket.get('interestPercentage'),
-                            'startDate': ticket.get('startDate'),
-                            'monthsPending': pending_interest_months,
-                            'interestReceivedMonths': interest_received_months,
-                            'status': ticket.get('status')
-                        })
-                        customer_exists = True
-                        break
-                
-                if not customer_exists:
-                    # Add new customer with ticket
-                    overdue_customers.append({
-                        'customerId': ticket.get('customerId'),
-                        'customerName': ticket.get('customerName'),
-                        'customerPhone': ticket.get('customerPhone'),
-                        'customerAddress': ticket.get('customerAddress'),
-                        'ticketCount': 1,
-                        'tickets': [{
-                            'id': doc.id,
-                            'articleName': ticket.get('articleName'),
-                            'principal': ticket.get('principal'),
-                            'pendingPrincipal': ticket.get('pendingPrincipal'),
-                            'interestPercentage': ticket.get('interestPercentage'),
-                            'startDate': ticket.get('startDate'),
-                            'monthsPending': pending_interest_months,
-                            'interestReceivedMonths': interest_received_months,
-                            'status': ticket.get('status')
-                        }]
-                    })
-        
-        # Update ticket counts
-        for customer in overdue_customers:
-            customer['ticketCount'] = len(customer['tickets'])
+        for doc in db.collection(OVERDUE_COLLECTION).stream():
+            customer = doc.to_dict()
+            customer.pop('id', None)
+            overdue_customers.append(customer)
         
         return jsonify({
             'count': len(overdue_customers),
@@ -257,6 +279,66 @@ def get_overdue_interests():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@alerts_bp.route('/overdue-interests/refresh', methods=['POST'])
+def refresh_overdue_interests():
+    """Rebuild the overdue index from all active tickets now."""
+    try:
+        stats = sweep_overdue_index(get_db())
+        return jsonify({'message': 'Overdue index rebuilt', **stats}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@alerts_bp.route('/overdue-interests/nightly', methods=['POST'])
+def run_nightly_overdue_job():
+    """
+    Scheduled run (Cloud Scheduler): rebuild the overdue index and optionally
+    queue reminders. When SCHEDULER_TOKEN is set, the X-Scheduler-Token header
+    must match it; without it only the index rebuild runs and "sendReminders"
+    is refused, so an anonymous request cannot message every overdue customer.
+
+    Request body (optional):
+    {
+        "sendReminders": false,
+        "method": "sms",        (defaults to OVERDUE_REMINDER_METHOD)
+        "message": "..."        (defaults to OVERDUE_REMINDER_MESSAGE)
+    }
+    """
+    try:
+        scheduler_token = os.getenv('SCHEDULER_TOKEN')
+        if scheduler_token and not hmac.compare_digest(request.headers.get('X-Scheduler-Token', ''), scheduler_token):
+            return jsonify({'error': 'Invalid scheduler token'}), 401
+        
+        data = request.get_json(silent=True) or {}
+        send_reminders = bool(data.get('sendReminders'))
+        if send_reminders and not scheduler_token:
+            return jsonify({'error': 'SCHEDULER_TOKEN must be set to send reminders from the scheduled run'}), 403
+        
+        run = run_overdue_job(
+            get_db(),
+            send_reminders=send_reminders,
+            method=data.get('method'),
+            message=data.get('message'),
+            trigger='scheduler'
+        )
+        return jsonify(run), 200 if run['status'] == 'completed' else 500
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@alerts_bp.route('/overdue-interests/runs', methods=['GET'])
+def get_overdue_runs():
+    """Latest scheduled overdue runs with their duration and document counts."""
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 100)
+        runs = recent_overdue_runs(get_db(), limit)
+        return jsonify({'count': len(runs), 'runs': runs}), 200
+        
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @alerts_bp.route('/send-message/<customer_id>', methods=['POST'])
 def send_alert_message(customer_id):
     """
@@ -264,19 +346,26 @@ def send_alert_message(customer_id):
     Supports: SMS (Fast2SMS), WhatsApp (Twilio), and Email
     Free options available - see requirements in .env
     
+    A customer is messaged at most once per method within the throttle window
+    (ALERT_THROTTLE_HOURS); a repeat inside the window returns 429 unless forced.
+    
     Request body:
     {
         "message": "Custom message to send",
-        "method": "sms", "whatsapp", or "email"
+        "method": "sms", "whatsapp", or "email",
+        "force": false              (optional, bypasses the throttle window)
     }
     """
     try:
         data = request.json
         message = data.get('message')
         method = data.get('method', 'sms')
+        force = bool(data.get('force'))
         
         if not message:
             return jsonify({'error': 'Message is required'}), 400
+        if method not in ('sms', 'whatsapp', 'email'):
+            return jsonify({'error': f'Unsupported method: {method}'}), 400
         
         db = get_db()
         
@@ -298,6 +387,18 @@ def send_alert_message(customer_id):
         # Normalize phone number
         normalized_phone = normalize_phone_number(phone_number)
         
+        # Skip duplicates: reserve the alert so concurrent repeats coalesce into one send
+        previous_alert = None
+        if not force:
+            reserved, previous_alert, throttled_until = reserve_alert(db, customer_id, method)
+            if not reserved:
+                return jsonify({
+                    'status': 'throttled',
+                    'message': f'{customer_name} was already alerted by {method} at {previous_alert.isoformat()}',
+                    'lastAlertedAt': previous_alert.isoformat(),
+                    'throttledUntil': throttled_until
+                }), 429
+        
         # Send message based on method
         send_result = None
         if method == 'sms':
@@ -306,8 +407,14 @@ def send_alert_message(customer_id):
             send_result = send_twilio_whatsapp(phone_number, message)
         elif method == 'email':
             send_result = send_email_alert(customer_name, phone_number, message)
-        else:
-            return jsonify({'error': f'Unsupported method: {method}'}), 400
+        
+        if send_result is False and not force:
+            # Nothing went out, so it does not count against the throttle window
+            release_alert(db, customer_id, method, previous_alert)
+        elif send_result is not False and force:
+            batch = db.batch()
+            mark_alerted(batch, db, [customer_id], method)
+            batch.commit()
         
         # Determine status based on result
         if send_result is False:
@@ -322,7 +429,7 @@ def send_alert_message(customer_id):
                 'status': 'pending_configuration',
                 'note': f'{method} service not configured. Configure API keys in .env to enable.'
             }
-            db.collection('alert_messages').document().set(log_data)
+            record_alert_message(db, log_data)
             
             return jsonify({
                 'status': 'pending_configuration',
@@ -357,7 +464,7 @@ def send_alert_message(customer_id):
             }
         
         # Store message log in database
-        db.collection('alert_messages').document().set(log_data)
+        record_alert_message(db, log_data)
         
         return jsonify({
             'status': 'success',
@@ -369,6 +476,148 @@ def send_alert_message(customer_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def queue_overdue_reminders(db, message, method, customer_ids=None, force=False, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Queue an alert campaign for every overdue customer, or for the given ids,
+    skipping customers without a phone number or already alerted by the method
+    within the throttle window (unless force is set).
+    Returns {campaignId, method, queued, skipped}; campaignId is None when no one
+    was left to alert. Raises ValueError for an invalid message, method or id list.
+    """
+    if not message:
+        raise ValueError('Message is required')
+    if method not in alert_methods() or (method == 'stub' and not stub_provider_enabled()):
+        raise ValueError(f'Unsupported method: {method}')
+    if customer_ids is not None and not isinstance(customer_ids, list):
+        raise ValueError('customerIds must be a list')
+    
+    ensure_overdue_index_current(db)
+    
+    if customer_ids is None:
+        entries = [doc.to_dict() for doc in db.collection(OVERDUE_COLLECTION).stream()]
+    else:
+        entries = []
+        for customer_id in dict.fromkeys(customer_ids):
+            entry_doc = db.collection(OVERDUE_COLLECTION).document(customer_id).get()
+            if entry_doc.exists:
+                entries.append(entry_doc.to_dict())
+    
+    recipients = []
+    skipped = []
+    for entry in entries:
+        if not entry.get('customerPhone'):
+            skipped.append({'customerId': entry.get('customerId'), 'reason': 'Customer phone number not found'})
+            continue
+        recipients.append({
+            'customerId': entry.get('customerId'),
+            'customerName': entry.get('customerName'),
+            'phone': entry.get('customerPhone'),
+            'phoneNumber': normalize_phone_number(entry.get('customerPhone')),
+            'message': render_alert_message(message, entry)
+        })
+    if customer_ids is not None:
+        found = {entry.get('customerId') for entry in entries}
+        skipped.extend({'customerId': customer_id, 'reason': 'Customer has no overdue interest'}
+                       for customer_id in dict.fromkeys(customer_ids) if customer_id not in found)
+    
+    # One pass over the throttle state of every recipient
+    throttled, missing = recently_alerted(db, [recipient['customerId'] for recipient in recipients], method)
+    if force:
+        throttled = {}
+    for recipient in recipients:
+        if recipient['customerId'] in missing:
+            skipped.append({'customerId': recipient['customerId'], 'reason': 'Customer not found'})
+        elif recipient['customerId'] in throttled:
+            skipped.append({
+                'customerId': recipient['customerId'],
+                'reason': f'Already alerted by {method} within the throttle window',
+                'lastAlertedAt': throttled[recipient['customerId']].isoformat()
+            })
+    recipients = [recipient for recipient in recipients
+                  if recipient['customerId'] not in missing and recipient['customerId'] not in throttled]
+    
+    if not recipients:
+        return {'campaignId': None, 'method': method, 'queued': 0, 'skipped': skipped}
+    
+    # The queue records lastAlerted as each message is sent
+    campaign_id = enqueue_campaign(recipients, method, concurrency)
+    
+    return {'campaignId': campaign_id, 'method': method, 'queued': len(recipients), 'skipped': skipped}
+
+@alerts_bp.route('/send-bulk', methods=['POST'])
+def send_bulk_alerts():
+    """
+    Queue an alert for every overdue customer, or for the selected ones, and send
+    them in the background. The message may use {customerName}, {ticketCount}
+    and {monthsPending}.
+
+    Request body:
+    {
+        "message": "Dear {customerName}, interest is pending for {monthsPending} months",
+        "method": "sms", "whatsapp", "email" or "stub",
+        "customerIds": ["..."],     (optional, defaults to all overdue customers)
+        "concurrency": 20,          (optional, messages in flight)
+        "force": false              (optional, bypasses the throttle window)
+    }
+    Customers already alerted by the method within the throttle window are skipped.
+    Returns 202 with the campaign id; poll GET /send-bulk/<campaignId> for progress.
+    """
+    try:
+        data = request.json or {}
+        result = queue_overdue_reminders(
+            get_db(),
+            data.get('message'),
+            data.get('method', 'sms'),
+            customer_ids=data.get('customerIds'),
+            force=bool(data.get('force')),
+            concurrency=data.get('concurrency', DEFAULT_CONCURRENCY)
+        )
+        
+        if not result['campaignId']:
+            return jsonify({'error': 'No overdue customers to alert', 'skipped': result['skipped']}), 400
+        
+        return jsonify({
+            **result,
+            'progressUrl': f"{alerts_bp.url_prefix}/send-bulk/{result['campaignId']}"
+        }), 202
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@alerts_bp.route('/send-bulk/<campaign_id>', methods=['GET'])
+def get_bulk_alert_progress(campaign_id):
+    """Progress of a bulk alert campaign: counts per status and the failed messages."""
+    try:
+        job = get_job(campaign_id)
+        if not job or job.get('type') != ALERT_CAMPAIGN_JOB:
+            return jsonify({'error': 'Campaign not found'}), 404
+        
+        # Counts come from the job's progress; only failed items are read
+        params = job.get('params') or {}
+        counts = stored_campaign_counts(job)
+        failed = campaign_failed_items(get_db(), campaign_id)
+        
+        return jsonify({
+            'campaignId': campaign_id,
+            'status': job.get('status'),
+            'method': params.get('method'),
+            'total': params.get('total', sum(counts.values())),
+            'counts': counts,
+            'failed': [
+                {'customerId': item.get('customerId'), 'customerName': item.get('customerName'),
+                 'attempts': item.get('attempts'), 'error': item.get('lastError')}
+                for _, item in failed
+            ],
+            'error': job.get('error'),
+            'createdAt': job.get('createdAt'),
+            'completedAt': job.get('completedAt')
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 def get_setup_instructions(method):
     """Get setup instructions for each message service."""
     instructions = {
@@ -409,26 +658,32 @@ def get_setup_instructions(method):
 
 @alerts_bp.route('/message-history', methods=['GET'])
 def get_message_history():
-    """Get history of all alert messages sent."""
+    """
+    Get alert messages, newest first, one page at a time.
+    Query params:
+    - limit: page size (optional, defaults to 50, max 200)
+    - cursor: nextCursor from the previous page (optional)
+    - customerId, status, method: filters (optional)
+    The summary counts come from the per-customer/overall count documents.
+    """
     try:
-        db = get_db()
-        messages_ref = db.collection('alert_messages')
-        docs = messages_ref.stream()
+        limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        filters = {field: request.args.get(field) for field in HISTORY_FILTERS if request.args.get(field)}
         
-        messages = []
-        for doc in docs:
-            msg = doc.to_dict()
-            msg['id'] = doc.id
-            messages.append(msg)
-        
-        # Sort by timestamp descending
-        messages.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+        db = get_db()
+        messages, next_cursor = message_history_page(db, filters, limit, request.args.get('cursor'))
+        counts = message_counts(db, filters.get('customerId'))
         
         return jsonify({
             'count': len(messages),
-            'messages': messages
+            'messages': messages,
+            'nextCursor': next_cursor,
+            'total': matching_total(counts, filters),
+            'summary': counts
         }), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
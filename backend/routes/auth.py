@@ -1,8 +1,13 @@
 from flask import Blueprint, request, jsonify
 from services.db import get_db
+from services.token_cache import cache_token, cached_token, sync_token_cache, invalidate_tokens, USER_FIELDS
+from services.sessions import create_session, get_session, delete_session, delete_user_sessions
+from services.login_limits import (
+    run_hashing, PasswordHashBusy, start_login_attempt, cancel_login_attempt, clear_login_attempts, BUSY_RETRY_AFTER
+)
 import hashlib
 import secrets
-from datetime import datetime, timedelta
+from datetime import datetime
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
@@ -25,6 +30,35 @@ def generate_token():
     """Generate a simple token for authentication."""
     return secrets.token_urlsafe(32)
 
+def find_token_user(db, token):
+    """
+    Cache entry of the user holding the token: from the token cache, else from its
+    session document (then cached). None if the token has no session.
+    """
+    sync_token_cache(db)
+    entry = cached_token(token)
+    if entry:
+        return entry
+    
+    session = get_session(db, token)
+    return cache_token(token, session['userId'], session) if session else None
+
+def check_password(attempt_key, stored_hash, password):
+    """Verify a password on the hashing pool; a busy rejection does not count as an attempt."""
+    try:
+        return run_hashing(verify_password, stored_hash, password)
+    except PasswordHashBusy:
+        cancel_login_attempt(attempt_key)
+        raise
+
+def too_many_requests(message, retry_after):
+    """429 response asking the client to retry after the given seconds."""
+    return jsonify({'error': message, 'retryAfter': retry_after}), 429, {'Retry-After': str(retry_after)}
+
+def user_response(entry):
+    """Public user fields of a token cache entry."""
+    return {'id': entry['userId'], **{field: entry[field] for field in USER_FIELDS}, 'role': entry['role']}
+
 @auth_bp.route('/login', methods=['POST'])
 def login():
     """Authenticate user and return auth token."""
@@ -36,6 +70,12 @@ def login():
         if not username or not password:
             return jsonify({'error': 'Username and password are required'}), 400
         
+        # Count the attempt up front so concurrent bursts are limited too
+        attempt_key = (username, request.remote_addr)
+        retry_after = start_login_attempt(attempt_key)
+        if retry_after:
+            return too_many_requests('Too many failed sign-in attempts. Please try again later.', retry_after)
+        
         db = get_db()
         users_ref = db.collection('users')
         
@@ -52,23 +92,17 @@ def login():
         user_data = user_doc.to_dict()
         
         # Verify password
-        if not verify_password(user_data.get('password_hash', ''), password):
+        if not check_password(attempt_key, user_data.get('password_hash', ''), password):
             return jsonify({'error': 'Invalid username or password'}), 401
+        clear_login_attempts(attempt_key)
         
         # Check if user is active
         if not user_data.get('isActive', True):
             return jsonify({'error': 'User account is disabled'}), 401
         
-        # Generate auth token
+        # Generate auth token; other sessions of the user stay signed in
         token = generate_token()
-        token_expiry = datetime.now() + timedelta(days=30)
-        
-        # Update user with token
-        users_ref.document(user_doc.id).update({
-            'authToken': token,
-            'tokenExpiry': token_expiry.isoformat(),
-            'lastLogin': datetime.now().isoformat()
-        })
+        create_session(db, token, user_doc.id, user_data)
         
         return jsonify({
             'message': 'Login successful',
@@ -82,6 +116,8 @@ def login():
             }
         }), 200
         
+    except PasswordHashBusy as e:
+        return too_many_requests(str(e), BUSY_RETRY_AFTER)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -112,21 +148,20 @@ def register():
         # Create new user
         user_data = {
             'username': username,
-            'password_hash': hash_password(password),
+            'password_hash': run_hashing(hash_password, password),
             'name': name,
             'email': email or '',
             'role': 'user',
             'isActive': True,
-            'createdAt': datetime.now().isoformat(),
-            'lastLogin': None,
-            'authToken': None,
-            'tokenExpiry': None
+            'createdAt': datetime.now().isoformat()
         }
         
         users_ref.add(user_data)
         
         return jsonify({'message': 'User registered successfully'}), 201
         
+    except PasswordHashBusy as e:
+        return too_many_requests(str(e), BUSY_RETRY_AFTER)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -140,48 +175,26 @@ def verify_token():
         if not token:
             return jsonify({'error': 'Token is required'}), 400
         
-        db = get_db()
-        users_ref = db.collection('users')
-        
-        # Query for user by token
-        docs = users_ref.where('authToken', '==', token).stream()
-        user_doc = None
-        for doc in docs:
-            user_doc = doc
-            break
-        
-        if not user_doc:
+        entry = find_token_user(get_db(), token)
+        if not entry:
             return jsonify({'error': 'Invalid token'}), 401
         
-        user_data = user_doc.to_dict()
-        
         # Check if token has expired
-        if user_data.get('tokenExpiry'):
-            expiry = datetime.fromisoformat(user_data['tokenExpiry'])
-            if datetime.now() > expiry:
-                return jsonify({'error': 'Token has expired'}), 401
+        if entry['expiresAt'] and datetime.now() > entry['expiresAt']:
+            return jsonify({'error': 'Token has expired'}), 401
         
         # Check if user is active
-        if not user_data.get('isActive', True):
+        if not entry['isActive']:
             return jsonify({'error': 'User account is disabled'}), 401
         
-        return jsonify({
-            'valid': True,
-            'user': {
-                'id': user_doc.id,
-                'username': user_data.get('username'),
-                'name': user_data.get('name'),
-                'email': user_data.get('email'),
-                'role': user_data.get('role', 'user')
-            }
-        }), 200
+        return jsonify({'valid': True, 'user': user_response(entry)}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/logout', methods=['POST'])
 def logout():
-    """Logout user by invalidating token."""
+    """Logout user by deleting the token's session, or every session of the user with "allDevices": true."""
     try:
         data = request.json
         token = data.get('token')
@@ -190,20 +203,14 @@ def logout():
             return jsonify({'error': 'Token is required'}), 400
         
         db = get_db()
-        users_ref = db.collection('users')
-        
-        # Query for user by token
-        docs = users_ref.where('authToken', '==', token).stream()
-        user_doc = None
-        for doc in docs:
-            user_doc = doc
-            break
-        
-        if user_doc:
-            users_ref.document(user_doc.id).update({
-                'authToken': None,
-                'tokenExpiry': None
-            })
+        if data.get('allDevices'):
+            entry = find_token_user(db, token)
+            if entry:
+                delete_user_sessions(db, entry['userId'])
+                invalidate_tokens(db, user_id=entry['userId'])
+        else:
+            delete_session(db, token)
+            invalidate_tokens(db, token=token)
         
         return jsonify({'message': 'Logged out successfully'}), 200
         
@@ -228,28 +235,75 @@ def change_password():
         db = get_db()
         users_ref = db.collection('users')
         
-        # Query for user by token
-        docs = users_ref.where('authToken', '==', token).stream()
-        user_doc = None
-        for doc in docs:
-            user_doc = doc
-            break
-        
-        if not user_doc:
+        entry = find_token_user(db, token)
+        user_doc = users_ref.document(entry['userId']).get() if entry else None
+        if not user_doc or not user_doc.exists:
             return jsonify({'error': 'Invalid token'}), 401
         
         user_data = user_doc.to_dict()
+        username = user_data.get('username')
+        
+        attempt_key = (username, request.remote_addr)
+        retry_after = start_login_attempt(attempt_key)
+        if retry_after:
+            return too_many_requests('Too many failed password attempts. Please try again later.', retry_after)
         
         # Verify old password
-        if not verify_password(user_data.get('password_hash', ''), old_password):
+        if not check_password(attempt_key, user_data.get('password_hash', ''), old_password):
             return jsonify({'error': 'Old password is incorrect'}), 401
+        clear_login_attempts(attempt_key)
         
         # Update password
         users_ref.document(user_doc.id).update({
-            'password_hash': hash_password(new_password)
+            'password_hash': run_hashing(hash_password, new_password)
         })
+        # Sign out the user's other devices
+        delete_user_sessions(db, user_doc.id, keep_token=token)
+        invalidate_tokens(db, user_id=user_doc.id)
         
         return jsonify({'message': 'Password changed successfully'}), 200
         
+    except PasswordHashBusy as e:
+        return too_many_requests(str(e), BUSY_RETRY_AFTER)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@auth_bp.route('/users/<user_id>/active', methods=['POST'])
+def set_user_active(user_id):
+    """
+    Activate or deactivate a user (admin only). Deactivating also signs the user out.
+
+    Request body:
+    {
+        "token": "...",         (auth token of an admin)
+        "isActive": false
+    }
+    """
+    try:
+        data = request.json or {}
+        token = data.get('token')
+        is_active = data.get('isActive')
+        
+        if not token or not isinstance(is_active, bool):
+            return jsonify({'error': 'Token and isActive (true or false) are required'}), 400
+        
+        db = get_db()
+        admin = find_token_user(db, token)
+        if not admin or not admin['isActive'] or (admin['expiresAt'] and datetime.now() > admin['expiresAt']):
+            return jsonify({'error': 'Invalid token'}), 401
+        if admin['role'] != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        user_ref = db.collection('users').document(user_id)
+        if not user_ref.get().exists:
+            return jsonify({'error': 'User not found'}), 404
+        
+        user_ref.update({'isActive': is_active})
+        if not is_active:
+            delete_user_sessions(db, user_id)
+        invalidate_tokens(db, user_id=user_id)
+        
+        return jsonify({'message': 'User activated' if is_active else 'User deactivated'}), 200
+        
     except Exception as e:
         return jsonify({'error': str(e)}), 500
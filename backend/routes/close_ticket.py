@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
 from services.db import get_db
+from services.customer_stats import customer_stats_update
+from services.data_versions import bump_data_versions
+from services.overdue_index import refresh_overdue_customers
 from datetime import datetime
 
 close_ticket_bp = Blueprint('close_ticket', __name__, url_prefix='/api/tickets')
@@ -27,29 +30,23 @@ def close_ticket(ticket_id):
             return jsonify({'error': f'Cannot close ticket. Pending principal must be 0. Current pending: ₹{pending_principal}'}), 400
         
         # Update ticket status, close date, and set interest pending months to 0
-        ticket_ref.update({
+        batch = db.batch()
+        batch.update(ticket_ref, {
             'status': 'Closed',
             'closeDate': datetime.now().isoformat(),
             'interestPendingMonths': 0
         })
         
-        # Update customer stats
+        # Update customer stats: one less active ticket and its outstanding amount
         customer_id = ticket_data.get('customerId')
         if customer_id:
             customer_ref = db.collection('customers').document(customer_id)
-            customer_doc = customer_ref.get()
-            
-            if customer_doc.exists:
-                customer = customer_doc.to_dict()
-                current_active_tickets = customer.get('activeTickets', 0)
-                current_total_outstanding = customer.get('totalOutstanding', 0)
-                pending_principal = ticket_data.get('pendingPrincipal', 0)
-                
-                # Decrease active tickets and outstanding amount
-                customer_ref.update({
-                    'activeTickets': max(0, current_active_tickets - 1),
-                    'totalOutstanding': max(0, current_total_outstanding - pending_principal)
-                })
+            if customer_ref.get().exists:
+                batch.update(customer_ref, customer_stats_update(active_tickets=-1, outstanding=-pending_principal))
+        
+        bump_data_versions(batch, db, 'tickets', 'customers')
+        batch.commit()
+        refresh_overdue_customers(db, [customer_id])
         
         return jsonify({'message': 'Ticket closed successfully'}), 200
         
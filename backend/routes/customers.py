@@ -1,9 +1,142 @@
 from flask import Blueprint, request, jsonify
-from services.db import get_db
+from services.db import get_db, run_transaction, ChunkedBatch
+from services.customer_stats import EMPTY_CUSTOMER_STATS, customer_stats_migrated, compute_customer_stats
+from services.customer_search import build_search_tokens, search_customers
+from services.customer_keys import claim_keys_and_create, claim_keys_and_update, release_keys
+from services.rollups import monthly_rollup_deltas, merge_rollup_deltas, write_rollup_deltas
+from services.data_versions import bump_data_versions
+from services.overdue_index import refresh_overdue_customers, remove_overdue_customer
+from services.background_jobs import register_job_handler, create_job, submit_job, start_job, get_job, job_in_progress
 from datetime import datetime
 
 customers_bp = Blueprint('customers', __name__, url_prefix='/api/customers')
 
+CUSTOMER_DELETE_JOB = 'customer_delete'
+# Firestore 'in' filters accept at most 30 values
+IN_QUERY_LIMIT = 30
+
+def _delete_payments(writer, db, payment_ids, rollups):
+    """Delete payments together with their rollup deltas and version bump, in one batch."""
+    for payment_id in payment_ids:
+        writer.delete(db.collection('payments').document(payment_id))
+    write_rollup_deltas(writer, db, rollups)
+    bump_data_versions(writer, db, 'payments')
+    writer.commit()
+    return len(payment_ids)
+
+def cascade_delete_customer(params, report_progress):
+    """
+    Background job: delete a customer's payments, tickets, unique keys and the customer.
+    Payments are found with chunked 'in' queries and deleted in batches of at most
+    500 writes, each holding the monthly rollup deltas of its payments, so the totals
+    stay consistent if the job stops between batches. Children are deleted before
+    parents, so re-running the job after an interruption picks up whatever is left.
+    """
+    db = get_db()
+    customer_id = params['customerId']
+    writer = ChunkedBatch(db)
+    
+    ticket_ids = [doc.id for doc in db.collection('tickets').where('customerId', '==', customer_id).stream()]
+    
+    deleted_payments = 0
+    for start in range(0, len(ticket_ids), IN_QUERY_LIMIT):
+        chunk = ticket_ids[start:start + IN_QUERY_LIMIT]
+        payment_ids, rollups = [], {}
+        for payment_doc in db.collection('payments').where('ticketId', 'in', chunk).stream():
+            deltas = monthly_rollup_deltas(payment_doc.to_dict(), None)
+            # Deletes + rollup months + the version bump must fit in one batch
+            batch_ops = len(payment_ids) + len(rollups.keys() | deltas.keys()) + 2
+            if payment_ids and batch_ops > writer.limit:
+                deleted_payments += _delete_payments(writer, db, payment_ids, rollups)
+                payment_ids, rollups = [], {}
+            payment_ids.append(payment_doc.id)
+            merge_rollup_deltas(rollups, deltas)
+        if payment_ids:
+            deleted_payments += _delete_payments(writer, db, payment_ids, rollups)
+        report_progress(deletedPayments=deleted_payments, ticketsScanned=start + len(chunk), totalTickets=len(ticket_ids))
+    
+    for ticket_id in ticket_ids:
+        writer.delete(db.collection('tickets').document(ticket_id))
+    
+    # The customer and its key claims go last, in the same batch
+    writer.commit()
+    customer_ref = db.collection('customers').document(customer_id)
+    customer_doc = customer_ref.get()
+    if customer_doc.exists:
+        release_keys(writer, db, customer_id, customer_doc.to_dict())
+        remove_overdue_customer(writer, db, customer_id)
+        writer.delete(customer_ref)
+    bump_data_versions(writer, db, 'tickets', 'customers')
+    writer.commit()
+    
+    return {
+        'customerId': customer_id,
+        'deletedPayments': deleted_payments,
+        'deletedTickets': len(ticket_ids)
+    }
+
+register_job_handler(CUSTOMER_DELETE_JOB, cascade_delete_customer)
+
+CUSTOMER_PROPAGATE_JOB = 'customer_propagate'
+# Customer fields cached on tickets, and the subset cached on payments
+TICKET_CACHED_FIELDS = {'customerName': 'name', 'customerPhone': 'phone', 'customerAddress': 'address'}
+PAYMENT_CACHED_FIELDS = {'customerName': 'name'}
+
+def _cached_values(customer, field_map):
+    return {cached: customer.get(source) or '' for cached, source in field_map.items()}
+
+def propagate_customer_profile(params, report_progress):
+    """
+    Background job: copy a customer's current name/phone/address into the
+    denormalized fields of its tickets and payments. The customer is read when the
+    job runs, so several quick edits converge on the latest values, and documents
+    that are already up to date are not rewritten.
+    """
+    db = get_db()
+    customer_id = params['customerId']
+    customer_doc = db.collection('customers').document(customer_id).get()
+    if not customer_doc.exists:
+        return {'customerId': customer_id, 'updatedTickets': 0, 'updatedPayments': 0}
+    
+    customer = customer_doc.to_dict()
+    ticket_values = _cached_values(customer, TICKET_CACHED_FIELDS)
+    payment_values = _cached_values(customer, PAYMENT_CACHED_FIELDS)
+    writer = ChunkedBatch(db)
+    
+    ticket_ids = []
+    updated_tickets = 0
+    for ticket_doc in db.collection('tickets').where('customerId', '==', customer_id).stream():
+        ticket_ids.append(ticket_doc.id)
+        ticket = ticket_doc.to_dict()
+        if any(ticket.get(field) != value for field, value in ticket_values.items()):
+            writer.update(db.collection('tickets').document(ticket_doc.id), ticket_values)
+            updated_tickets += 1
+    
+    updated_payments = 0
+    for start in range(0, len(ticket_ids), IN_QUERY_LIMIT):
+        chunk = ticket_ids[start:start + IN_QUERY_LIMIT]
+        for payment_doc in db.collection('payments').where('ticketId', 'in', chunk).stream():
+            payment = payment_doc.to_dict()
+            if any(payment.get(field) != value for field, value in payment_values.items()):
+                writer.update(db.collection('payments').document(payment_doc.id), payment_values)
+                updated_payments += 1
+        report_progress(ticketsScanned=start + len(chunk), totalTickets=len(ticket_ids))
+    
+    if updated_tickets or updated_payments:
+        bump_data_versions(writer, db, 'tickets', 'payments')
+    writer.commit()
+    if updated_tickets:
+        # The overdue index caches the customer's contact details
+        refresh_overdue_customers(db, [customer_id])
+    
+    return {
+        'customerId': customer_id,
+        'updatedTickets': updated_tickets,
+        'updatedPayments': updated_payments
+    }
+
+register_job_handler(CUSTOMER_PROPAGATE_JOB, propagate_customer_profile)
+
 @customers_bp.route('', methods=['POST'])
 def create_customer():
     """Create a new customer."""
@@ -11,25 +144,6 @@ def create_customer():
         data = request.json
         db = get_db()
 
-        # Check for duplicates
-        phone = data.get('phone')
-        if phone:
-            existing_phone = list(db.collection('customers').where('phone', '==', phone).limit(1).stream())
-            if existing_phone:
-                return jsonify({'error': 'Customer with this phone number already exists'}), 400
-
-        id_proof = data.get('idProofNumber')
-        if id_proof:
-            existing_id = list(db.collection('customers').where('idProofNumber', '==', id_proof).limit(1).stream())
-            if existing_id:
-                return jsonify({'error': 'Customer with this ID proof number already exists'}), 400
-
-        name = data.get('name')
-        if name:
-            existing_name = list(db.collection('customers').where('name', '==', name).limit(1).stream())
-            if existing_name:
-                return jsonify({'error': 'Customer with this name already exists'}), 400
-        
         customer_data = {
             'name': data.get('name'),
             'phone': data.get('phone'),
@@ -40,11 +154,17 @@ def create_customer():
             'idProofType': data.get('idProofType', 'Aadhar'),
             'idProofOtherName': data.get('idProofOtherName'),
             'idProofNumber': data.get('idProofNumber'),
-            'createdAt': datetime.now().isoformat()
+            'createdAt': datetime.now().isoformat(),
+            **EMPTY_CUSTOMER_STATS
         }
+        customer_data['searchTokens'] = build_search_tokens(customer_data)
         
+        # Check and claim the unique keys (phone, ID proof, name) in the same commit
         customer_ref = db.collection('customers').document()
-        customer_ref.set(customer_data)
+        error = run_transaction(claim_keys_and_create, db, customer_ref, customer_data)
+        if error:
+            return jsonify({'error': error}), 400
+        bump_data_versions(None, db, 'customers')
         
         return jsonify({'id': customer_ref.id, 'message': 'Customer created successfully'}), 201
         
@@ -57,53 +177,23 @@ def get_customers():
     try:
         db = get_db()
         
-        # Fetch all customers in a single query
-        customers_ref = db.collection('customers')
-        customers_docs = list(customers_ref.stream())
+        # Ticket stats are maintained on the customer document at write time, so
+        # only the customers collection has to be read once they have been migrated
+        computed_stats = None
+        if not customer_stats_migrated(db):
+            computed_stats = compute_customer_stats(db.collection('tickets').stream())
         
-        # Fetch all tickets in a single query
-        tickets_ref = db.collection('tickets')
-        tickets_docs = list(tickets_ref.stream())
-        
-        # Build a map of customer stats from tickets
-        customer_stats = {}
-        for ticket_doc in tickets_docs:
-            ticket = ticket_doc.to_dict()
-            customer_id = ticket.get('customerId')
-            if not customer_id:
-                continue
-            
-            if customer_id not in customer_stats:
-                customer_stats[customer_id] = {
-                    'totalTickets': 0,
-                    'activeTickets': 0,
-                    'totalOutstanding': 0
-                }
-            
-            # Count all tickets
-            customer_stats[customer_id]['totalTickets'] += 1
-            
-            # Count only active tickets and their outstanding amounts
-            if ticket.get('status') == 'Active':
-                customer_stats[customer_id]['activeTickets'] += 1
-                pending_principal = ticket.get('pendingPrincipal', 0)
-                customer_stats[customer_id]['totalOutstanding'] += pending_principal
-
         customers = []
-        for doc in customers_docs:
+        for doc in db.collection('customers').stream():
             customer = doc.to_dict()
+            if customer.get('deletionJobId'):
+                continue
             customer['id'] = doc.id
-            
-            # Use dynamically calculated stats from actual tickets
-            stats = customer_stats.get(doc.id, {
-                'totalTickets': 0,
-                'activeTickets': 0,
-                'totalOutstanding': 0
-            })
-            customer['totalTickets'] = stats['totalTickets']
-            customer['activeTickets'] = stats['activeTickets']
-            customer['totalOutstanding'] = stats['totalOutstanding']
-
+            customer.pop('searchTokens', None)
+            if computed_stats is not None:
+                customer.update(computed_stats.get(doc.id, EMPTY_CUSTOMER_STATS))
+            for field, default in EMPTY_CUSTOMER_STATS.items():
+                customer[field] = customer.get(field, default)
             customers.append(customer)
 
         return jsonify(customers), 200
@@ -111,6 +201,29 @@ def get_customers():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@customers_bp.route('/search', methods=['GET'])
+def search_customers_typeahead():
+    """
+    Typeahead search over customer name prefixes, phone suffixes and ID proof number.
+    Query params:
+    - q: search text (required)
+    - limit: maximum number of matches (optional, defaults to 10, max 50)
+    """
+    try:
+        query = request.args.get('q', '')
+        if not query.strip():
+            return jsonify({'error': 'q parameter is required'}), 400
+        
+        limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+        
+        customers = search_customers(get_db(), query, limit)
+        return jsonify(customers), 200
+        
+    except ValueError as e:
+        return jsonify({'error': f'Invalid value: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @customers_bp.route('/<customer_id>/tickets', methods=['GET'])
 def get_customer_tickets(customer_id):
     """Get all tickets for a specific customer."""
@@ -154,6 +267,7 @@ def manage_customer(customer_id):
         if request.method == 'GET':
             customer = customer_doc.to_dict()
             customer['id'] = customer_doc.id
+            customer.pop('searchTokens', None)
             return jsonify(customer), 200
         
         # PUT: Update customer details
@@ -172,36 +286,43 @@ def manage_customer(customer_id):
                 'idProofOtherName': data.get('idProofOtherName'),
                 'idProofNumber': data.get('idProofNumber')
             }
+            update_data['searchTokens'] = build_search_tokens(update_data)
+            
+            # Move the unique key claims along with the update, rejecting duplicates
+            found, error = run_transaction(claim_keys_and_update, db, customer_ref, update_data)
+            if not found:
+                return jsonify({'error': 'Customer not found'}), 404
+            if error:
+                return jsonify({'error': error}), 400
+            bump_data_versions(None, db, 'customers')
+            
+            # Fan the profile change out to cached copies on tickets and payments off the request path
+            old_customer = customer_doc.to_dict()
+            if _cached_values(old_customer, TICKET_CACHED_FIELDS) != _cached_values(update_data, TICKET_CACHED_FIELDS):
+                job_id = start_job(CUSTOMER_PROPAGATE_JOB, {'customerId': customer_id})
+                return jsonify({'message': 'Customer updated successfully', 'propagationJobId': job_id}), 200
             
-            customer_ref.update(update_data)
             return jsonify({'message': 'Customer updated successfully'}), 200
         
-        # DELETE: Delete customer and all associated tickets and payments
+        # DELETE: Delete customer and all associated tickets and payments in the background
         elif request.method == 'DELETE':
-            # Get all tickets for this customer
-            tickets_query = db.collection('tickets').where('customerId', '==', customer_id)
-            tickets_docs = list(tickets_query.stream())
-            
-            # Delete all payments associated with these tickets
-            for ticket_doc in tickets_docs:
-                ticket_id = ticket_doc.id
-                payments_query = db.collection('payments').where('ticketId', '==', ticket_id)
-                payments_docs = list(payments_query.stream())
-                for payment_doc in payments_docs:
-                    payment_id = payment_doc.id
-                    payment_ref = db.collection('payments').document(payment_id)
-                    payment_ref.delete()
-            
-            # Delete all tickets for this customer
-            for ticket_doc in tickets_docs:
-                ticket_id = ticket_doc.id
-                ticket_ref = db.collection('tickets').document(ticket_id)
-                ticket_ref.delete()
+            customer = customer_doc.to_dict()
             
-            # Delete the customer
-            customer_ref.delete()
+            # A deletion already in progress is reported instead of started twice
+            existing_job = get_job(customer['deletionJobId']) if customer.get('deletionJobId') else None
+            if job_in_progress(existing_job):
+                job_id = existing_job['id']
+            else:
+                job_id = create_job(CUSTOMER_DELETE_JOB, {'customerId': customer_id})
+                # Hides the customer from listings while the job runs
+                customer_ref.update({'deletionJobId': job_id})
+                bump_data_versions(None, db, 'customers')
+                submit_job(job_id)
             
-            return jsonify({'message': 'Customer deleted successfully along with all tickets and payments'}), 200
+            return jsonify({
+                'message': 'Customer deletion started along with all tickets and payments',
+                'jobId': job_id
+            }), 202
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -0,0 +1,17 @@
+from flask import Blueprint, jsonify
+from services.background_jobs import get_job
+
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/api/jobs')
+
+@jobs_bp.route('/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Get the status, progress and result of a background job."""
+    try:
+        job = get_job(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        return jsonify(job), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,8 +1,18 @@
 from flask import Blueprint, request, jsonify
-from services.db import get_db
+from services.db import get_db, increment, run_transaction, BATCH_WRITE_LIMIT
+from services.customer_stats import customer_stats_update
+from services.rollups import apply_monthly_rollups, monthly_rollup_deltas, merge_rollup_deltas, write_rollup_deltas
+from services.data_versions import bump_data_versions
+from services.overdue_index import refresh_overdue_customers
+from datetime import datetime
 
 payments_api_bp = Blueprint('payments_api', __name__, url_prefix='/api')
 
+# Keeps every ticket's payments, rollup updates, ticket update and customer update within a single batch
+MAX_BATCH_PAYMENTS = 240
+# Collections whose data versions a batch of payments bumps
+VERSIONED_COLLECTIONS = ('tickets', 'payments', 'customers')
+
 @payments_api_bp.route('/payments', methods=['GET'])
 def get_all_payments():
     """Get all payments from the global payments collection."""
@@ -21,33 +31,134 @@ def get_all_payments():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _ticket_totals_delta(old_payment, new_payment):
+    """
+    Build an atomic ticket update that moves the payment-derived totals from
+    old_payment to new_payment. Either side may be None (payment added/removed).
+    Returns None when no total changes.
+    """
+    old_payment = old_payment or {}
+    new_payment = new_payment or {}
+    interest_delta = new_payment.get('interestPaid', 0) - old_payment.get('interestPaid', 0)
+    months_delta = new_payment.get('monthsPaid', 0) - old_payment.get('monthsPaid', 0)
+    principal_delta = new_payment.get('principalPaid', 0) - old_payment.get('principalPaid', 0)
+    
+    if not (interest_delta or months_delta or principal_delta):
+        return None
+    
+    return {
+        'totalInterestReceived': increment(interest_delta),
+        'interestReceivedMonths': increment(months_delta),
+        'pendingPrincipal': increment(-principal_delta)
+    }
+
+def _read_payment_owners(transaction, payment_data):
+    """
+    Read the ticket and customer a payment belongs to inside a transaction.
+    Returns (ticket_ref, customer_ref, ticket_data); refs are None for missing documents.
+    """
+    db = get_db()
+    ticket_id = payment_data.get('ticketId')
+    if not ticket_id:
+        return None, None, None
+    
+    ticket_ref = db.collection('tickets').document(ticket_id)
+    ticket_doc = ticket_ref.get(transaction=transaction)
+    if not ticket_doc.exists:
+        return None, None, None
+    
+    ticket_data = ticket_doc.to_dict()
+    customer_ref = None
+    customer_id = ticket_data.get('customerId')
+    if customer_id:
+        customer_ref = db.collection('customers').document(customer_id)
+        if not customer_ref.get(transaction=transaction).exists:
+            customer_ref = None
+    
+    return ticket_ref, customer_ref, ticket_data
+
+def _apply_totals_delta(transaction, ticket_ref, customer_ref, ticket_data, old_payment, new_payment):
+    """Shift ticket totals and the customer's outstanding by the change in a payment."""
+    ticket_update = _ticket_totals_delta(old_payment, new_payment)
+    if not ticket_ref or not ticket_update:
+        return
+    
+    transaction.update(ticket_ref, ticket_update)
+    
+    # Outstanding only counts active tickets
+    principal_delta = (new_payment or {}).get('principalPaid', 0) - old_payment.get('principalPaid', 0)
+    customer_update = customer_stats_update(outstanding=-principal_delta)
+    if customer_ref and customer_update and ticket_data.get('status') == 'Active':
+        transaction.update(customer_ref, customer_update)
+
+def _edit_payment_transaction(transaction, payment_id, update_data):
+    """
+    Update a payment and shift its ticket's totals by the difference.
+    Returns (found, customer id of the ticket).
+    """
+    db = get_db()
+    payment_ref = db.collection('payments').document(payment_id)
+    payment_doc = payment_ref.get(transaction=transaction)
+    
+    if not payment_doc.exists:
+        return False, None
+    
+    payment_data = payment_doc.to_dict()
+    update_data = dict(update_data)
+    
+    if update_data.get('interestPaid', 0) > 0:
+        update_data['interestReceivedAt'] = payment_data.get('interestReceivedAt')
+    if update_data.get('principalPaid', 0) > 0:
+        update_data['principalReceivedAt'] = payment_data.get('principalReceivedAt')
+    
+    # All reads must happen before the first write in a transaction
+    ticket_ref, customer_ref, ticket_data = _read_payment_owners(transaction, payment_data)
+    
+    new_payment_data = {**payment_data, **update_data}
+    transaction.update(payment_ref, update_data)
+    _apply_totals_delta(transaction, ticket_ref, customer_ref, ticket_data, payment_data, new_payment_data)
+    apply_monthly_rollups(transaction, db, payment_data, new_payment_data)
+    bump_data_versions(transaction, db, 'tickets', 'payments', 'customers')
+    
+    return True, (ticket_data or {}).get('customerId')
+
+def _delete_payment_transaction(transaction, payment_id):
+    """
+    Delete a payment and remove its amounts from the ticket's totals.
+    Returns (found, customer id of the ticket).
+    """
+    db = get_db()
+    payment_ref = db.collection('payments').document(payment_id)
+    payment_doc = payment_ref.get(transaction=transaction)
+    
+    if not payment_doc.exists:
+        return False, None
+    
+    payment_data = payment_doc.to_dict()
+    
+    ticket_ref, customer_ref, ticket_data = _read_payment_owners(transaction, payment_data)
+    
+    transaction.delete(payment_ref)
+    _apply_totals_delta(transaction, ticket_ref, customer_ref, ticket_data, payment_data, None)
+    apply_monthly_rollups(transaction, db, payment_data, None)
+    bump_data_versions(transaction, db, 'tickets', 'payments', 'customers')
+    
+    return True, (ticket_data or {}).get('customerId')
+
 @payments_api_bp.route('/payments/<payment_id>', methods=['PUT'])
 def edit_payment(payment_id):
     """Edit a payment record"""
     try:
         data = request.json
-        db = get_db()
-        
-        payment_ref = db.collection('payments').document(payment_id)
-        payment_doc = payment_ref.get()
-        
-        if not payment_doc.exists:
-            return jsonify({'error': 'Payment not found'}), 404
-        
-        payment_data = payment_doc.to_dict()
         
         # Build update data
         update_data = {}
         
         if 'interestPaid' in data:
             update_data['interestPaid'] = float(data.get('interestPaid', 0))
-            if update_data['interestPaid'] > 0:
-                update_data['interestReceivedAt'] = payment_data.get('interestReceivedAt')
         
         if 'principalPaid' in data:
             update_data['principalPaid'] = float(data.get('principalPaid', 0))
-            if update_data['principalPaid'] > 0:
-                update_data['principalReceivedAt'] = payment_data.get('principalReceivedAt')
         
         if 'monthsPaid' in data:
             update_data['monthsPaid'] = float(data.get('monthsPaid', 0))
@@ -64,43 +175,13 @@ def edit_payment(payment_id):
         if not update_data:
             return jsonify({'error': 'No fields to update'}), 400
         
-        # Update the payment
-        payment_ref.update(update_data)
-        
-        # Also update the ticket's totals if amounts changed
-        ticket_id = payment_data.get('ticketId')
-        if ticket_id and ('interestPaid' in data or 'principalPaid' in data or 'monthsPaid' in data):
-            # Recalculate ticket totals by summing all payments for this ticket
-            ticket_ref = db.collection('tickets').document(ticket_id)
-            ticket_doc = ticket_ref.get()
-            
-            if ticket_doc.exists:
-                ticket = ticket_doc.to_dict()
-                
-                # Get all payments for this ticket
-                payments_query = db.collection('payments').where('ticketId', '==', ticket_id)
-                all_payments = list(payments_query.stream())
-                
-                total_interest = 0
-                total_months = 0
-                total_principal_paid = 0
-                
-                for pay_doc in all_payments:
-                    pay = pay_doc.to_dict()
-                    total_interest += pay.get('interestPaid', 0)
-                    total_months += pay.get('monthsPaid', 0)
-                    total_principal_paid += pay.get('principalPaid', 0)
-                
-                # Update ticket with new totals
-                original_principal = ticket.get('principal', 0)
-                pending_principal = original_principal - total_principal_paid
-                
-                ticket_ref.update({
-                    'totalInterestReceived': total_interest,
-                    'interestReceivedMonths': total_months,
-                    'pendingPrincipal': pending_principal
-                })
+        # Update the payment and apply the amount deltas to the ticket atomically.
+        # Totals are verified separately by migrations/verify_ticket_totals.py.
+        found, customer_id = run_transaction(_edit_payment_transaction, payment_id, update_data)
+        if not found:
+            return jsonify({'error': 'Payment not found'}), 404
         
+        refresh_overdue_customers(get_db(), [customer_id])
         return jsonify({'message': 'Payment updated successfully'}), 200
         
     except ValueError as e:
@@ -112,55 +193,207 @@ def edit_payment(payment_id):
 def delete_payment(payment_id):
     """Delete a payment record"""
     try:
+        found, customer_id = run_transaction(_delete_payment_transaction, payment_id)
+        if not found:
+            return jsonify({'error': 'Payment not found'}), 404
+        
+        refresh_overdue_customers(get_db(), [customer_id])
+        return jsonify({'message': 'Payment deleted successfully'}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _parse_batch_item(item):
+    """Validate one batch payment item. Returns (parsed, error)."""
+    if not isinstance(item, dict):
+        return None, 'Invalid payment item'
+    
+    ticket_id = item.get('ticketId')
+    if not ticket_id:
+        return None, 'ticketId is required'
+    if not isinstance(ticket_id, str):
+        return None, 'ticketId must be a string'
+    
+    payment_date = item.get('date')
+    if not payment_date:
+        return None, 'Payment date is required'
+    if not isinstance(payment_date, str):
+        return None, 'Payment date must be a YYYY-MM-DD string'
+    # Store only date (YYYY-MM-DD format), no time component
+    if 'T' in payment_date:
+        payment_date = payment_date.split('T')[0]
+    
+    try:
+        parsed = {
+            'ticketId': ticket_id,
+            'date': payment_date,
+            'interestPaid': float(item.get('interestPaid', 0) or 0),
+            'principalPaid': float(item.get('principalPaid', 0) or 0),
+            'monthsPaid': float(item.get('monthsPaid', 0) or 0)
+        }
+    except (TypeError, ValueError) as e:
+        return None, f'Invalid value: {str(e)}'
+    
+    return parsed, None
+
+@payments_api_bp.route('/payments/batch', methods=['POST'])
+def record_payments_batch():
+    """
+    Record many payments across tickets in one request.
+    Request body:
+    {
+        "payments": [
+            {"ticketId": "...", "date": "YYYY-MM-DD", "interestPaid": 0, "principalPaid": 0, "monthsPaid": 0},
+            ...
+        ]
+    }
+    All referenced tickets are loaded with one batched read, the new totals are
+    computed in memory and the writes are committed in grouped batches (a ticket's
+    payments, its monthly rollups, its update and its customer's stats update always
+    share a batch). Invalid items are reported
+    individually without failing the rest.
+    """
+    try:
+        data = request.json or {}
+        items = data.get('payments')
+        
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'payments must be a non-empty list'}), 400
+        if len(items) > MAX_BATCH_PAYMENTS:
+            return jsonify({'error': f'At most {MAX_BATCH_PAYMENTS} payments per batch'}), 400
+        
         db = get_db()
+        results = [None] * len(items)
+        parsed_items = []
         
-        payment_ref = db.collection('payments').document(payment_id)
-        payment_doc = payment_ref.get()
+        for index, item in enumerate(items):
+            parsed, error = _parse_batch_item(item)
+            if error:
+                results[index] = {'index': index, 'status': 'error', 'error': error}
+            else:
+                parsed_items.append((index, parsed))
         
-        if not payment_doc.exists:
-            return jsonify({'error': 'Payment not found'}), 404
+        # Load every referenced ticket with a single batched read
+        ticket_ids = list(dict.fromkeys(parsed['ticketId'] for _, parsed in parsed_items))
+        ticket_refs = [db.collection('tickets').document(ticket_id) for ticket_id in ticket_ids]
+        tickets = {}
+        if ticket_refs:
+            for snapshot in db.get_all(ticket_refs):
+                if snapshot.exists:
+                    tickets[snapshot.id] = snapshot.to_dict()
+        
+        # Load the owning customers the same way so their stats can be updated
+        customer_ids = list(dict.fromkeys(
+            ticket['customerId'] for ticket in tickets.values() if ticket.get('customerId')
+        ))
+        customer_refs = [db.collection('customers').document(customer_id) for customer_id in customer_ids]
+        existing_customers = set()
+        if customer_refs:
+            for snapshot in db.get_all(customer_refs):
+                if snapshot.exists:
+                    existing_customers.add(snapshot.id)
         
-        payment_data = payment_doc.to_dict()
-        ticket_id = payment_data.get('ticketId')
+        # Apply payments in request order, grouping the writes per ticket
+        current_datetime = datetime.now().isoformat()
+        groups = {}
+        for index, parsed in parsed_items:
+            ticket_id = parsed['ticketId']
+            ticket_data = tickets.get(ticket_id)
+            if ticket_data is None:
+                results[index] = {'index': index, 'ticketId': ticket_id, 'status': 'error', 'error': 'Ticket not found'}
+                continue
+            
+            group = groups.setdefault(ticket_id, {
+                'pendingPrincipal': ticket_data.get('pendingPrincipal', ticket_data.get('principal')),
+                'interest': 0,
+                'months': 0,
+                'principal': 0,
+                'rollups': {},
+                'payments': []
+            })
+            
+            group['pendingPrincipal'] -= parsed['principalPaid']
+            group['interest'] += parsed['interestPaid']
+            group['months'] += parsed['monthsPaid']
+            group['principal'] += parsed['principalPaid']
+            
+            payment_ref = db.collection('payments').document()
+            merge_rollup_deltas(group['rollups'], monthly_rollup_deltas(None, parsed))
+            group['payments'].append((index, payment_ref, {
+                'ticketId': ticket_id,
+                'customerName': ticket_data.get('customerName', 'Unknown'),  # Cached on the ticket
+                'billNumber': ticket_data.get('billNumber', ''),
+                'articleName': ticket_data.get('articleName', ''),
+                'date': parsed['date'],
+                'interestPaid': parsed['interestPaid'],
+                'interestReceivedAt': parsed['date'] if parsed['interestPaid'] > 0 else None,
+                'principalPaid': parsed['principalPaid'],
+                'principalReceivedAt': parsed['date'] if parsed['principalPaid'] > 0 else None,
+                'monthsPaid': parsed['monthsPaid'],
+                'remainingPrincipal': group['pendingPrincipal']
+            }))
         
-        # Delete the payment
-        payment_ref.delete()
+        # Commit in grouped batches of at most BATCH_WRITE_LIMIT writes,
+        # keeping one write per bumped collection for the data version bumps
+        batch = db.batch()
+        batch_ops = 0
+        new_pending_principals = {}
         
-        # Recalculate ticket totals if it's linked to a ticket
-        if ticket_id:
-            ticket_ref = db.collection('tickets').document(ticket_id)
-            ticket_doc = ticket_ref.get()
+        for ticket_id, group in groups.items():
+            ticket_data = tickets[ticket_id]
+            customer_id = ticket_data.get('customerId')
+            customer_update = None
+            if customer_id in existing_customers and ticket_data.get('status') == 'Active':
+                customer_update = customer_stats_update(outstanding=-group['principal'])
+            
+            group_ops = len(group['payments']) + len(group['rollups']) + (2 if customer_update else 1)
+            if batch_ops and batch_ops + group_ops + len(VERSIONED_COLLECTIONS) > BATCH_WRITE_LIMIT:
+                bump_data_versions(batch, db, *VERSIONED_COLLECTIONS)
+                batch.commit()
+                batch = db.batch()
+                batch_ops = 0
+            
+            for index, payment_ref, payment_data in group['payments']:
+                batch.set(payment_ref, payment_data)
+                results[index] = {
+                    'index': index,
+                    'ticketId': ticket_id,
+                    'status': 'recorded',
+                    'paymentId': payment_ref.id,
+                    'remainingPrincipal': payment_data['remainingPrincipal']
+                }
             
-            if ticket_doc.exists:
-                ticket = ticket_doc.to_dict()
-                
-                # Get all remaining payments for this ticket
-                payments_query = db.collection('payments').where('ticketId', '==', ticket_id)
-                all_payments = list(payments_query.stream())
-                
-                total_interest = 0
-                total_months = 0
-                total_principal_paid = 0
-                
-                for pay_doc in all_payments:
-                    pay = pay_doc.to_dict()
-                    total_interest += pay.get('interestPaid', 0)
-                    total_months += pay.get('monthsPaid', 0)
-                    total_principal_paid += pay.get('principalPaid', 0)
-                
-                # Update ticket with new totals
-                original_principal = ticket.get('principal', 0)
-                pending_principal = original_principal - total_principal_paid
-                
-                ticket_ref.update({
-                    'totalInterestReceived': total_interest,
-                    'interestReceivedMonths': total_months,
-                    'pendingPrincipal': pending_principal
-                })
+            update_data = {
+                'pendingPrincipal': increment(-group['principal']),
+                'totalInterestReceived': increment(group['interest']),
+                'interestReceivedMonths': increment(group['months']),
+                'lastPaymentDate': current_datetime
+            }
+            if group['pendingPrincipal'] == 0:
+                update_data['interestPendingMonths'] = 0
+            batch.update(db.collection('tickets').document(ticket_id), update_data)
+            write_rollup_deltas(batch, db, group['rollups'])
+            if customer_update:
+                batch.update(db.collection('customers').document(customer_id), customer_update)
+            batch_ops += group_ops
+            
+            new_pending_principals[ticket_id] = group['pendingPrincipal']
         
-        return jsonify({'message': 'Payment deleted successfully'}), 200
+        if batch_ops:
+            bump_data_versions(batch, db, *VERSIONED_COLLECTIONS)
+            batch.commit()
+        
+        refresh_overdue_customers(db, [tickets[ticket_id].get('customerId') for ticket_id in groups])
+        
+        recorded = sum(1 for result in results if result['status'] == 'recorded')
+        
+        return jsonify({
+            'message': f'{recorded} of {len(items)} payments recorded successfully',
+            'recorded': recorded,
+            'failed': len(items) - recorded,
+            'results': results,
+            'newPendingPrincipals': new_pending_principals
+        }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-
-
@@ -0,0 +1,169 @@
+from flask import Blueprint, request, jsonify, send_file
+from services.db import get_db
+from services.data_versions import get_data_versions
+from services.report_cache import report_cache_key, get_cached_report, store_report
+from services.background_jobs import register_job_handler, create_job, submit_job, get_job, job_in_progress
+from services.columnar_export import write_collection, EXPORT_COLUMNS, FORMATS as COLUMNAR_FORMATS
+from routes.reports import payment_report_window, payment_report_rows, outstanding_loans_rows, build_timeseries_report
+from datetime import datetime
+import json
+import os
+
+report_jobs_bp = Blueprint('report_jobs', __name__, url_prefix='/api/reports/jobs')
+
+REPORT_JOB = 'report'
+REPORT_TYPES = ('payment-report', 'outstanding-loans', 'timeseries', 'columnar')
+
+def _write_lines(path, lines):
+    with open(path, 'w', newline='', encoding='utf-8') as output:
+        for line in lines:
+            output.write(line)
+
+def _write_json(path, data):
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump(data, output)
+
+def _normalize_params(report, params):
+    """Request params as strings, with defaults that depend on the day made explicit for the cache key."""
+    params = {key: str(value) for key, value in (params or {}).items()}
+    if report == 'timeseries':
+        params.setdefault('to', datetime.now().date().isoformat())
+    return params
+
+def _report_spec(report, params):
+    """
+    Return (collections read, file extension, mimetype, build(db, path)) for a report request.
+    Raises ValueError for an unknown report type or invalid params.
+    """
+    if report == 'payment-report':
+        _, start_date, end_date = payment_report_window(params)
+        return ('tickets', 'payments'), '.csv', 'text/csv', \
+            lambda db, path: _write_lines(path, payment_report_rows(db, start_date, end_date))
+    if report == 'outstanding-loans':
+        return ('tickets',), '.csv', 'text/csv', \
+            lambda db, path: _write_lines(path, outstanding_loans_rows(db))
+    if report == 'timeseries':
+        return ('payments', 'tickets'), '.json', 'application/json', \
+            lambda db, path: _write_json(path, build_timeseries_report(db, params))
+    if report == 'columnar':
+        collection = params.get('collection')
+        fmt = params.get('format', 'parquet')
+        if collection not in EXPORT_COLUMNS:
+            raise ValueError(f"collection must be one of {', '.join(EXPORT_COLUMNS)}")
+        if fmt not in COLUMNAR_FORMATS:
+            raise ValueError(f"format must be one of {', '.join(COLUMNAR_FORMATS)}")
+        extension, mimetype = COLUMNAR_FORMATS[fmt]
+        return (collection,), extension, mimetype, \
+            lambda db, path: write_collection(db, collection, path, fmt)
+    raise ValueError(f"type must be one of {', '.join(REPORT_TYPES)}")
+
+def run_report_job(params, report_progress):
+    """Background job: generate a report file into the cache unless it is already there."""
+    report = params['report']
+    report_params = params.get('params') or {}
+    cache_key = params['cacheKey']
+    _, extension, mimetype, build = _report_spec(report, report_params)
+
+    db = get_db()
+    path = get_cached_report(cache_key, extension)
+    if not path:
+        report_progress(stage='generating')
+        path = store_report(cache_key, extension, lambda output_path: build(db, output_path))
+
+    return {
+        'report': report,
+        'cacheKey': cache_key,
+        'extension': extension,
+        'mimetype': mimetype,
+        'size': os.path.getsize(path)
+    }
+
+register_job_handler(REPORT_JOB, run_report_job)
+
+def _job_response(job):
+    params = job.get('params') or {}
+    response = {
+        'jobId': job['id'],
+        'status': job.get('status'),
+        'report': params.get('report'),
+        'params': params.get('params'),
+        'progress': job.get('progress'),
+        'result': job.get('result'),
+        'error': job.get('error'),
+        'createdAt': job.get('createdAt'),
+        'completedAt': job.get('completedAt')
+    }
+    if job.get('status') == 'completed':
+        response['downloadUrl'] = f"{report_jobs_bp.url_prefix}/{job['id']}/result"
+    return response
+
+@report_jobs_bp.route('', methods=['POST'])
+def submit_report_job():
+    """
+    Generate a report in the background.
+    Body: {"type": "payment-report" | "outstanding-loans" | "timeseries" | "columnar",
+           "params": {...same query params as the synchronous endpoint...}}
+    Identical requests share one job while the data is unchanged, and a request
+    whose result is already cached returns the completed job straight away.
+    """
+    try:
+        data = request.json or {}
+        report = data.get('type')
+        params = _normalize_params(report, data.get('params'))
+        collections, extension, _, _ = _report_spec(report, params)
+
+        db = get_db()
+        cache_key = report_cache_key(report, params, get_data_versions(db, *collections))
+        job_id = f'report_{cache_key[:40]}'
+
+        job = get_job(job_id)
+        if job_in_progress(job):
+            return jsonify(_job_response(job)), 202
+        if job and job.get('status') == 'completed' and get_cached_report(cache_key, extension):
+            return jsonify(_job_response(job)), 200
+
+        # New request, failed or interrupted earlier, or the file is not cached on this instance
+        create_job(REPORT_JOB, {'report': report, 'params': params, 'cacheKey': cache_key}, job_id)
+        submit_job(job_id)
+
+        return jsonify(_job_response(get_job(job_id))), 202
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@report_jobs_bp.route('/<job_id>', methods=['GET'])
+def get_report_job(job_id):
+    """Get the status of a report job, with a downloadUrl once it has completed."""
+    try:
+        job = get_job(job_id)
+        if not job or job.get('type') != REPORT_JOB:
+            return jsonify({'error': 'Report job not found'}), 404
+
+        return jsonify(_job_response(job)), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@report_jobs_bp.route('/<job_id>/result', methods=['GET'])
+def download_report_job_result(job_id):
+    """Download the file generated by a completed report job."""
+    try:
+        job = get_job(job_id)
+        if not job or job.get('type') != REPORT_JOB:
+            return jsonify({'error': 'Report job not found'}), 404
+        if job.get('status') != 'completed':
+            return jsonify({'error': 'Report is not ready', 'status': job.get('status')}), 409
+
+        result = job.get('result') or {}
+        path = get_cached_report(result.get('cacheKey'), result.get('extension'))
+        if not path:
+            return jsonify({'error': 'Report result is no longer cached, submit the job again'}), 410
+
+        report = (job.get('params') or {}).get('report')
+        filename = f"{report}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{result.get('extension')}"
+        return send_file(path, mimetype=result.get('mimetype'), as_attachment=True, download_name=filename)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
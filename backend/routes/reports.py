@@ -1,10 +1,15 @@
-from flask import Blueprint, request, jsonify, Response
+from flask import Blueprint, request, jsonify, Response, stream_with_context, send_file
 from services.db import get_db
+from services.rollups import monthly_rollup_ref, rollups_meta_ref
+from services.dates import format_date, parse_date
+from services.timeseries import load_payment_columns, payment_timeseries
+from services.portfolio import cached_aging_report, load_active_ticket_columns, interest_forecast
+from services.columnar_export import write_collection, FORMATS as COLUMNAR_FORMATS
 from datetime import datetime
-from dateutil import parser
 from dateutil.relativedelta import relativedelta
 import csv
-from io import StringIO
+import heapq
+import tempfile
 
 reports_bp = Blueprint('reports', __name__, url_prefix='/api/reports')
 
@@ -14,6 +19,10 @@ def monthly_interest_report():
     Get total interest received for a specific month.
     Query params:
     - month: YYYY-MM format (optional, defaults to current month)
+    - includePayments: 'true' to also return the payment rows (optional)
+    Totals come from the pre-aggregated monthly rollup document; the payment rows
+    (and the totals, until the rollups have been rebuilt once from the payments)
+    use a date range query.
     """
     try:
         db = get_db()
@@ -24,48 +33,56 @@ def monthly_interest_report():
             target_date = datetime.strptime(month_param, '%Y-%m')
         else:
             target_date = datetime.now()
+        include_payments = request.args.get('includePayments', 'false').lower() == 'true'
         
         # Calculate start and end of month
         start_of_month = target_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         end_of_month = start_of_month + relativedelta(months=1)
-        
-        # Query global payments collection
-        payments_ref = db.collection('payments')
-        docs = payments_ref.stream()
-        
-        total_interest = 0
-        total_principal = 0
-        payment_count = 0
-        payments_list = []
-        
-        for doc in docs:
-            payment = doc.to_dict()
-            payment_date = parser.isoparse(payment.get('date', ''))
-            
-            # Check if payment is in the target month
-            if start_of_month <= payment_date < end_of_month:
-                interest = payment.get('interestPaid', 0)
-                principal = payment.get('principalPaid', 0)
-                
-                total_interest += interest
-                total_principal += principal
-                payment_count += 1
-                
+        month = start_of_month.strftime('%Y-%m')
+        
+        rollup_doc = monthly_rollup_ref(db, month).get()
+        # Before the first rebuild a rollup holds only the deltas written since deploy
+        meta_doc = rollups_meta_ref(db).get()
+        use_rollup = rollup_doc.exists and meta_doc.exists and bool((meta_doc.to_dict() or {}).get('rebuiltAt'))
+        
+        payments_list = None
+        if include_payments or not use_rollup:
+            # Dates are stored as YYYY-MM-DD or ISO strings, so a string range selects the month
+            docs = db.collection('payments') \
+                .where('date', '>=', start_of_month.strftime('%Y-%m-%d')) \
+                .where('date', '<', end_of_month.strftime('%Y-%m-%d')) \
+                .order_by('date').stream()
+            payments_list = []
+            for doc in docs:
+                payment = doc.to_dict()
                 payments_list.append({
                     'id': doc.id,
                     'date': payment.get('date'),
                     'customerName': payment.get('customerName'),
-                    'interestPaid': interest,
-                    'principalPaid': principal
+                    'interestPaid': payment.get('interestPaid', 0),
+                    'principalPaid': payment.get('principalPaid', 0)
                 })
         
-        return jsonify({
-            'month': start_of_month.strftime('%Y-%m'),
+        if use_rollup:
+            rollup = rollup_doc.to_dict()
+            total_interest = rollup.get('interest', 0)
+            total_principal = rollup.get('principal', 0)
+            payment_count = rollup.get('count', 0)
+        else:
+            total_interest = sum(p['interestPaid'] for p in payments_list)
+            total_principal = sum(p['principalPaid'] for p in payments_list)
+            payment_count = len(payments_list)
+        
+        report = {
+            'month': month,
             'totalInterest': total_interest,
             'totalPrincipal': total_principal,
-            'paymentCount': payment_count,
-            'payments': payments_list
-        }), 200
+            'paymentCount': payment_count
+        }
+        if include_payments:
+            report['payments'] = payments_list
+        
+        return jsonify(report), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -107,232 +124,402 @@ def outstanding_loans_report():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@reports_bp.route('/export/payment-report', methods=['GET'])
-def export_payment_report():
+def _parse_period_bound(value, is_end):
+    """Parse YYYY-MM-DD, or YYYY-MM meaning the first/last day of that month."""
+    if len(value) == 7:
+        month_start = datetime.strptime(value, '%Y-%m').date()
+        return month_start + relativedelta(months=1, days=-1) if is_end else month_start
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def build_timeseries_report(db, args):
+    """Time series report body for query args; raises ValueError for bad args."""
+    granularity = args.get('granularity', 'month')
+    to_param = args.get('to')
+    from_param = args.get('from')
+    item_type = args.get('itemType')
+    
+    end_date = _parse_period_bound(to_param, True) if to_param else datetime.now().date()
+    if from_param:
+        start_date = _parse_period_bound(from_param, False)
+    else:
+        start_date = end_date - relativedelta(months=12) + relativedelta(days=1)
+    if start_date > end_date:
+        raise ValueError('from must not be after to')
+    
+    columns = load_payment_columns(db)
+    series = payment_timeseries(columns, granularity, start_date, end_date, item_type)
+    
+    return {
+        'granularity': granularity,
+        'from': start_date.isoformat(),
+        'to': end_date.isoformat(),
+        'itemType': item_type,
+        **series
+    }
+
+@reports_bp.route('/timeseries', methods=['GET'])
+def payment_timeseries_report():
     """
-    Export payment report to CSV.
+    Interest and principal received per day, week or month.
     Query params:
-    - filterType: 'month', 'range', 'all' (required)
-    - month: YYYY-MM format (required if filterType is 'month')
-    - startMonth: YYYY-MM format (required if filterType is 'range')
-    - endMonth: YYYY-MM format (required if filterType is 'range')
+    - granularity: 'day', 'week' or 'month' (optional, defaults to 'month')
+    - from: YYYY-MM-DD or YYYY-MM (optional, defaults to 12 months before 'to')
+    - to: YYYY-MM-DD or YYYY-MM, inclusive (optional, defaults to today)
+    - itemType: only payments on tickets of this item type, e.g. Gold (optional)
     """
     try:
-        db = get_db()
-        filter_type = request.args.get('filterType', 'month')
-        
-        # Get all payments and tickets
-        payments_ref = db.collection('payments')
-        all_payments = [{'id': doc.id, **doc.to_dict()} for doc in payments_ref.stream()]
-        
-        tickets_ref = db.collection('tickets')
-        all_tickets = [{'id': doc.id, **doc.to_dict()} for doc in tickets_ref.stream()]
-        
-        # Filter based on type
-        filtered_payments = []
-        filtered_tickets = []
-        
-        if filter_type == 'all':
-            filtered_payments = all_payments
-            filtered_tickets = all_tickets
-        elif filter_type == 'month':
-            month_param = request.args.get('month')
-            if not month_param:
-                return jsonify({'error': 'month parameter is required for month filter'}), 400
-            
-            target_date = datetime.strptime(month_param, '%Y-%m')
-            start_of_month = target_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            end_of_month = start_of_month + relativedelta(months=1)
-            
-            filtered_payments = [
-                p for p in all_payments 
-                if start_of_month <= parser.isoparse(p.get('date', '')) < end_of_month
-            ]
-            filtered_tickets = [
-                t for t in all_tickets
-                if start_of_month <= parser.isoparse(t.get('startDate', '')) < end_of_month
-            ]
-        elif filter_type == 'range':
-            start_month = request.args.get('startMonth')
-            end_month = request.args.get('endMonth')
-            
-            if not start_month or not end_month:
-                return jsonify({'error': 'startMonth and endMonth parameters are required for range filter'}), 400
-            
-            start_date = datetime.strptime(start_month, '%Y-%m')
-            end_date = datetime.strptime(end_month, '%Y-%m')
-            end_date = end_date + relativedelta(months=1)
-            
-            filtered_payments = [
-                p for p in all_payments 
-                if start_date <= parser.isoparse(p.get('date', '')) < end_date
-            ]
-            filtered_tickets = [
-                t for t in all_tickets
-                if start_date <= parser.isoparse(t.get('startDate', '')) < end_date
-            ]
+        return jsonify(build_timeseries_report(get_db(), request.args)), 200
         
-        # Create CSV
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow(['Date', 'Bill Number', 'Customer Name', 'Type', 'Interest Paid (₹)', 'Principal Amount (₹)'])
-        
-        # Combine tickets (investments) and payments into transactions
-        transactions = []
+    except ImportError as e:
+        return jsonify({'error': str(e)}), 501
+    except ValueError as e:
+        return jsonify({'error': f'Invalid value: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@reports_bp.route('/aging', methods=['GET'])
+def loan_aging_report():
+    """
+    Outstanding principal and interest due of active tickets split into aging
+    buckets (0-3, 3-6, 6-12, 12+ months of interest pending) per item type.
+    Computed in one pass over active tickets and cached until tickets, payments
+    or the date change.
+    """
+    try:
+        return jsonify(cached_aging_report(get_db(), datetime.now().date())), 200
         
-        for ticket in filtered_tickets:
-            transactions.append({
+    except ImportError as e:
+        return jsonify({'error': str(e)}), 501
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@reports_bp.route('/forecast', methods=['GET'])
+def interest_forecast_report():
+    """
+    Projected interest inflow per month from all active tickets.
+    Query params:
+    - months: number of months to project, starting with the current month (optional, defaults to 12, max 60)
+    """
+    try:
+        months = int(request.args.get('months', 12))
+        _, columns = load_active_ticket_columns(get_db())
+        return jsonify(interest_forecast(columns, datetime.now().date(), months)), 200
+        
+    except ImportError as e:
+        return jsonify({'error': str(e)}), 501
+    except ValueError as e:
+        return jsonify({'error': f'Invalid value: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+class _CSVLine:
+    """File-like target that hands each CSV row back instead of buffering it."""
+    def write(self, value):
+        return value
+
+def _date_range_query(collection_ref, field, start_date, end_date):
+    """Query ordered by a date field (newest first), optionally limited to [start_date, end_date)."""
+    query = collection_ref
+    if start_date:
+        query = query.where(field, '>=', start_date.strftime('%Y-%m-%d'))
+    if end_date:
+        query = query.where(field, '<', end_date.strftime('%Y-%m-%d'))
+    return query.order_by(field, direction='DESCENDING')
+
+def _date_sort_key(value):
+    """
+    Wall-clock datetime of a stored date for ordering rows; a trailing Z or offset is
+    dropped so it compares with naive dates. Empty or unparseable dates sort as oldest.
+    """
+    try:
+        return parse_date(value).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return datetime.min
+
+def _in_date_order(transactions):
+    """
+    Re-order transactions read in descending date string order by their parsed date.
+    Every stored format starts with YYYY-MM-DD, so one day's rows are adjacent in
+    string order and only one day is held at a time; rows whose date does not parse
+    come last. Each transaction gets its key as 'sortKey'.
+    """
+    day = []
+    undated = []
+    for transaction in transactions:
+        key = _date_sort_key(transaction['date'])
+        transaction['sortKey'] = key
+        if key == datetime.min:
+            undated.append(transaction)
+            continue
+        if day and day[0]['sortKey'].date() != key.date():
+            yield from sorted(day, key=lambda t: t['sortKey'], reverse=True)
+            day = []
+        day.append(transaction)
+    yield from sorted(day, key=lambda t: t['sortKey'], reverse=True)
+    yield from undated
+
+def _stream_csv(rows, report_name):
+    """Pass CSV lines through; once headers are sent a failure can only be reported inside the file."""
+    try:
+        for row in rows:
+            yield row
+    except Exception as e:
+        print(f"{report_name} export failed: {str(e)}")
+        yield csv.writer(_CSVLine()).writerow(['Export failed', str(e)])
+
+def payment_report_window(args):
+    """
+    Resolve (filterType, start, end) for the payment report from query args.
+    start/end are None for 'all'; raises ValueError for missing or bad months.
+    """
+    filter_type = args.get('filterType', 'month')
+    start_date = None
+    end_date = None
+    
+    if filter_type == 'month':
+        month_param = args.get('month')
+        if not month_param:
+            raise ValueError('month parameter is required for month filter')
+        
+        target_date = datetime.strptime(month_param, '%Y-%m')
+        start_date = target_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        end_date = start_date + relativedelta(months=1)
+    elif filter_type == 'range':
+        start_month = args.get('startMonth')
+        end_month = args.get('endMonth')
+        
+        if not start_month or not end_month:
+            raise ValueError('startMonth and endMonth parameters are required for range filter')
+        
+        start_date = datetime.strptime(start_month, '%Y-%m')
+        end_date = datetime.strptime(end_month, '%Y-%m')
+        end_date = end_date + relativedelta(months=1)
+    
+    return filter_type, start_date, end_date
+
+def payment_report_rows(db, start_date, end_date):
+    """
+    CSV lines of the payment report: tickets (investments) and payments are read
+    with date range queries in descending date order, merged, and written row by
+    row with the summary totals accumulated along the way.
+    """
+    tickets_query = _date_range_query(db.collection('tickets'), 'startDate', start_date, end_date)
+    payments_query = _date_range_query(db.collection('payments'), 'date', start_date, end_date)
+    
+    def invested_transactions():
+        for doc in tickets_query.stream():
+            ticket = doc.to_dict()
+            yield {
                 'date': ticket.get('startDate', ''),
                 'billNumber': ticket.get('billNumber', ''),
-                'customerName': ticket.get('name', ''),
+                'customerName': ticket.get('customerName', ticket.get('name', '')),
                 'type': 'Invested',
                 'interestPaid': 0,
                 'principalPaid': ticket.get('principal', 0)
-            })
-        
-        for payment in filtered_payments:
+            }
+    
+    bill_numbers = {}
+    
+    def received_transactions():
+        for doc in payments_query.stream():
+            payment = doc.to_dict()
             # Get billNumber from payment, or fetch from ticket if not present
             bill_number = payment.get('billNumber', '')
+            ticket_id = payment.get('ticketId')
             
-            # If billNumber is not in payment, try to get it from the associated ticket
-            if not bill_number and payment.get('ticketId'):
-                try:
-                    ticket_ref = db.collection('tickets').document(payment.get('ticketId'))
-                    ticket_doc = ticket_ref.get()
-                    if ticket_doc.exists:
-                        bill_number = ticket_doc.to_dict().get('billNumber', '')
-                except:
-                    pass  # Silently fail if ticket not found
+            # If billNumber is not in payment, look it up once per ticket
+            if not bill_number and ticket_id:
+                if ticket_id not in bill_numbers:
+                    try:
+                        ticket_doc = db.collection('tickets').document(ticket_id).get()
+                        bill_numbers[ticket_id] = ticket_doc.to_dict().get('billNumber', '') if ticket_doc.exists else ''
+                    except Exception:
+                        bill_numbers[ticket_id] = ''  # Silently fail if ticket not found
+                bill_number = bill_numbers[ticket_id]
             
-            transactions.append({
+            yield {
                 'date': payment.get('date', ''),
                 'billNumber': bill_number,
                 'customerName': payment.get('customerName', ''),
                 'type': 'Received',
                 'interestPaid': payment.get('interestPaid', 0),
                 'principalPaid': payment.get('principalPaid', 0)
-            })
-        
-        # Sort by date descending
-        transactions.sort(key=lambda x: parser.isoparse(x['date']), reverse=True)
-        
-        # Write data rows
-        for transaction in transactions:
-            writer.writerow([
-                datetime.fromisoformat(transaction['date'].replace('Z', '+00:00')).strftime('%Y-%m-%d %H:%M:%S'),
-                transaction['billNumber'],
-                transaction['customerName'],
-                transaction['type'],
-                f"{transaction['interestPaid']:.2f}",
-                f"{transaction['principalPaid']:.2f}"
-            ])
-        
-        # Calculate totals
-        total_interest = sum(t['interestPaid'] for t in transactions)
-        total_principal_received = sum(t['principalPaid'] for t in transactions if t['type'] == 'Received')
-        total_principal_invested = sum(t['principalPaid'] for t in transactions if t['type'] == 'Invested')
-        
-        # Add summary rows
-        writer.writerow([])
-        writer.writerow(['Summary'])
-        writer.writerow(['Total Principal Invested', '', '', '', f"{total_principal_invested:.2f}"])
-        writer.writerow(['Total Interest Received', '', '', f"{total_interest:.2f}", ''])
-        writer.writerow(['Total Principal Received', '', '', '', f"{total_principal_received:.2f}"])
-        writer.writerow(['Number of Transactions', '', len(transactions), '', ''])
+            }
+    
+    writer = csv.writer(_CSVLine())
+    
+    # Write header
+    yield writer.writerow(['Date', 'Bill Number', 'Customer Name', 'Type', 'Interest Paid (₹)', 'Principal Amount (₹)'])
+    
+    total_interest = 0
+    total_principal_received = 0
+    total_principal_invested = 0
+    transaction_count = 0
+    
+    # Stored dates mix formats, so both streams are put in parsed date order
+    # before merging; comparing the raw strings would interleave them wrongly
+    transactions = heapq.merge(
+        _in_date_order(invested_transactions()),
+        _in_date_order(received_transactions()),
+        key=lambda t: t['sortKey'],
+        reverse=True
+    )
+    for transaction in transactions:
+        total_interest += transaction['interestPaid']
+        if transaction['type'] == 'Received':
+            total_principal_received += transaction['principalPaid']
+        else:
+            total_principal_invested += transaction['principalPaid']
+        transaction_count += 1
+        
+        yield writer.writerow([
+            format_date(transaction['date'], '%Y-%m-%d %H:%M:%S'),
+            transaction['billNumber'],
+            transaction['customerName'],
+            transaction['type'],
+            f"{transaction['interestPaid']:.2f}",
+            f"{transaction['principalPaid']:.2f}"
+        ])
+    
+    # Add summary rows
+    yield writer.writerow([])
+    yield writer.writerow(['Summary'])
+    yield writer.writerow(['Total Principal Invested', '', '', '', f"{total_principal_invested:.2f}"])
+    yield writer.writerow(['Total Interest Received', '', '', f"{total_interest:.2f}", ''])
+    yield writer.writerow(['Total Principal Received', '', '', '', f"{total_principal_received:.2f}"])
+    yield writer.writerow(['Number of Transactions', '', transaction_count, '', ''])
+
+@reports_bp.route('/export/payment-report', methods=['GET'])
+def export_payment_report():
+    """
+    Export payment report to CSV.
+    Query params:
+    - filterType: 'month', 'range', 'all' (required)
+    - month: YYYY-MM format (required if filterType is 'month')
+    - startMonth: YYYY-MM format (required if filterType is 'range')
+    - endMonth: YYYY-MM format (required if filterType is 'range')
+    The CSV is streamed row by row, see payment_report_rows.
+    """
+    try:
+        filter_type, start_date, end_date = payment_report_window(request.args)
+        rows = payment_report_rows(get_db(), start_date, end_date)
         
         # Prepare response
-        output.seek(0)
         filename = f"payment_report_{filter_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
         
         return Response(
-            output.getvalue(),
+            stream_with_context(_stream_csv(rows, 'Payment report')),
             mimetype='text/csv',
             headers={'Content-Disposition': f'attachment; filename={filename}'}
         )
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def outstanding_loans_rows(db):
+    """
+    CSV lines of the outstanding loans report: tickets with pending principal,
+    largest first, straight from an ordered range query, with the summary totals
+    accumulated while writing.
+    """
+    docs = db.collection('tickets') \
+        .where('pendingPrincipal', '>', 0) \
+        .order_by('pendingPrincipal', direction='DESCENDING') \
+        .stream()
+    
+    writer = csv.writer(_CSVLine())
+    
+    # Write header
+    yield writer.writerow([
+        'Ticket ID',
+        'Bill Number',
+        'Customer Name',
+        'Article Name',
+        'Original Principal (₹)',
+        'Pending Principal (₹)',
+        'Interest Rate (%)',
+        'Start Date',
+        'Status'
+    ])
+    
+    ticket_count = 0
+    total_outstanding = 0
+    
+    for doc in docs:
+        ticket = doc.to_dict()
+        pending_principal = ticket.get('pendingPrincipal', 0)
+        total_outstanding += pending_principal
+        ticket_count += 1
+        
+        yield writer.writerow([
+            doc.id,
+            ticket.get('billNumber', ''),
+            ticket.get('customerName', ticket.get('name', '')),
+            ticket.get('articleName', ''),
+            f"{ticket.get('principal', 0):.2f}",
+            f"{pending_principal:.2f}",
+            f"{ticket.get('interestPercentage', 0):.2f}",
+            format_date(ticket.get('startDate', ''), '%Y-%m-%d'),
+            ticket.get('status', '')
+        ])
+    
+    # Add summary rows
+    yield writer.writerow([])
+    yield writer.writerow(['Summary'])
+    yield writer.writerow(['Total Outstanding Principal', '', '', '', f"{total_outstanding:.2f}", '', '', ''])
+    yield writer.writerow(['Number of Outstanding Tickets', '', ticket_count, '', '', '', '', ''])
+
 @reports_bp.route('/export/outstanding-loans', methods=['GET'])
 def export_outstanding_loans():
-    """Export outstanding loans report to CSV."""
+    """Export outstanding loans report to CSV, streamed row by row."""
     try:
-        db = get_db()
-        tickets_ref = db.collection('tickets')
-        docs = tickets_ref.stream()
-        
-        # Create CSV
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow([
-            'Ticket ID',
-            'Bill Number',
-            'Customer Name',
-            'Article Name',
-            'Original Principal (₹)',
-            'Pending Principal (₹)',
-            'Interest Rate (%)',
-            'Start Date',
-            'Status'
-        ])
-        
-        outstanding_tickets = []
-        total_outstanding = 0
-        
-        for doc in docs:
-            ticket = doc.to_dict()
-            pending_principal = ticket.get('pendingPrincipal', 0)
-            
-            if pending_principal > 0:
-                outstanding_tickets.append({
-                    'id': doc.id,
-                    'billNumber': ticket.get('billNumber', ''),
-                    'name': ticket.get('name', ''),
-                    'articleName': ticket.get('articleName', ''),
-                    'principal': ticket.get('principal', 0),
-                    'pendingPrincipal': pending_principal,
-                    'interestPercentage': ticket.get('interestPercentage', 0),
-                    'startDate': ticket.get('startDate', ''),
-                    'status': ticket.get('status', '')
-                })
-                total_outstanding += pending_principal
-        
-        # Sort by pending principal descending
-        outstanding_tickets.sort(key=lambda x: x['pendingPrincipal'], reverse=True)
-        
-        # Write data rows
-        for ticket in outstanding_tickets:
-            writer.writerow([
-                ticket['id'],
-                ticket['billNumber'],
-                ticket['name'],
-                ticket['articleName'],
-                f"{ticket['principal']:.2f}",
-                f"{ticket['pendingPrincipal']:.2f}",
-                f"{ticket['interestPercentage']:.2f}",
-                datetime.fromisoformat(ticket['startDate'].replace('Z', '+00:00')).strftime('%Y-%m-%d'),
-                ticket['status']
-            ])
-        
-        # Add summary rows
-        writer.writerow([])
-        writer.writerow(['Summary'])
-        writer.writerow(['Total Outstanding Principal', '', '', '', f"{total_outstanding:.2f}", '', '', ''])
-        writer.writerow(['Number of Outstanding Tickets', '', len(outstanding_tickets), '', '', '', '', ''])
+        rows = outstanding_loans_rows(get_db())
         
         # Prepare response
-        output.seek(0)
         filename = f"outstanding_loans_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
         
         return Response(
-            output.getvalue(),
+            stream_with_context(_stream_csv(rows, 'Outstanding loans')),
             mimetype='text/csv',
             headers={'Content-Disposition': f'attachment; filename={filename}'}
         )
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@reports_bp.route('/export/columnar', methods=['GET'])
+def export_columnar():
+    """
+    Export a collection as typed columns for analytics tools.
+    Query params:
+    - collection: 'tickets', 'payments' or 'customers' (required)
+    - format: 'parquet' or 'arrow' (optional, defaults to 'parquet')
+    The file is written to a temporary file in row groups while streaming the
+    collection, then sent as an attachment.
+    """
+    try:
+        collection = request.args.get('collection')
+        fmt = request.args.get('format', 'parquet')
+        if not collection:
+            return jsonify({'error': 'collection parameter is required'}), 400
+        
+        output = tempfile.TemporaryFile()
+        try:
+            write_collection(get_db(), collection, output, fmt)
+        except Exception:
+            output.close()
+            raise
+        output.seek(0)
+        
+        extension, mimetype = COLUMNAR_FORMATS[fmt]
+        filename = f"{collection}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}"
+        return send_file(output, mimetype=mimetype, as_attachment=True, download_name=filename)
+        
+    except ImportError as e:
+        return jsonify({'error': str(e)}), 501
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
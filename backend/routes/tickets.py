@@ -1,5 +1,10 @@
 from flask import Blueprint, request, jsonify
-from services.db import get_db
+from services.db import get_db, increment, run_transaction
+from services.customer_stats import customer_stats_update
+from services.rollups import apply_monthly_rollups
+from services.dates import parse_date
+from services.data_versions import bump_data_versions
+from services.overdue_index import refresh_overdue_customers
 from datetime import datetime
 
 tickets_bp = Blueprint('tickets', __name__, url_prefix='/api/tickets')
@@ -81,11 +86,12 @@ def create_ticket():
         
         # Verify customer exists
         customer_ref = db.collection('customers').document(customer_id)
-        if not customer_ref.get().exists:
+        customer_doc = customer_ref.get()
+        if not customer_doc.exists:
             return jsonify({'error': 'Customer not found'}), 404
         
         # Get customer name for payment record
-        customer = customer_ref.get().to_dict()
+        customer = customer_doc.to_dict()
         customer_name = customer.get('name', 'Unknown')
         customer_phone = customer.get('phone', '')
         customer_address = customer.get('address', '')
@@ -121,9 +127,10 @@ def create_ticket():
             'createdAt': current_datetime
         }
         
-        # Create ticket
+        # Create ticket, first payment and customer stats in one atomic batch
+        batch = db.batch()
         ticket_ref = db.collection('tickets').document()
-        ticket_ref.set(ticket_data)
+        batch.set(ticket_ref, ticket_data)
         ticket_id = ticket_ref.id
         
         # Create initial payment record for first month interest (received upfront)
@@ -141,18 +148,15 @@ def create_ticket():
         
         # Add first month interest payment to global payments collection
         payment_ref = db.collection('payments').document()
-        payment_ref.set(payment_data)
+        batch.set(payment_ref, payment_data)
+        apply_monthly_rollups(batch, db, None, payment_data)
         
-        # Update customer stats
-        current_total_tickets = customer.get('totalTickets', 0)
-        current_active_tickets = customer.get('activeTickets', 0)
-        current_total_outstanding = customer.get('totalOutstanding', 0)
-        
-        customer_ref.update({
-            'totalTickets': current_total_tickets + 1,
-            'activeTickets': current_active_tickets + 1,
-            'totalOutstanding': current_total_outstanding + principal
-        })
+        # Update customer stats atomically
+        batch.update(customer_ref, customer_stats_update(total_tickets=1, active_tickets=1, outstanding=principal))
+        bump_data_versions(batch, db, 'tickets', 'payments', 'customers')
+        batch.commit()
+        # A back-dated ticket can be overdue from the start
+        refresh_overdue_customers(db, [customer_id])
         
         return jsonify({'id': ticket_id, 'message': 'Ticket created successfully with first month interest recorded'}), 201
         
@@ -192,13 +196,8 @@ def get_tickets():
             start_date_str = ticket.get('startDate')
             if start_date_str:
                 try:
-                    # Handle both date (YYYY-MM-DD) and datetime (ISO format) strings
-                    if 'T' in start_date_str:
-                        # ISO datetime format
-                        start_date = datetime.fromisoformat(start_date_str.replace('Z', '+00:00'))
-                    else:
-                        # Simple date format (YYYY-MM-DD)
-                        start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
+                    # Handles both date (YYYY-MM-DD) and datetime (ISO format) strings
+                    start_date = parse_date(start_date_str)
                     
                     # Use the new calculation that considers the day component
                     completed_months = calculate_completed_months(start_date, current_date)
@@ -233,13 +232,8 @@ def get_ticket(ticket_id):
             start_date_str = ticket.get('startDate')
             if start_date_str:
                 try:
-                    # Handle both date (YYYY-MM-DD) and datetime (ISO format) strings
-                    if 'T' in start_date_str:
-                        # ISO datetime format
-                        start_date = datetime.fromisoformat(start_date_str.replace('Z', '+00:00'))
-                    else:
-                        # Simple date format (YYYY-MM-DD)
-                        start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
+                    # Handles both date (YYYY-MM-DD) and datetime (ISO format) strings
+                    start_date = parse_date(start_date_str)
                     
                     # Use the new calculation that considers the day component
                     completed_months = calculate_completed_months(start_date, current_date)
@@ -256,82 +250,102 @@ def get_ticket(ticket_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _add_payment_transaction(transaction, ticket_id, payment_id, payment_fields):
+    """
+    Record a payment on a ticket and add its amounts to the ticket's totals.
+    Returns (found, new pending principal, customer id of the ticket).
+    """
+    db = get_db()
+    ticket_ref = db.collection('tickets').document(ticket_id)
+    ticket_doc = ticket_ref.get(transaction=transaction)
+    
+    if not ticket_doc.exists:
+        return False, None, None
+    
+    ticket_data = ticket_doc.to_dict()
+    current_pending_principal = ticket_data.get('pendingPrincipal', ticket_data.get('principal'))
+    new_pending_principal = current_pending_principal - payment_fields['principalPaid']
+    
+    # Get customer name from customer document
+    customer_id = ticket_data.get('customerId')
+    customer_name = 'Unknown'
+    customer_ref = None
+    if customer_id:
+        customer_ref = db.collection('customers').document(customer_id)
+        customer_doc = customer_ref.get(transaction=transaction)
+        if customer_doc.exists:
+            customer_name = customer_doc.to_dict().get('name', 'Unknown')
+        else:
+            customer_ref = None
+    
+    payment_data = {
+        'ticketId': ticket_id,  # Link to ticket
+        'customerName': customer_name,  # Fetch from customer record
+        'billNumber': ticket_data.get('billNumber', ''),  # Bill number from ticket
+        'articleName': ticket_data.get('articleName', ''),  # Item/article name from ticket
+        **payment_fields,
+        'remainingPrincipal': new_pending_principal
+    }
+    
+    # Add payment record to GLOBAL payments collection
+    transaction.set(db.collection('payments').document(payment_id), payment_data)
+    apply_monthly_rollups(transaction, db, None, payment_data)
+    
+    # Totals move by the payment's amounts, like edits and deletes of payments
+    update_data = {
+        'pendingPrincipal': increment(-payment_fields['principalPaid']),
+        'totalInterestReceived': increment(payment_fields['interestPaid']),
+        'interestReceivedMonths': increment(payment_fields['monthsPaid']),
+        'lastPaymentDate': datetime.now().isoformat()
+    }
+    
+    # If pending principal is now 0, also set interest pending months to 0
+    if new_pending_principal == 0:
+        update_data['interestPendingMonths'] = 0
+    
+    transaction.update(ticket_ref, update_data)
+    
+    # Principal repaid on an active ticket reduces the customer's outstanding
+    customer_update = customer_stats_update(outstanding=-payment_fields['principalPaid'])
+    if customer_ref and customer_update and ticket_data.get('status') == 'Active':
+        transaction.update(customer_ref, customer_update)
+    
+    bump_data_versions(transaction, db, 'tickets', 'payments', 'customers')
+    return True, new_pending_principal, customer_id
+
 @tickets_bp.route('/<ticket_id>/payments', methods=['POST'])
 def add_payment(ticket_id):
     try:
         data = request.json
         db = get_db()
         
-        ticket_ref = db.collection('tickets').document(ticket_id)
-        ticket_doc = ticket_ref.get()
-        
-        if not ticket_doc.exists:
-            return jsonify({'error': 'Ticket not found'}), 404
-            
-        ticket_data = ticket_doc.to_dict()
-        current_pending_principal = ticket_data.get('pendingPrincipal', ticket_data.get('principal'))
-        
         interest_paid = float(data.get('interestPaid', 0))
         principal_paid = float(data.get('principalPaid', 0))
         months_paid = float(data.get('monthsPaid', 0))
-        payment_date = data.get('date')
-        if not payment_date:
-            return jsonify({'error': 'Payment date is required'}), 400
-        
-        new_pending_principal = current_pending_principal - principal_paid
-        
-        current_datetime = datetime.now().isoformat()
         # Store only date (YYYY-MM-DD format), no time component
-        if payment_date:
-            payment_datetime = payment_date
-        else:
-            payment_datetime = current_datetime.split('T')[0]
-        
-        # Get customer name from customer document
-        customer_id = ticket_data.get('customerId')
-        customer_name = 'Unknown'
-        if customer_id:
-            customer_ref = db.collection('customers').document(customer_id)
-            customer_doc = customer_ref.get()
-            if customer_doc.exists:
-                customer_name = customer_doc.to_dict().get('name', 'Unknown')
+        payment_datetime = data.get('date')
+        if not payment_datetime:
+            return jsonify({'error': 'Payment date is required'}), 400
         
-        payment_data = {
-            'ticketId': ticket_id,  # Link to ticket
-            'customerName': customer_name,  # Fetch from customer record
-            'billNumber': ticket_data.get('billNumber', ''),  # Bill number from ticket
-            'articleName': ticket_data.get('articleName', ''),  # Item/article name from ticket
-            'date': payment_datetime,  # Payment date from frontend or current datetime
+        payment_fields = {
+            'date': payment_datetime,  # Payment date from frontend
             'interestPaid': interest_paid,
             'interestReceivedAt': payment_datetime if interest_paid > 0 else None,
             'principalPaid': principal_paid,
             'principalReceivedAt': payment_datetime if principal_paid > 0 else None,
-            'monthsPaid': months_paid,
-            'remainingPrincipal': new_pending_principal
+            'monthsPaid': months_paid
         }
         
-        # Add payment record to GLOBAL payments collection
-        payment_ref = db.collection('payments').document()
-        payment_ref.set(payment_data)
-        
-        # Calculate new totals for ticket
-        current_total_interest = ticket_data.get('totalInterestReceived', 0)
-        current_total_months = ticket_data.get('interestReceivedMonths', 0)
-        
-        # Prepare update data
-        update_data = {
-            'pendingPrincipal': new_pending_principal,
-            'totalInterestReceived': current_total_interest + interest_paid,
-            'interestReceivedMonths': current_total_months + months_paid,
-            'lastPaymentDate': current_datetime
-        }
-        
-        # If pending principal is now 0, also set interest pending months to 0
-        if new_pending_principal == 0:
-            update_data['interestPendingMonths'] = 0
+        # Read the ticket and apply the payment atomically, so concurrent payment
+        # edits and deletes are not overwritten
+        payment_id = db.collection('payments').document().id
+        found, new_pending_principal, customer_id = run_transaction(
+            _add_payment_transaction, ticket_id, payment_id, payment_fields
+        )
+        if not found:
+            return jsonify({'error': 'Ticket not found'}), 404
         
-        # Update ticket with new values
-        ticket_ref.update(update_data)
+        refresh_overdue_customers(db, [customer_id])
         
         return jsonify({'message': 'Payment recorded successfully', 'newPendingPrincipal': new_pending_principal}), 200
         
@@ -425,7 +439,22 @@ def edit_ticket(ticket_id):
             return jsonify({'error': 'No fields to update'}), 400
         
         # Perform the update
-        ticket_ref.update(update_data)
+        batch = db.batch()
+        batch.update(ticket_ref, update_data)
+        
+        # Resetting the principal changes the customer's outstanding total
+        if 'pendingPrincipal' in update_data and ticket_data.get('status') == 'Active':
+            outstanding_delta = update_data['pendingPrincipal'] - ticket_data.get('pendingPrincipal', 0)
+            customer_update = customer_stats_update(outstanding=outstanding_delta)
+            customer_id = ticket_data.get('customerId')
+            if customer_update and customer_id:
+                customer_ref = db.collection('customers').document(customer_id)
+                if customer_ref.get().exists:
+                    batch.update(customer_ref, customer_update)
+        
+        bump_data_versions(batch, db, 'tickets', 'customers')
+        batch.commit()
+        refresh_overdue_customers(db, [ticket_data.get('customerId')])
         
         return jsonify({'message': 'Ticket updated successfully'}), 200
         
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Nightly overdue computation: rebuild the overdue index and optionally queue reminders.
+
+Usage (from the backend directory, e.g. from cron inside the container):
+    python run_overdue_job.py                                   # sweep only
+    python run_overdue_job.py --remind --method whatsapp
+    python run_overdue_job.py --remind --message "Dear {customerName}, ..."
+
+With --remind the process exits once the reminder campaign has been sent.
+"""
+import argparse
+import json
+import os
+import sys
+
+# Add the backend directory to the python path to allow imports from services
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from services.db import init_db
+from services.overdue_job import run_overdue_job
+
+app = Flask(__name__)
+db = init_db(app)
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Rebuild the overdue index and optionally queue reminders.')
+    arg_parser.add_argument('--remind', action='store_true', help='queue reminders to the overdue customers')
+    arg_parser.add_argument('--method', help='reminder method (defaults to OVERDUE_REMINDER_METHOD)')
+    arg_parser.add_argument('--message', help='reminder template (defaults to OVERDUE_REMINDER_MESSAGE)')
+    args = arg_parser.parse_args()
+
+    run = run_overdue_job(db, send_reminders=args.remind, method=args.method, message=args.message)
+    print(json.dumps(run, indent=2))
+    if run['status'] != 'completed':
+        sys.exit(1)
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"Error during overdue run: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
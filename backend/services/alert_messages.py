@@ -0,0 +1,120 @@
+"""
+Alert message log and its count summaries.
+
+Every alert_messages entry is written through record_alert_messages(), which
+also increments count summaries in the same batch: one `alert_message_stats`
+document per customer, and for the whole log one of ALL_MESSAGES_SHARDS shard
+documents (`_all_<n>`, picked at random per batch), so concurrent campaign batches
+do not contend on a single document (Firestore sustains about one write per second
+per document). Each summary holds `total`, `status_<status>` and `method_<method>`
+counters, so the history page gets its totals from one read of the customer's
+document or of the shards instead of scanning the log. The unsharded `_all`
+document from before the shards is still added in until the migration rewrites it.
+
+History is read a page at a time, newest first, with
+order_by('timestamp', DESCENDING) and any combination of the HISTORY_FILTERS
+equality filters. In Firestore each combination is served by its composite index in
+firestore.indexes.json, with the filter fields in HISTORY_FILTERS order.
+"""
+import random
+from collections import Counter, defaultdict
+from services.db import increment
+
+ALERT_MESSAGES_COLLECTION = 'alert_messages'
+ALERT_STATS_COLLECTION = 'alert_message_stats'
+ALL_MESSAGES_DOC = '_all'
+ALL_MESSAGES_SHARDS = 10
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+HISTORY_FILTERS = ('customerId', 'status', 'method')
+
+def all_messages_shard(shard):
+    """Id of one shard of the whole-log summary."""
+    return f'{ALL_MESSAGES_DOC}_{shard}'
+
+def message_counters(log_data):
+    """Summary counters a log entry adds to."""
+    return ('total', f"status_{log_data.get('status')}", f"method_{log_data.get('method')}")
+
+def record_alert_messages(writer, db, logs):
+    """Queue the log entries and their summary increments on a batch."""
+    counts = defaultdict(Counter)
+    all_doc = all_messages_shard(random.randrange(ALL_MESSAGES_SHARDS))
+    for log_data in logs:
+        writer.set(db.collection(ALERT_MESSAGES_COLLECTION).document(), log_data)
+        for counter in message_counters(log_data):
+            counts[all_doc][counter] += 1
+            if log_data.get('customerId'):
+                counts[log_data['customerId']][counter] += 1
+
+    for doc_id, counters in counts.items():
+        writer.set(db.collection(ALERT_STATS_COLLECTION).document(doc_id),
+                   {counter: increment(amount) for counter, amount in counters.items()}, merge=True)
+
+def record_alert_message(db, log_data):
+    """Write one log entry and its summary increments atomically."""
+    batch = db.batch()
+    record_alert_messages(batch, db, [log_data])
+    batch.commit()
+
+def summarize_counts(stats):
+    """Counters of a stats document as {total, byStatus, byMethod}."""
+    stats = stats or {}
+    return {
+        'total': stats.get('total', 0),
+        'byStatus': {key[len('status_'):]: value for key, value in stats.items() if key.startswith('status_')},
+        'byMethod': {key[len('method_'):]: value for key, value in stats.items() if key.startswith('method_')}
+    }
+
+def message_counts(db, customer_id=None):
+    """Summary counts for one customer, or for the whole log (the shards summed)."""
+    stats_ref = db.collection(ALERT_STATS_COLLECTION)
+    if customer_id:
+        stats_doc = stats_ref.document(customer_id).get()
+        return summarize_counts(stats_doc.to_dict() if stats_doc.exists else None)
+
+    doc_ids = [all_messages_shard(shard) for shard in range(ALL_MESSAGES_SHARDS)] + [ALL_MESSAGES_DOC]
+    stats = Counter()
+    for snapshot in db.get_all([stats_ref.document(doc_id) for doc_id in doc_ids]):
+        if snapshot.exists:
+            stats.update(snapshot.to_dict())
+    return summarize_counts(stats)
+
+def matching_total(counts, filters):
+    """Number of messages matching the filters, if a summary counter covers them, else None."""
+    if filters.get('status') and filters.get('method'):
+        return None
+    if filters.get('status'):
+        return counts['byStatus'].get(filters['status'], 0)
+    if filters.get('method'):
+        return counts['byMethod'].get(filters['method'], 0)
+    return counts['total']
+
+def message_history_page(db, filters, limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """
+    One page of log entries, newest first. cursor is the id of the last entry of
+    the previous page. Returns (messages, next_cursor); next_cursor is None on the
+    last page. Raises ValueError for an unknown cursor.
+    """
+    query = db.collection(ALERT_MESSAGES_COLLECTION)
+    for field in HISTORY_FILTERS:
+        if filters.get(field):
+            query = query.where(field, '==', filters[field])
+    query = query.order_by('timestamp', direction='DESCENDING')
+
+    if cursor:
+        cursor_doc = db.collection(ALERT_MESSAGES_COLLECTION).document(cursor).get()
+        if not cursor_doc.exists:
+            raise ValueError('Invalid cursor')
+        query = query.start_after(cursor_doc)
+
+    # One extra entry tells whether another page follows
+    docs = list(query.limit(limit + 1).stream())
+    messages = []
+    for doc in docs[:limit]:
+        message = doc.to_dict()
+        message['id'] = doc.id
+        messages.append(message)
+
+    next_cursor = messages[-1]['id'] if len(docs) > limit else None
+    return messages, next_cursor
@@ -0,0 +1,337 @@
+"""
+Persistent queue for bulk alert messages.
+
+A campaign enqueues one document per recipient in the `alert_queue` collection and
+is drained by an `alert_campaign` background job. The job works in chunks of
+CHUNK_SIZE due items: it claims the chunk in one transaction, sends the messages
+concurrently from an asyncio event loop (at most `concurrency` in flight, bounded
+by a semaphore, each send waiting on its provider's rate limiter), then records
+the outcomes and the alert_messages log entries of the whole chunk in one batch.
+The campaign's items are read once when the job starts; after that the job keeps
+the pending ones in memory, so each item is read again only when it is claimed.
+Failed sends are retried with exponential backoff up to MAX_ATTEMPTS; because
+items are claimed before sending, a resumed job never sends an item another
+worker is already sending.
+
+Providers are registered by method with register_alert_provider(method, send,
+is_configured, send_async=None). send(customer_name, phone, message) returns a
+dict with success=True when the message went out and False (or raises) when it
+failed; send_async(session, customer_name, phone, message) is the coroutine
+equivalent, given the campaign's shared aiohttp session. Providers without
+send_async, or every provider when aiohttp is missing, are called on the
+event loop's thread pool. Items for a provider that is not configured are parked
+as pending_configuration instead of being retried.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from services.db import get_db, run_transaction, ChunkedBatch
+from services.background_jobs import register_job_handler, create_job, submit_job
+from services.messaging import async_http_session
+from services.alert_messages import record_alert_messages
+from services.alert_throttle import mark_alerted
+
+ALERT_QUEUE_COLLECTION = 'alert_queue'
+ALERT_CAMPAIGN_JOB = 'alert_campaign'
+
+MAX_ATTEMPTS = 3
+BACKOFF_SECONDS = 2
+MAX_CONCURRENCY = 100
+DEFAULT_CONCURRENCY = 20
+# Items claimed, sent and recorded together: the queue update, log entry and
+# customer summary of each item stay within one batch, and the job heartbeat is
+# refreshed between chunks
+CHUNK_SIZE = 150
+# An item left 'sending' this long ago belonged to a worker that stopped
+SENDING_STALE_AFTER = timedelta(minutes=5)
+# Messages per second per provider, overridable with ALERT_RATE_LIMIT_<METHOD>
+DEFAULT_RATE_LIMITS = {'sms': 5, 'whatsapp': 1, 'email': 20, 'stub': 50}
+
+ITEM_STATUSES = ('queued', 'sending', 'sent', 'failed', 'pending_configuration')
+PENDING_STATUSES = ('queued', 'sending')
+
+_providers = {}
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+class RateLimiter:
+    """Spaces calls evenly so that at most `per_second` start each second."""
+
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second if per_second > 0 else 0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take the next slot. Returns the seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        return slot - now
+
+    def acquire(self):
+        time.sleep(self.reserve())
+
+def register_alert_provider(method, send, is_configured, send_async=None):
+    """Register the send functions and configuration check for a message method."""
+    _providers[method] = (send, is_configured, send_async)
+
+def alert_methods():
+    return list(_providers)
+
+def _rate_limiter(method):
+    with _rate_limiters_lock:
+        if method not in _rate_limiters:
+            limit = float(os.getenv(f'ALERT_RATE_LIMIT_{method.upper()}', DEFAULT_RATE_LIMITS.get(method, 1)))
+            _rate_limiters[method] = RateLimiter(limit)
+        return _rate_limiters[method]
+
+def backoff_delay(attempts):
+    """Seconds to wait before retry number `attempts`, with jitter."""
+    return BACKOFF_SECONDS * (2 ** (attempts - 1)) * (0.5 + random.random())
+
+def enqueue_campaign(recipients, method, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Queue one message per recipient ({customerId, customerName, phone, phoneNumber, message},
+    where phone is sent to the provider and the normalized phoneNumber is logged)
+    and start the job that sends them. Returns the campaign (job) id.
+    """
+    if method not in _providers:
+        raise ValueError(f'Unsupported method: {method}')
+    concurrency = max(1, min(int(concurrency), MAX_CONCURRENCY))
+
+    db = get_db()
+    campaign_id = f'alerts_{uuid.uuid4().hex[:20]}'
+    create_job(ALERT_CAMPAIGN_JOB, {
+        'campaignId': campaign_id,
+        'method': method,
+        'concurrency': concurrency,
+        'total': len(recipients)
+    }, campaign_id)
+    now = datetime.now().isoformat()
+    writer = ChunkedBatch(db)
+    for recipient in recipients:
+        writer.set(db.collection(ALERT_QUEUE_COLLECTION).document(), {
+            'campaignId': campaign_id,
+            'customerId': recipient['customerId'],
+            'customerName': recipient.get('customerName'),
+            'phone': recipient['phone'],
+            'phoneNumber': recipient['phoneNumber'],
+            'method': method,
+            'message': recipient['message'],
+            'status': 'queued',
+            'attempts': 0,
+            'nextAttemptAt': now,
+            'lastError': None,
+            'messageId': None,
+            'createdAt': now,
+            'updatedAt': now
+        })
+    writer.commit()
+    submit_job(campaign_id)
+    return campaign_id
+
+def _is_due(item, now):
+    if item.get('status') == 'queued':
+        return datetime.fromisoformat(item.get('nextAttemptAt') or item['createdAt']) <= now
+    if item.get('status') == 'sending':
+        return now - datetime.fromisoformat(item['updatedAt']) > SENDING_STALE_AFTER
+    return False
+
+def _claim_items(transaction, item_refs):
+    """
+    Transaction body: mark the due items as sending. Returns [(ref, item)] of the
+    claimed ones and {id: item} of the others as read (None if deleted).
+    """
+    refs_by_id = {ref.id: ref for ref in item_refs}
+    now = datetime.now()
+    claimed = []
+    unclaimed = {}
+    for snapshot in transaction.get_all(item_refs):
+        if not snapshot.exists:
+            unclaimed[snapshot.id] = None
+            continue
+        item = snapshot.to_dict()
+        if _is_due(item, now):
+            item_ref = refs_by_id[snapshot.id]
+            transaction.update(item_ref, {'status': 'sending', 'updatedAt': now.isoformat()})
+            claimed.append((item_ref, item))
+        else:
+            unclaimed[snapshot.id] = item
+    return claimed, unclaimed
+
+def _message_log(item, status, message_id=None):
+    log_data = {
+        'customerId': item['customerId'],
+        'customerName': item.get('customerName'),
+        'phoneNumber': item['phoneNumber'],
+        'method': item['method'],
+        'message': item['message'],
+        'timestamp': datetime.now().isoformat(),
+        'status': status,
+        'campaignId': item['campaignId']
+    }
+    if message_id:
+        log_data['messageId'] = message_id
+    return log_data
+
+async def _send_one(item, session, semaphore):
+    """Send one claimed item. Returns (result, error) where result is the provider's or None if unconfigured."""
+    send, is_configured, send_async = _providers[item['method']]
+    async with semaphore:
+        if not is_configured():
+            return None, None
+        await asyncio.sleep(_rate_limiter(item['method']).reserve())
+        try:
+            if send_async and session is not None:
+                return await send_async(session, item.get('customerName'), item['phone'], item['message']), None
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, send, item.get('customerName'), item['phone'], item['message']), None
+        except Exception as e:
+            return False, str(e)
+
+def _outcome(item, result, error, now):
+    """Queue item update and alert_messages status (or None) for a send result."""
+    attempts = item.get('attempts', 0) + 1
+    if result is None:
+        return {'status': 'pending_configuration', 'updatedAt': now.isoformat()}, 'pending_configuration', None
+    if isinstance(result, dict) and result.get('success'):
+        message_id = result.get('message_id')
+        return {'status': 'sent', 'attempts': attempts, 'messageId': message_id, 'lastError': None,
+                'updatedAt': now.isoformat()}, 'sent', message_id
+    error = error or 'Provider rejected the message'
+    if attempts >= MAX_ATTEMPTS:
+        return {'status': 'failed', 'attempts': attempts, 'lastError': error, 'updatedAt': now.isoformat()}, 'failed', None
+    return {
+        'status': 'queued',
+        'attempts': attempts,
+        'lastError': error,
+        'nextAttemptAt': (now + timedelta(seconds=backoff_delay(attempts))).isoformat(),
+        'updatedAt': now.isoformat()
+    }, None, None
+
+async def _send_chunk(db, item_ids, session, semaphore):
+    """
+    Claim, send and record a chunk of queue items, writing all outcomes and logs in
+    one batch. Returns {id: item} with the state of every item of the chunk afterwards.
+    """
+    item_refs = [db.collection(ALERT_QUEUE_COLLECTION).document(item_id) for item_id in item_ids]
+    claimed, states = run_transaction(_claim_items, item_refs)
+    if not claimed:
+        return states
+
+    results = await asyncio.gather(*(_send_one(item, session, semaphore) for _, item in claimed))
+
+    now = datetime.now()
+    writer = ChunkedBatch(db)
+    logs = []
+    for (item_ref, item), (result, error) in zip(claimed, results):
+        update, log_status, message_id = _outcome(item, result, error, now)
+        writer.update(item_ref, update)
+        states[item_ref.id] = {**item, **update}
+        if log_status:
+            logs.append(_message_log(item, log_status, message_id))
+    record_alert_messages(writer, db, logs)
+    writer.commit()
+
+    # Only a sent message starts the customer's throttle window; failed or parked items
+    # do not. A separate batch, so a customer deleted mid-campaign cannot fail the outcomes.
+    sent = [log_data['customerId'] for log_data in logs if log_data['status'] == 'sent']
+    if sent:
+        try:
+            writer = ChunkedBatch(db)
+            mark_alerted(writer, db, sent, claimed[0][1]['method'])
+            writer.commit()
+        except Exception as e:
+            print(f"[ALERTS] Could not record lastAlerted for campaign {claimed[0][1]['campaignId']}: {str(e)}")
+    return states
+
+def campaign_items(db, campaign_id):
+    """All queue items of a campaign as (id, item) pairs."""
+    return [(doc.id, doc.to_dict()) for doc in db.collection(ALERT_QUEUE_COLLECTION).where('campaignId', '==', campaign_id).stream()]
+
+def campaign_failed_items(db, campaign_id):
+    """Failed queue items of a campaign as (id, item) pairs (campaignId + status index)."""
+    query = db.collection(ALERT_QUEUE_COLLECTION).where('campaignId', '==', campaign_id).where('status', '==', 'failed')
+    return [(doc.id, doc.to_dict()) for doc in query.stream()]
+
+def stored_campaign_counts(job):
+    """
+    Counts per status for a campaign job, from the progress the drain loop reports
+    (or its result once finished); all items are queued until the job has started.
+    """
+    stored = job.get('result') if job.get('status') == 'completed' else job.get('progress')
+    if stored:
+        return {status: stored.get(status, 0) for status in ITEM_STATUSES}
+    counts = {status: 0 for status in ITEM_STATUSES}
+    counts['queued'] = (job.get('params') or {}).get('total', 0)
+    return counts
+
+def campaign_counts(items):
+    """Number of items per status."""
+    counts = {status: 0 for status in ITEM_STATUSES}
+    for _, item in items:
+        status = item.get('status', 'queued')
+        counts[status] = counts.get(status, 0) + 1
+    return counts
+
+async def _drain(db, campaign_id, concurrency, report_progress):
+    """
+    Send the campaign's pending items. The items are read once; after that the
+    pending set and the counts follow the outcomes of each chunk. Returns the counts.
+    """
+    items = campaign_items(db, campaign_id)
+    counts = campaign_counts(items)
+    pending = {item_id: item for item_id, item in items if item.get('status') in PENDING_STATUSES}
+
+    semaphore = asyncio.Semaphore(concurrency)
+    try:
+        session = async_http_session(concurrency)
+    except ImportError:
+        session = None
+
+    try:
+        while True:
+            report_progress(**counts)
+            if not pending:
+                break
+
+            now = datetime.now()
+            due = [item_id for item_id, item in pending.items() if _is_due(item, now)]
+            if not due:
+                # Sleep until the next retry (or a stale 'sending' item) becomes due
+                waits = [
+                    (datetime.fromisoformat(item['nextAttemptAt']) - now).total_seconds()
+                    for item in pending.values() if item.get('status') == 'queued'
+                ]
+                await asyncio.sleep(min(max(min(waits, default=1), 0.05), 5))
+                continue
+
+            states = await _send_chunk(db, due[:CHUNK_SIZE], session, semaphore)
+            for item_id, item in states.items():
+                previous = pending.pop(item_id, None)
+                if previous is not None:
+                    counts[previous.get('status', 'queued')] -= 1
+                if item is None:
+                    continue
+                counts[item.get('status', 'queued')] = counts.get(item.get('status', 'queued'), 0) + 1
+                if item.get('status') in PENDING_STATUSES:
+                    pending[item_id] = item
+    finally:
+        if session is not None:
+            await session.close()
+    return counts
+
+def drain_alert_campaign(params, report_progress):
+    """Background job: send every queued item of the campaign, retrying failures with backoff."""
+    db = get_db()
+    campaign_id = params['campaignId']
+    concurrency = params.get('concurrency', DEFAULT_CONCURRENCY)
+    return asyncio.run(_drain(db, campaign_id, concurrency, report_progress))
+
+register_job_handler(ALERT_CAMPAIGN_JOB, drain_alert_campaign)
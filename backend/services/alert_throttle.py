@@ -0,0 +1,137 @@
+"""
+Deduplication and throttling of customer alerts.
+
+A customer is alerted at most once per method within ALERT_THROTTLE_HOURS
+(default 24, 0 disables throttling). The time of the last alert per method is
+persisted on the customer document as lastAlerted.<method>, so the window
+holds across instances and restarts, and is mirrored in an in-memory TTL cache
+so repeated attempts inside the window are rejected without a database read.
+
+- reserve_alert() checks and records an alert for one customer in a transaction,
+  so concurrent duplicate requests coalesce into one send; release_alert() gives
+  the reservation back when nothing was sent.
+- recently_alerted() checks many customers in one pass (cache, then one get_all)
+  for bulk campaigns, and mark_alerted() records alerts on a batch; the alert queue
+  calls it for each chunk of messages actually sent.
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+from services.db import run_transaction
+
+THROTTLE_WINDOW = timedelta(hours=float(os.getenv('ALERT_THROTTLE_HOURS', '24')))
+# Expired cache entries are pruned once the cache grows past this size
+MAX_CACHED_ALERTS = 10000
+
+_recent = {}
+_recent_lock = threading.Lock()
+
+def _remember(customer_id, method, alerted_at):
+    with _recent_lock:
+        if len(_recent) >= MAX_CACHED_ALERTS:
+            cutoff = datetime.now() - THROTTLE_WINDOW
+            for key in [key for key, value in _recent.items() if value <= cutoff]:
+                del _recent[key]
+        _recent[(customer_id, method)] = alerted_at
+
+def _forget(customer_id, method):
+    with _recent_lock:
+        _recent.pop((customer_id, method), None)
+
+def _cached_alert(customer_id, method, now):
+    """Cached time of an alert still inside the window, or None."""
+    alerted_at = _recent.get((customer_id, method))
+    if alerted_at and now - alerted_at < THROTTLE_WINDOW:
+        return alerted_at
+    return None
+
+def last_alerted(customer, method):
+    """Time of the customer's last alert by method, from the customer document, or None."""
+    value = ((customer or {}).get('lastAlerted') or {}).get(method)
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+def _throttled_until(alerted_at):
+    return (alerted_at + THROTTLE_WINDOW).isoformat()
+
+def _reserve(transaction, customer_ref, method, now):
+    customer_doc = customer_ref.get(transaction=transaction)
+    if not customer_doc.exists:
+        return None, None
+    previous = last_alerted(customer_doc.to_dict(), method)
+    if previous and now - previous < THROTTLE_WINDOW:
+        return False, previous
+    transaction.update(customer_ref, {f'lastAlerted.{method}': now.isoformat()})
+    return True, previous
+
+def reserve_alert(db, customer_id, method):
+    """
+    Record an alert to the customer by method unless one was sent within the window.
+    Returns (reserved, last_alerted_at, throttled_until); on a reservation
+    last_alerted_at is the previous alert, to hand back to release_alert().
+    """
+    now = datetime.now()
+    if THROTTLE_WINDOW <= timedelta(0):
+        return True, None, None
+
+    cached = _cached_alert(customer_id, method, now)
+    if cached:
+        return False, cached, _throttled_until(cached)
+
+    reserved, previous = run_transaction(_reserve, db.collection('customers').document(customer_id), method, now)
+    if reserved is False:
+        _remember(customer_id, method, previous)
+        return False, previous, _throttled_until(previous)
+    if reserved:
+        _remember(customer_id, method, now)
+    return True, previous, None
+
+def release_alert(db, customer_id, method, previous):
+    """Restore the last alert time recorded before a reservation whose message was not sent."""
+    if THROTTLE_WINDOW <= timedelta(0):
+        return
+    _forget(customer_id, method)
+    db.collection('customers').document(customer_id).update({
+        f'lastAlerted.{method}': previous.isoformat() if previous else None
+    })
+
+def recently_alerted(db, customer_ids, method):
+    """
+    Customers alerted by method within the window, as {customerId: last alert time},
+    plus the set of ids that no longer have a customer document.
+    """
+    now = datetime.now()
+    if THROTTLE_WINDOW <= timedelta(0):
+        return {}, set()
+
+    throttled = {}
+    to_read = []
+    for customer_id in customer_ids:
+        cached = _cached_alert(customer_id, method, now)
+        if cached:
+            throttled[customer_id] = cached
+        else:
+            to_read.append(customer_id)
+
+    missing = set()
+    refs = [db.collection('customers').document(customer_id) for customer_id in to_read]
+    for snapshot in (db.get_all(refs) if refs else []):
+        if not snapshot.exists:
+            missing.add(snapshot.id)
+            continue
+        alerted_at = last_alerted(snapshot.to_dict(), method)
+        if alerted_at and now - alerted_at < THROTTLE_WINDOW:
+            throttled[snapshot.id] = alerted_at
+            _remember(snapshot.id, method, alerted_at)
+    return throttled, missing
+
+def mark_alerted(writer, db, customer_ids, method):
+    """Queue lastAlerted.<method> = now for the customers on a batch."""
+    if THROTTLE_WINDOW <= timedelta(0):
+        return
+    now = datetime.now()
+    for customer_id in customer_ids:
+        writer.update(db.collection('customers').document(customer_id), {f'lastAlerted.{method}': now.isoformat()})
+        _remember(customer_id, method, now)
@@ -0,0 +1,165 @@
+"""
+Persistent background jobs.
+
+Jobs are stored in the `jobs` collection and executed on a small thread pool so
+long-running work does not hold a request thread. While a job runs, a timer
+thread refreshes its heartbeat every HEARTBEAT_INTERVAL (reporting progress
+refreshes it too), so a handler that works for a long time without reporting is
+not mistaken for an interrupted one. A queued or running job whose heartbeat has
+gone stale (for example because the worker was restarted) is picked up again by
+resume_stale_jobs(); reading a job never resubmits it. Handlers must therefore be
+idempotent.
+
+Handlers are registered per job type and called as handler(params, report_progress),
+where report_progress(**fields) stores progress on the job document. The value
+returned by the handler is stored as the job result.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from services.db import get_db, run_transaction
+
+JOBS_COLLECTION = 'jobs'
+# A job whose heartbeat is older than this is considered interrupted
+STALE_AFTER = timedelta(minutes=5)
+# How often a running job's heartbeat is refreshed, well inside STALE_AFTER
+HEARTBEAT_INTERVAL = timedelta(minutes=1)
+MAX_WORKERS = 2
+
+_handlers = {}
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='background-job')
+
+def register_job_handler(job_type, handler):
+    """Register the function that runs jobs of job_type."""
+    _handlers[job_type] = handler
+
+def create_job(job_type, params, job_id=None):
+    """
+    Persist a queued job without running it yet. Returns the job id.
+    Passing job_id replaces any earlier job stored under that id.
+    """
+    now = datetime.now().isoformat()
+    job_ref = get_db().collection(JOBS_COLLECTION).document(job_id)
+    job_ref.set({
+        'type': job_type,
+        'params': params,
+        'status': 'queued',
+        'attempts': 0,
+        'progress': {},
+        'result': None,
+        'error': None,
+        'createdAt': now,
+        'heartbeatAt': now,
+        'completedAt': None
+    })
+    return job_ref.id
+
+def submit_job(job_id):
+    """Run a persisted job on the background pool."""
+    _executor.submit(_run_job, job_id)
+
+def start_job(job_type, params):
+    """Persist a job and run it in the background. Returns the job id."""
+    job_id = create_job(job_type, params)
+    submit_job(job_id)
+    return job_id
+
+def _is_stale(job):
+    heartbeat = job.get('heartbeatAt')
+    if not heartbeat:
+        return True
+    return datetime.now() - datetime.fromisoformat(heartbeat) > STALE_AFTER
+
+def job_in_progress(job):
+    """Whether a job is queued or running with a live heartbeat."""
+    return bool(job) and job.get('status') in ('queued', 'running') and not _is_stale(job)
+
+def get_job(job_id):
+    """Return the job document (with id), or None."""
+    job_doc = get_db().collection(JOBS_COLLECTION).document(job_id).get()
+    if not job_doc.exists:
+        return None
+
+    job = job_doc.to_dict()
+    job['id'] = job_doc.id
+    return job
+
+def resume_stale_jobs():
+    """Resubmit every queued or running job whose heartbeat went stale. Returns the count."""
+    docs = get_db().collection(JOBS_COLLECTION).where('status', 'in', ['queued', 'running']).stream()
+    resumed = 0
+    for doc in docs:
+        if _is_stale(doc.to_dict()):
+            submit_job(doc.id)
+            resumed += 1
+    return resumed
+
+def _claim_job(transaction, job_ref):
+    """Transaction body: mark the job running unless it is finished or live elsewhere."""
+    job_doc = job_ref.get(transaction=transaction)
+    if not job_doc.exists:
+        return None
+
+    job = job_doc.to_dict()
+    if job.get('status') in ('completed', 'failed'):
+        return None
+    if job.get('status') == 'running' and not _is_stale(job):
+        return None
+
+    transaction.update(job_ref, {
+        'status': 'running',
+        'attempts': job.get('attempts', 0) + 1,
+        'heartbeatAt': datetime.now().isoformat()
+    })
+    return job
+
+def _run_job(job_id):
+    db = get_db()
+    job_ref = db.collection(JOBS_COLLECTION).document(job_id)
+
+    try:
+        job = run_transaction(_claim_job, job_ref)
+        if not job:
+            return
+
+        handler = _handlers.get(job.get('type'))
+        if not handler:
+            raise ValueError(f"No handler registered for job type {job.get('type')}")
+
+        def report_progress(**progress):
+            job_ref.update({
+                'progress': progress,
+                'heartbeatAt': datetime.now().isoformat()
+            })
+
+        stop_heartbeat = threading.Event()
+
+        def refresh_heartbeat():
+            while not stop_heartbeat.wait(HEARTBEAT_INTERVAL.total_seconds()):
+                try:
+                    job_ref.update({'heartbeatAt': datetime.now().isoformat()})
+                except Exception as e:
+                    print(f"[JOBS] Job {job_id} heartbeat failed: {str(e)}")
+
+        threading.Thread(target=refresh_heartbeat, name=f'job-heartbeat-{job_id}', daemon=True).start()
+        try:
+            result = handler(job.get('params') or {}, report_progress)
+        finally:
+            stop_heartbeat.set()
+
+        now = datetime.now().isoformat()
+        job_ref.update({
+            'status': 'completed',
+            'result': result,
+            'heartbeatAt': now,
+            'completedAt': now
+        })
+    except Exception as e:
+        print(f"[JOBS] Job {job_id} failed: {str(e)}")
+        now = datetime.now().isoformat()
+        job_ref.update({
+            'status': 'failed',
+            'error': str(e),
+            'heartbeatAt': now,
+            'completedAt': now
+        })
@@ -0,0 +1,149 @@
+"""
+Columnar (Parquet / Arrow IPC) export of tickets, payments and customers.
+
+Documents are streamed from the collection and buffered into typed columns; every
+ROW_GROUP_SIZE rows the buffer is written out as one record batch (one Parquet row
+group), so memory stays bounded no matter how large the collection is. Date strings
+are stored as timestamps and amounts as float64, so analytics tools do not have to
+re-parse text the way they do with the CSV exports.
+
+pyarrow is imported lazily; without it the functions raise ImportError.
+"""
+from datetime import timezone
+from services.dates import parse_date
+
+ROW_GROUP_SIZE = 10000
+
+FORMATS = {
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('.arrow', 'application/vnd.apache.arrow.file'),
+}
+
+# Column name -> type for each exportable collection ('id' is the document id)
+EXPORT_COLUMNS = {
+    'tickets': [
+        ('id', 'string'),
+        ('billNumber', 'string'),
+        ('customerId', 'string'),
+        ('customerName', 'string'),
+        ('customerPhone', 'string'),
+        ('articleName', 'string'),
+        ('itemType', 'string'),
+        ('grossWeight', 'float'),
+        ('netWeight', 'float'),
+        ('principal', 'float'),
+        ('pendingPrincipal', 'float'),
+        ('interestPercentage', 'float'),
+        ('totalInterestReceived', 'float'),
+        ('interestReceivedMonths', 'float'),
+        ('status', 'string'),
+        ('startDate', 'timestamp'),
+        ('closeDate', 'timestamp'),
+        ('lastPaymentDate', 'timestamp'),
+        ('createdAt', 'timestamp'),
+    ],
+    'payments': [
+        ('id', 'string'),
+        ('ticketId', 'string'),
+        ('billNumber', 'string'),
+        ('customerName', 'string'),
+        ('articleName', 'string'),
+        ('date', 'timestamp'),
+        ('interestPaid', 'float'),
+        ('principalPaid', 'float'),
+        ('monthsPaid', 'float'),
+        ('remainingPrincipal', 'float'),
+    ],
+    'customers': [
+        ('id', 'string'),
+        ('name', 'string'),
+        ('phone', 'string'),
+        ('address', 'string'),
+        ('city', 'string'),
+        ('state', 'string'),
+        ('pincode', 'string'),
+        ('idProofType', 'string'),
+        ('idProofNumber', 'string'),
+        ('totalTickets', 'int'),
+        ('activeTickets', 'int'),
+        ('totalOutstanding', 'float'),
+        ('createdAt', 'timestamp'),
+    ],
+}
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('pyarrow is required for Parquet/Arrow exports. Install it with: pip install pyarrow')
+    return pyarrow
+
+def export_schema(pa, collection):
+    types = {'string': pa.string(), 'float': pa.float64(), 'int': pa.int64(), 'timestamp': pa.timestamp('ms')}
+    return pa.schema([pa.field(name, types[kind]) for name, kind in EXPORT_COLUMNS[collection]])
+
+def _convert(value, kind):
+    """Coerce a stored value to the column type; values that do not fit become null."""
+    if value is None or value == '':
+        return None
+    try:
+        if kind == 'string':
+            return str(value)
+        if kind == 'float':
+            return float(value)
+        if kind == 'int':
+            return int(value)
+        parsed = parse_date(value)
+        # Timestamps are stored naive, in UTC when the source had an offset
+        if parsed.tzinfo:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+    except (TypeError, ValueError):
+        return None
+
+def write_collection(db, collection, sink, fmt='parquet', row_group_size=ROW_GROUP_SIZE):
+    """
+    Stream a collection into sink (a path or binary file object) as Parquet or Arrow IPC.
+    Returns the number of rows written. Raises ValueError for an unknown collection or format.
+    """
+    if collection not in EXPORT_COLUMNS:
+        raise ValueError(f"collection must be one of {', '.join(EXPORT_COLUMNS)}")
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+
+    pa = _pyarrow()
+    schema = export_schema(pa, collection)
+    columns = EXPORT_COLUMNS[collection]
+    if fmt == 'parquet':
+        writer = pa.parquet.ParquetWriter(sink, schema, compression='zstd')
+    else:
+        writer = pa.ipc.new_file(sink, schema)
+
+    buffer = {name: [] for name, _ in columns}
+    rows = 0
+
+    def flush():
+        batch = pa.RecordBatch.from_pydict(buffer, schema=schema)
+        writer.write_batch(batch)
+        for values in buffer.values():
+            values.clear()
+
+    try:
+        for doc in db.collection(collection).stream():
+            data = doc.to_dict()
+            if collection == 'customers' and data.get('deletionJobId'):
+                continue
+            data['id'] = doc.id
+            for name, kind in columns:
+                buffer[name].append(_convert(data.get(name), kind))
+            rows += 1
+            if rows % row_group_size == 0:
+                flush()
+        if rows % row_group_size or not rows:
+            flush()
+    finally:
+        writer.close()
+
+    return rows
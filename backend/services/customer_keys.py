@@ -0,0 +1,120 @@
+"""
+Unique-key index for customers.
+
+Every customer claims one document per unique field in the `customer_keys`
+collection, keyed by the normalized value (e.g. `phone:9876543210`). Creating or
+updating a customer reads its keys with one get_all inside a transaction and
+claims them in the same commit as the customer write, so duplicates are rejected
+without querying the customers collection.
+"""
+import re
+from services.customer_search import normalize_text
+
+KEYS_COLLECTION = 'customer_keys'
+
+# Checked in this order; the first conflict is reported
+KEY_FIELDS = [
+    ('phone', 'Customer with this phone number already exists'),
+    ('idProofNumber', 'Customer with this ID proof number already exists'),
+    ('name', 'Customer with this name already exists'),
+]
+
+def normalize_key(field, value):
+    """Normalize a unique field value; returns None for empty values."""
+    if not value:
+        return None
+    if field == 'phone':
+        normalized = re.sub(r'\D', '', str(value))
+    elif field == 'idProofNumber':
+        normalized = normalize_text(value).replace(' ', '')
+    else:
+        normalized = normalize_text(value)
+    return normalized or None
+
+def customer_key_ids(customer):
+    """Map each unique field of a customer to its customer_keys document id."""
+    key_ids = {}
+    for field, _ in KEY_FIELDS:
+        normalized = normalize_key(field, customer.get(field))
+        if normalized:
+            key_ids[field] = f'{field}:{normalized}'
+    return key_ids
+
+def _read_owners(reader, db, key_ids):
+    """Read key documents in one round trip. Returns {key_id: customerId} for claimed keys."""
+    if not key_ids:
+        return {}
+
+    refs = [db.collection(KEYS_COLLECTION).document(key_id) for key_id in set(key_ids)]
+    owners = {}
+    for snapshot in reader.get_all(refs):
+        if snapshot.exists:
+            owners[snapshot.id] = snapshot.to_dict().get('customerId')
+    return owners
+
+def _find_conflict(owners, key_ids, customer_id):
+    """Return the error for the first key held by another customer."""
+    for field, error in KEY_FIELDS:
+        owner = owners.get(key_ids.get(field))
+        if owner and owner != customer_id:
+            return error
+    return None
+
+def claim_keys_and_create(transaction, db, customer_ref, customer_data):
+    """Transaction body: create the customer if none of its keys is taken. Returns an error or None."""
+    key_ids = customer_key_ids(customer_data)
+    owners = _read_owners(transaction, db, key_ids.values())
+    error = _find_conflict(owners, key_ids, customer_ref.id)
+    if error:
+        return error
+
+    transaction.set(customer_ref, customer_data)
+    for field, key_id in key_ids.items():
+        transaction.set(db.collection(KEYS_COLLECTION).document(key_id), {
+            'customerId': customer_ref.id,
+            'field': field
+        })
+    return None
+
+def claim_keys_and_update(transaction, db, customer_ref, update_data):
+    """
+    Transaction body: update the customer, moving its key claims to the new values.
+    Returns (found, error).
+    """
+    customer_doc = customer_ref.get(transaction=transaction)
+    if not customer_doc.exists:
+        return False, None
+
+    customer = customer_doc.to_dict()
+    old_key_ids = customer_key_ids(customer)
+    new_key_ids = customer_key_ids({**customer, **update_data})
+
+    owners = _read_owners(transaction, db, list(old_key_ids.values()) + list(new_key_ids.values()))
+    # Only changed keys can conflict: a customer left with a legacy duplicate (whose
+    # claim went to the oldest holder) can still update its other fields
+    changed_key_ids = {field: key_id for field, key_id in new_key_ids.items() if old_key_ids.get(field) != key_id}
+    error = _find_conflict(owners, changed_key_ids, customer_ref.id)
+    if error:
+        return True, error
+
+    transaction.update(customer_ref, update_data)
+    for field, key_id in old_key_ids.items():
+        # Only release claims this customer actually holds
+        if new_key_ids.get(field) != key_id and owners.get(key_id) == customer_ref.id:
+            transaction.delete(db.collection(KEYS_COLLECTION).document(key_id))
+    for field, key_id in new_key_ids.items():
+        # Claim free keys; never take over an unchanged key held by another customer
+        if not owners.get(key_id):
+            transaction.set(db.collection(KEYS_COLLECTION).document(key_id), {
+                'customerId': customer_ref.id,
+                'field': field
+            })
+    return True, None
+
+def release_keys(batch, db, customer_id, customer):
+    """Queue deletes on a batch for the key claims held by a customer."""
+    key_ids = customer_key_ids(customer)
+    owners = _read_owners(db, db, key_ids.values())
+    for key_id in key_ids.values():
+        if owners.get(key_id) == customer_id:
+            batch.delete(db.collection(KEYS_COLLECTION).document(key_id))
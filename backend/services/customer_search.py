@@ -0,0 +1,92 @@
+"""
+Customer typeahead search index.
+
+Each customer document carries a `searchTokens` array with:
+- prefixes of every normalized name word ("ramesh" -> "r", "ra", ..., "ramesh")
+- suffixes of the phone digits ("9876543210" -> "210", "3210", ..., "9876543210")
+- prefixes of the normalized ID proof number
+
+A search is a single `array_contains` query on the most selective query token
+(Firestore), or an in-memory inverted index lookup (LocalDB), followed by an
+in-memory filter on the remaining tokens and ranking of the small candidate set.
+"""
+import re
+
+MAX_PREFIX_LENGTH = 20
+MIN_NUMBER_TOKEN_LENGTH = 3
+# Upper bound on candidates fetched for ranking
+CANDIDATE_LIMIT = 200
+
+def normalize_text(value):
+    """Lowercase and collapse everything except letters and digits into single spaces."""
+    if not value:
+        return ''
+    return ' '.join(re.sub(r'[^0-9a-z]+', ' ', str(value).lower()).split())
+
+def _digits(value):
+    return re.sub(r'\D', '', str(value or ''))
+
+def build_search_tokens(customer):
+    """Build the searchTokens array for a customer document."""
+    tokens = set()
+
+    for word in normalize_text(customer.get('name')).split():
+        for length in range(1, min(len(word), MAX_PREFIX_LENGTH) + 1):
+            tokens.add(word[:length])
+
+    phone = _digits(customer.get('phone'))
+    for start in range(0, max(0, len(phone) - MIN_NUMBER_TOKEN_LENGTH + 1)):
+        tokens.add(phone[start:])
+
+    id_proof = normalize_text(customer.get('idProofNumber')).replace(' ', '')
+    for length in range(MIN_NUMBER_TOKEN_LENGTH, min(len(id_proof), MAX_PREFIX_LENGTH) + 1):
+        tokens.add(id_proof[:length])
+    if id_proof:
+        tokens.add(id_proof[:MAX_PREFIX_LENGTH])
+
+    return sorted(tokens)
+
+def query_tokens(query):
+    """Split a search query into the tokens that must all be present on a match."""
+    normalized = normalize_text(query)
+    # "98765 43210" is one phone number, not two words
+    if normalized.replace(' ', '').isdigit():
+        return [normalized.replace(' ', '')[:MAX_PREFIX_LENGTH]]
+    return [token[:MAX_PREFIX_LENGTH] for token in normalized.split()]
+
+def _rank(customer, query):
+    """Lower is better: exact name, name prefix, other name word, then phone/ID matches."""
+    name = normalize_text(customer.get('name'))
+    if name == query:
+        return 0
+    if name.startswith(query):
+        return 1
+    if any(word.startswith(query.split()[0]) for word in name.split()):
+        return 2
+    return 3
+
+def search_customers(db, query, limit=10):
+    """Return up to `limit` customers matching every token of `query`, best matches first."""
+    tokens = query_tokens(query)
+    if not tokens:
+        return []
+
+    # Query on the longest (most selective) token, check the rest in memory
+    primary = max(tokens, key=len)
+    docs = db.collection('customers').where('searchTokens', 'array_contains', primary) \
+        .limit(CANDIDATE_LIMIT).stream()
+
+    matches = []
+    for doc in docs:
+        customer = doc.to_dict()
+        # Customers being deleted in the background are hidden
+        if customer.get('deletionJobId'):
+            continue
+        customer_tokens = set(customer.pop('searchTokens', None) or [])
+        if all(token in customer_tokens for token in tokens):
+            customer['id'] = doc.id
+            matches.append(customer)
+
+    normalized_query = ' '.join(tokens)
+    matches.sort(key=lambda c: (_rank(c, normalized_query), normalize_text(c.get('name'))))
+    return matches[:limit]
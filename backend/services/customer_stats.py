@@ -0,0 +1,74 @@
+"""
+Customer aggregate fields (totalTickets, activeTickets, totalOutstanding).
+These are maintained at write time with atomic increments by every ticket, payment
+and close path so GET /api/customers only has to read the customers collection.
+migrations/migrate_customer_stats.py verifies and rebuilds them from the tickets and
+records `migratedAt` on meta/customer_stats. Customers created before the increments
+were deployed have no stats until then, so readers compute them from the tickets
+while the marker is missing.
+"""
+from services.db import increment
+
+META_COLLECTION = 'meta'
+CUSTOMER_STATS_META_DOC = 'customer_stats'
+
+EMPTY_CUSTOMER_STATS = {
+    'totalTickets': 0,
+    'activeTickets': 0,
+    'totalOutstanding': 0
+}
+
+def customer_stats_update(total_tickets=0, active_tickets=0, outstanding=0):
+    """Build an atomic customer update for the given deltas. Returns None when nothing changes."""
+    deltas = {
+        'totalTickets': total_tickets,
+        'activeTickets': active_tickets,
+        'totalOutstanding': outstanding
+    }
+    update_data = {field: increment(delta) for field, delta in deltas.items() if delta}
+    return update_data or None
+
+def customer_stats_meta_ref(db):
+    """Document recording when the customer stats were last rebuilt from the tickets."""
+    return db.collection(META_COLLECTION).document(CUSTOMER_STATS_META_DOC)
+
+def customer_stats_migrated(db):
+    """Whether the stored customer stats have been rebuilt and can be served as totals."""
+    meta_doc = customer_stats_meta_ref(db).get()
+    return meta_doc.exists and bool((meta_doc.to_dict() or {}).get('migratedAt'))
+
+def add_ticket_stats(stats, ticket):
+    """Add one ticket to a stats dict shaped like EMPTY_CUSTOMER_STATS."""
+    stats['totalTickets'] += 1
+    # Count only active tickets and their outstanding amounts
+    if ticket.get('status') == 'Active':
+        stats['activeTickets'] += 1
+        stats['totalOutstanding'] += ticket.get('pendingPrincipal', 0) or 0
+    return stats
+
+def compute_customer_stats(ticket_docs):
+    """Stats per customer id from a stream of ticket documents."""
+    stats_by_customer = {}
+    for ticket_doc in ticket_docs:
+        ticket = ticket_doc.to_dict()
+        customer_id = ticket.get('customerId')
+        if customer_id:
+            add_ticket_stats(stats_by_customer.setdefault(customer_id, dict(EMPTY_CUSTOMER_STATS)), ticket)
+    return stats_by_customer
+
+def rebuild_customer_stats(transaction, db, customer_id):
+    """
+    Transaction body: recompute one customer's stats from its tickets and store them.
+    Reading the customer and its tickets in the transaction means an increment
+    committed meanwhile makes the transaction retry instead of being overwritten.
+    Returns the stats written, or None if the customer does not exist.
+    """
+    customer_ref = db.collection('customers').document(customer_id)
+    if not customer_ref.get(transaction=transaction).exists:
+        return None
+
+    stats = dict(EMPTY_CUSTOMER_STATS)
+    for ticket_doc in db.collection('tickets').where('customerId', '==', customer_id).stream(transaction=transaction):
+        add_ticket_stats(stats, ticket_doc.to_dict())
+    transaction.update(customer_ref, stats)
+    return stats
@@ -0,0 +1,41 @@
+"""
+Per-collection data versions.
+
+Every write path bumps a counter for the collections it changes, in the same batch
+or transaction as the write when there is one. Each collection's counter is its own
+`meta/data_versions_<collection>` document, so writers of unrelated collections
+never contend on one document (Firestore sustains about one write per second per
+document). Caches of derived data (report arrays, report results) are keyed by
+these counters, so they stay valid exactly until the data changes.
+Read the versions before reading the data they describe: a write that lands in
+between then only makes the cached entry stale, never wrong.
+"""
+from services.db import increment
+
+META_COLLECTION = 'meta'
+DATA_VERSIONS_DOC = 'data_versions'
+
+def data_version_ref(db, collection):
+    return db.collection(META_COLLECTION).document(f'{DATA_VERSIONS_DOC}_{collection}')
+
+def bump_data_versions(writer, db, *collections):
+    """
+    Queue a version bump for the given collections on a batch or transaction (one
+    write per collection). With writer=None the bumps are written immediately (for
+    writes made outside a batch).
+    """
+    for collection in collections:
+        data = {'version': increment(1)}
+        if writer is None:
+            data_version_ref(db, collection).set(data, merge=True)
+        else:
+            writer.set(data_version_ref(db, collection), data, merge=True)
+
+def get_data_versions(db, *collections):
+    """Current versions of the given collections as a tuple (0 for never written)."""
+    refs = [data_version_ref(db, collection) for collection in collections]
+    versions = {
+        snapshot.id: (snapshot.to_dict() or {}).get('version', 0)
+        for snapshot in db.get_all(refs) if snapshot.exists
+    }
+    return tuple(versions.get(ref.id, 0) for ref in refs)
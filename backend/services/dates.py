@@ -0,0 +1,46 @@
+"""
+Shared parsing of stored date strings.
+
+Tickets and payments store dates either as `YYYY-MM-DD` or as ISO datetimes
+(optionally with a trailing `Z`). Reports and listings parse the same strings
+over and over, so parse_date() handles those two formats on a fast path and
+memoizes every distinct string in an LRU; anything else falls back to dateutil.
+benchmarks/bench_dates.py compares it with calling dateutil per row.
+"""
+from datetime import datetime
+from functools import lru_cache
+from dateutil import parser
+
+DATE_CACHE_SIZE = 8192
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _parse(value):
+    if len(value) == 10 and value[4] == '-' and value[7] == '-':
+        # YYYY-MM-DD
+        return datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+    if 'T' in value:
+        # ISO datetime, fromisoformat only understands 'Z' from Python 3.11
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parser.isoparse(value)
+
+def parse_date(value):
+    """
+    Parse a stored date string into a datetime, once per distinct string.
+    Raises ValueError for empty or unparseable values.
+    """
+    if isinstance(value, datetime):
+        return value
+    if not value:
+        raise ValueError('Empty date')
+    return _parse(value)
+
+def format_date(value, fmt):
+    """Reformat a stored date string, passing unparseable values through unchanged."""
+    try:
+        return parse_date(value).strftime(fmt)
+    except (TypeError, ValueError):
+        return value or ''
+
+def clear_date_cache():
+    """Drop the memoized parses (used by the benchmark)."""
+    _parse.cache_clear()
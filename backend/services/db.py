@@ -50,3 +50,67 @@ def init_db(app):
 def get_db():
     """Get database instance (Firebase for production, LocalDB for development)."""
     return _db
+
+def increment(amount):
+    """Atomic numeric increment sentinel for the active database."""
+    if Config.ENVIRONMENT == 'development':
+        from services.local_db import Increment
+        return Increment(amount)
+    
+    from firebase_admin import firestore
+    return firestore.Increment(amount)
+
+def run_transaction(callback, *args):
+    """
+    Run callback(transaction, *args) inside a database transaction and return its result.
+    Firestore retries the callback on contention, so it must only read through the
+    transaction (doc_ref.get(transaction=transaction)) and must not have side effects.
+    """
+    db = get_db()
+    if Config.ENVIRONMENT == 'development':
+        return db.run_transaction(callback, *args)
+    
+    from firebase_admin import firestore
+    return firestore.transactional(callback)(db.transaction(), *args)
+
+# Firestore allows at most 500 writes per batch commit
+BATCH_WRITE_LIMIT = 500
+
+class ChunkedBatch:
+    """Write batch that commits automatically every BATCH_WRITE_LIMIT operations."""
+    
+    def __init__(self, db, limit=BATCH_WRITE_LIMIT):
+        self.db = db
+        self.limit = limit
+        self.committed = 0
+        self._batch = db.batch()
+        self._pending = 0
+    
+    def _added(self):
+        self._pending += 1
+        if self._pending >= self.limit:
+            self.commit()
+    
+    def set(self, ref, data, merge=False):
+        if merge:
+            self._batch.set(ref, data, merge=True)
+        else:
+            self._batch.set(ref, data)
+        self._added()
+    
+    def update(self, ref, data):
+        self._batch.update(ref, data)
+        self._added()
+    
+    def delete(self, ref):
+        self._batch.delete(ref)
+        self._added()
+    
+    def commit(self):
+        """Commit pending writes. Returns the total number of writes committed so far."""
+        if self._pending:
+            self._batch.commit()
+            self.committed += self._pending
+            self._batch = self.db.batch()
+            self._pending = 0
+        return self.committed
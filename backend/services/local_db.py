@@ -5,15 +5,50 @@ Production always uses Firebase
 """
 import json
 import os
+import threading
 from datetime import datetime
 from pathlib import Path
 
+
+class Increment:
+    """Mimics firestore.Increment for local development"""
+    
+    def __init__(self, value):
+        self.value = value
+
+
+def _apply_update(doc, data, field_paths=False):
+    """
+    Merge update data into a document, resolving Increment sentinels.
+    With field_paths (update() semantics), dotted keys such as 'a.b' set nested map fields.
+    """
+    for key, value in data.items():
+        target = doc
+        if field_paths and '.' in key:
+            *parents, key = key.split('.')
+            for parent in parents:
+                if not isinstance(target.get(parent), dict):
+                    target[parent] = {}
+                target = target[parent]
+        if isinstance(value, Increment):
+            current = target.get(key)
+            if not isinstance(current, (int, float)):
+                current = 0
+            target[key] = current + value.value
+        else:
+            target[key] = value
+
+
 class LocalDB:
     """Mock database using JSON files for local development only"""
     
     def __init__(self):
         self.db_dir = Path('local_data')
         self.db_dir.mkdir(exist_ok=True)
+        # Serializes transactions and batch commits (Firestore does this server-side)
+        self._lock = threading.RLock()
+        # In-memory inverted indexes for array fields: (collection, field) -> (file version, token -> ids)
+        self._token_indexes = {}
         self._init_collections()
     
     def _init_collections(self):
@@ -40,9 +75,11 @@ class LocalDB:
             return []
     
     def _write_file(self, filepath, data):
-        """Write to JSON file"""
-        with open(filepath, 'w') as f:
+        """Write to JSON file atomically so concurrent readers never see a partial file"""
+        tmp_path = Path(f'{filepath}.{threading.get_ident()}.tmp')
+        with open(tmp_path, 'w') as f:
             json.dump(data, f, indent=2, default=str)
+        os.replace(tmp_path, filepath)
     
     def get_collection(self, collection_name):
         """Get all documents from collection"""
@@ -51,6 +88,10 @@ class LocalDB:
     
     def add_document(self, collection_name, data):
         """Add document to collection"""
+        with self._lock:
+            return self._add_document(collection_name, data)
+    
+    def _add_document(self, collection_name, data):
         filepath = self.db_dir / f'{collection_name}.json'
         documents = self._read_file(filepath)
         
@@ -65,12 +106,16 @@ class LocalDB:
     
     def update_document(self, collection_name, doc_id, data):
         """Update document in collection"""
+        with self._lock:
+            return self._update_document(collection_name, doc_id, data)
+    
+    def _update_document(self, collection_name, doc_id, data):
         filepath = self.db_dir / f'{collection_name}.json'
         documents = self._read_file(filepath)
         
         for doc in documents:
             if doc.get('id') == str(doc_id):
-                doc.update(data)
+                _apply_update(doc, data, field_paths=True)
                 doc['updated_at'] = datetime.now().isoformat()
                 self._write_file(filepath, documents)
                 return True
@@ -79,6 +124,10 @@ class LocalDB:
     
     def delete_document(self, collection_name, doc_id):
         """Delete document from collection"""
+        with self._lock:
+            self._delete_document(collection_name, doc_id)
+    
+    def _delete_document(self, collection_name, doc_id):
         filepath = self.db_dir / f'{collection_name}.json'
         documents = self._read_file(filepath)
         
@@ -117,9 +166,52 @@ class LocalDB:
         
         return results
     
+    def find_by_token(self, collection_name, field, token):
+        """
+        Find documents whose array field contains token using an in-memory inverted index.
+        The index is rebuilt lazily whenever the collection file changes on disk.
+        """
+        filepath = self.db_dir / f'{collection_name}.json'
+        version = filepath.stat().st_mtime_ns if filepath.exists() else None
+        key = (collection_name, field)
+        
+        cached = self._token_indexes.get(key)
+        if cached is None or cached[0] != version:
+            documents = self._read_file(filepath)
+            index = {}
+            for doc in documents:
+                for value in doc.get(field) or []:
+                    index.setdefault(value, []).append(doc)
+            cached = (version, index)
+            self._token_indexes[key] = cached
+        
+        return list(cached[1].get(token, []))
+    
     def collection(self, collection_name):
         """Return a collection reference (Firebase-like API)"""
         return CollectionReference(self, collection_name)
+    
+    def get_all(self, references, transaction=None):
+        """Fetch several documents with one read per collection (Firebase-like API)"""
+        documents_by_collection = {}
+        for ref in references:
+            if ref.collection_name not in documents_by_collection:
+                documents = self.get_collection(ref.collection_name)
+                documents_by_collection[ref.collection_name] = {doc.get('id'): doc for doc in documents}
+            doc = documents_by_collection[ref.collection_name].get(str(ref.doc_id))
+            yield DocumentSnapshot(doc, ref.doc_id)
+    
+    def batch(self):
+        """Return a write batch (Firebase-like API)"""
+        return WriteBatch(self)
+    
+    def run_transaction(self, callback, *args):
+        """Run callback(transaction, *args) and commit its writes atomically"""
+        with self._lock:
+            transaction = Transaction(self)
+            result = callback(transaction, *args)
+            transaction.commit()
+            return result
 
 
 class CollectionReference:
@@ -131,7 +223,15 @@ class CollectionReference:
     
     def where(self, field, op, value):
         """Query documents where field matches value"""
-        return QueryReference(self.db, self.collection_name, field, op, value)
+        return QueryReference(self.db, self.collection_name).where(field, op, value)
+    
+    def order_by(self, field, direction='ASCENDING'):
+        """Order all documents by field"""
+        return QueryReference(self.db, self.collection_name).order_by(field, direction)
+    
+    def limit(self, num):
+        """Limit results"""
+        return QueryReference(self.db, self.collection_name).limit(num)
     
     def document(self, doc_id=None):
         """Get a document reference"""
@@ -147,34 +247,127 @@ class CollectionReference:
         return [DocumentSnapshot(doc, doc.get('id')) for doc in documents]
 
 
+def _matches(doc, field, op, value):
+    """Evaluate a single Firestore-style filter against a document"""
+    actual = doc.get(field)
+    if op == '==':
+        return actual == value
+    if op == '!=':
+        return actual != value
+    if op == 'in':
+        return actual in value
+    if op == 'not-in':
+        return actual not in value
+    if op == 'array_contains':
+        return isinstance(actual, list) and value in actual
+    if op == 'array_contains_any':
+        return isinstance(actual, list) and any(item in actual for item in value)
+    
+    # Range filters skip documents missing the field, as Firestore does
+    if actual is None:
+        return False
+    try:
+        if op == '<':
+            return actual < value
+        if op == '<=':
+            return actual <= value
+        if op == '>':
+            return actual > value
+        if op == '>=':
+            return actual >= value
+    except TypeError:
+        return False
+    raise ValueError(f'Unsupported operator: {op}')
+
+
 class QueryReference:
     """Mimics Firebase Query for local development"""
     
-    def __init__(self, db, collection_name, field, op, value, limit_val=None):
+    def __init__(self, db, collection_name, filters=(), orders=(), limit_val=None, cursor=None):
         self.db = db
         self.collection_name = collection_name
-        self.field = field
-        self.op = op
-        self.value = value
+        self.filters = tuple(filters)
+        self.orders = tuple(orders)
         self.limit_val = limit_val
+        self.cursor = cursor
+    
+    def _copy(self, **changes):
+        state = {
+            'filters': self.filters,
+            'orders': self.orders,
+            'limit_val': self.limit_val,
+            'cursor': self.cursor
+        }
+        state.update(changes)
+        return QueryReference(self.db, self.collection_name, **state)
+    
+    def where(self, field, op, value):
+        """Add a filter to the query"""
+        return self._copy(filters=self.filters + ((field, op, value),))
+    
+    def order_by(self, field, direction='ASCENDING'):
+        """Order results by field"""
+        return self._copy(orders=self.orders + ((field, direction),))
     
     def limit(self, num):
         """Limit query results"""
-        return QueryReference(self.db, self.collection_name, self.field, self.op, self.value, num)
+        return self._copy(limit_val=num)
     
-    def stream(self):
-        """Stream query results"""
-        documents = self.db.get_collection(self.collection_name)
-        results = []
+    def start_after(self, document_fields):
+        """Start after a snapshot or a dict of the ordered field values"""
+        if isinstance(document_fields, DocumentSnapshot):
+            document_fields = document_fields.to_dict()
+        return self._copy(cursor=document_fields)
+    
+    def _candidates(self):
+        """Documents to filter, narrowed through the token index for array_contains"""
+        for field, op, value in self.filters:
+            if op == 'array_contains':
+                return self.db.find_by_token(self.collection_name, field, value)
+        return self.db.get_collection(self.collection_name)
+    
+    def _sort_key(self, doc):
+        return tuple((doc.get(field) is not None, doc.get(field)) for field, _ in self.orders)
+    
+    def stream(self, transaction=None):
+        """Stream query results (transaction is accepted for Firebase API parity)"""
+        results = [
+            doc for doc in self._candidates()
+            if all(_matches(doc, field, op, value) for field, op, value in self.filters)
+        ]
         
-        for doc in documents:
-            if self.op == '==' and doc.get(self.field) == self.value:
-                results.append(DocumentSnapshot(doc, doc.get('id')))
-            
-            if self.limit_val and len(results) >= self.limit_val:
-                break
+        # Apply orderings from the last to the first so the first one wins
+        for field, direction in reversed(self.orders):
+            results.sort(
+                key=lambda doc: (doc.get(field) is not None, doc.get(field)),
+                reverse=direction == 'DESCENDING'
+            )
         
-        return results
+        if self.cursor is not None and self.orders:
+            cursor_key = self._sort_key(self.cursor)
+            position = 0
+            for position, doc in enumerate(results):
+                if self._is_after(doc, cursor_key):
+                    break
+            else:
+                position = len(results)
+            results = results[position:]
+        
+        if self.limit_val:
+            results = results[:self.limit_val]
+        
+        return [DocumentSnapshot(doc, doc.get('id')) for doc in results]
+    
+    def _is_after(self, doc, cursor_key):
+        """Check whether doc sorts strictly after the cursor values"""
+        for (field, direction), cursor_value in zip(self.orders, cursor_key):
+            value = (doc.get(field) is not None, doc.get(field))
+            if value == cursor_value:
+                continue
+            if direction == 'DESCENDING':
+                return value < cursor_value
+            return value > cursor_value
+        return False
 
 
 class DocumentReference:
@@ -195,8 +388,12 @@ class DocumentReference:
         import uuid
         return str(uuid.uuid4())
     
-    def set(self, data):
-        """Set document data"""
+    def set(self, data, merge=False):
+        """Set document data (existing fields are always merged locally)"""
+        with self.db._lock:
+            return self._set(data)
+    
+    def _set(self, data):
         filepath = self.db.db_dir / f'{self.collection_name}.json'
         documents = self.db._read_file(filepath)
         
@@ -204,14 +401,14 @@ class DocumentReference:
         found = False
         for doc in documents:
             if doc.get('id') == self.doc_id:
-                doc.update(data)
+                _apply_update(doc, data)
                 found = True
                 break
         
         # If not found, add new document
         if not found:
             data_with_id = {'id': self.doc_id}
-            data_with_id.update(data)
+            _apply_update(data_with_id, data)
             data_with_id['createdAt'] = datetime.now().isoformat()
             documents.append(data_with_id)
         
@@ -222,13 +419,13 @@ class DocumentReference:
         """Update document"""
         return self.db.update_document(self.collection_name, self.doc_id, data)
     
-    def get(self):
-        """Get document"""
+    def get(self, transaction=None):
+        """Get document (transaction is accepted for Firebase API parity)"""
         documents = self.db.get_collection(self.collection_name)
         for doc in documents:
             if doc.get('id') == str(self.doc_id):
                 return DocumentSnapshot(doc, self.doc_id)
-        return None
+        return DocumentSnapshot(None, self.doc_id)
     
     def delete(self):
         """Delete document"""
@@ -249,11 +446,74 @@ class DocumentSnapshot:
     
     def to_dict(self):
         """Convert to dictionary"""
+        if self.data is None:
+            return None
         return self.data.copy()
     
     def get(self, field):
         """Get field value"""
         return self.data.get(field)
 
+
+class WriteBatch:
+    """Mimics Firebase WriteBatch for local development"""
+    
+    def __init__(self, db):
+        self.db = db
+        self._writes = []
+    
+    def set(self, ref, data, merge=False):
+        """Queue a set (DocumentReference.set already merges locally)"""
+        self._writes.append(('set', ref, data))
+        return self
+    
+    def update(self, ref, data):
+        """Queue an update"""
+        self._writes.append(('update', ref, data))
+        return self
+    
+    def delete(self, ref):
+        """Queue a delete"""
+        self._writes.append(('delete', ref, None))
+        return self
+    
+    def commit(self):
+        """Apply all queued writes in order, reading and writing each collection file once"""
+        with self.db._lock:
+            collections = {}
+            for op, ref, data in self._writes:
+                if ref.collection_name not in collections:
+                    documents = self.db._read_file(self.db.db_dir / f'{ref.collection_name}.json')
+                    collections[ref.collection_name] = {str(doc.get('id')): doc for doc in documents}
+                documents = collections[ref.collection_name]
+                doc_id = str(ref.doc_id)
+
+                if op == 'set':
+                    if doc_id in documents:
+                        _apply_update(documents[doc_id], data)
+                    else:
+                        data_with_id = {'id': ref.doc_id}
+                        _apply_update(data_with_id, data)
+                        data_with_id['createdAt'] = datetime.now().isoformat()
+                        documents[doc_id] = data_with_id
+                elif op == 'update':
+                    if doc_id in documents:
+                        _apply_update(documents[doc_id], data, field_paths=True)
+                        documents[doc_id]['updated_at'] = datetime.now().isoformat()
+                else:
+                    documents.pop(doc_id, None)
+
+            for collection_name, documents in collections.items():
+                self.db._write_file(self.db.db_dir / f'{collection_name}.json', list(documents.values()))
+        self._writes = []
+
+
+class Transaction(WriteBatch):
+    """Mimics Firebase Transaction for local development"""
+    
+    def get_all(self, references):
+        """Read several documents within the transaction"""
+        return self.db.get_all(references, transaction=self)
+
 # Global instance
 local_db = LocalDB()
@@ -0,0 +1,107 @@
+"""
+Limits on the CPU spent checking passwords.
+
+Password hashes are PBKDF2 with 100k iterations, tens of milliseconds of CPU
+each. Instead of running on the request thread, they run through run_hashing()
+on a pool of PASSWORD_HASH_WORKERS threads (hashlib releases the GIL while
+hashing, so other requests keep being served), and at most PASSWORD_HASH_QUEUE
+more wait for a thread. Past that PasswordHashBusy is raised right away, which the
+routes answer with 429, so a burst of logins cannot stall the other API calls.
+PASSWORD_HASH_WORKERS=0 hashes on the request thread as before.
+
+Sign-in attempts are counted in memory per (username, client address), so a
+burst against one account from one client cannot lock the account out for everyone
+else. start_login_attempt() counts an attempt before its password is checked and a
+successful sign-in clears the count; after LOGIN_FAILURE_LIMIT attempts within
+LOGIN_FAILURE_WINDOW_SECONDS, further attempts for the key are rejected before any
+database read or hashing until the oldest one leaves the window. Counting up front
+also bounds concurrent attempts: no more than LOGIN_FAILURE_LIMIT hashes per key
+can be in flight at once. The counts are per instance and reset on restart.
+"""
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(max(1, (os.cpu_count() or 2) // 2))))
+HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', '8'))
+LOGIN_FAILURE_LIMIT = int(os.getenv('LOGIN_FAILURE_LIMIT', '5'))
+LOGIN_FAILURE_WINDOW = float(os.getenv('LOGIN_FAILURE_WINDOW_SECONDS', '300'))
+# Keys without an attempt inside the window are pruned past this many
+MAX_TRACKED_KEYS = 10000
+# Seconds a client is asked to wait after a busy rejection
+BUSY_RETRY_AFTER = 1
+
+class PasswordHashBusy(Exception):
+    """Raised when every hashing thread is busy and the queue is full."""
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_QUEUE) if HASH_WORKERS > 0 else None
+
+_attempts = {}
+_attempts_lock = threading.Lock()
+
+def _hash_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='password-hash')
+    return _executor
+
+def run_hashing(func, *args):
+    """Run a password hashing function on the hashing pool and return its result."""
+    if _slots is None:
+        return func(*args)
+    if not _slots.acquire(blocking=False):
+        raise PasswordHashBusy('Too many sign-in requests in progress. Please try again shortly.')
+    try:
+        return _hash_executor().submit(func, *args).result()
+    finally:
+        _slots.release()
+
+def _recent_attempts(key, now):
+    """The key's attempt times inside the window, pruned. Call with the lock held."""
+    attempts = _attempts.get(key)
+    if attempts is None:
+        return None
+    while attempts and now - attempts[0] >= LOGIN_FAILURE_WINDOW:
+        attempts.popleft()
+    if not attempts:
+        del _attempts[key]
+        return None
+    return attempts
+
+def start_login_attempt(key):
+    """
+    Count a sign-in attempt for key, (username, client address), before its password
+    is checked. Returns 0 if it may go ahead, else the seconds until the key may try
+    again (the rejected attempt is not counted).
+    """
+    now = time.monotonic()
+    with _attempts_lock:
+        attempts = _recent_attempts(key, now)
+        if attempts and len(attempts) >= LOGIN_FAILURE_LIMIT:
+            return max(1, math.ceil(attempts[0] + LOGIN_FAILURE_WINDOW - now))
+        if attempts is None and len(_attempts) >= MAX_TRACKED_KEYS:
+            for tracked in list(_attempts):
+                _recent_attempts(tracked, now)
+        _attempts.setdefault(key, deque(maxlen=LOGIN_FAILURE_LIMIT)).append(now)
+        return 0
+
+def clear_login_attempts(key):
+    """Forget the key's attempts after a successful sign-in."""
+    with _attempts_lock:
+        _attempts.pop(key, None)
+
+def cancel_login_attempt(key):
+    """Uncount the key's latest attempt, for one whose password was never checked."""
+    with _attempts_lock:
+        attempts = _attempts.get(key)
+        if attempts:
+            attempts.pop()
+            if not attempts:
+                del _attempts[key]
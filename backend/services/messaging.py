@@ -0,0 +1,137 @@
+"""
+Pooled clients for the outbound message gateways.
+
+Every gateway call goes through one process-wide requests.Session whose
+HTTPAdapter keeps up to MESSAGING_POOL_SIZE keep-alive connections per host, so
+bulk sends reuse TCP/TLS connections instead of opening one per message. Twilio
+clients are cached per (account sid, auth token) and share that session.
+All calls use MESSAGING_TIMEOUT (connect, read) seconds.
+
+The transport is pluggable: set_http_session() swaps the session (for example one
+with a custom adapter mounted), and FAST2SMS_API_URL points the SMS gateway at
+another endpoint such as a local fake server.
+
+For large campaigns there is an asyncio path as well: async_http_session()
+opens an aiohttp session whose connector allows `limit` concurrent connections,
+and post_fast2sms_async()/async_twilio_client() send through it. aiohttp ships
+as a dependency of twilio.
+
+requests, aiohttp and twilio are imported lazily, like the rest of the alert code.
+"""
+import os
+import threading
+
+FAST2SMS_API_URL = os.getenv('FAST2SMS_API_URL', 'https://www.fast2sms.com/dev/bulkV2')
+POOL_SIZE = int(os.getenv('MESSAGING_POOL_SIZE', '16'))
+# (connect, read) timeouts in seconds
+TIMEOUT = (float(os.getenv('MESSAGING_CONNECT_TIMEOUT', '3.05')), float(os.getenv('MESSAGING_TIMEOUT', '10')))
+
+_lock = threading.Lock()
+_session = None
+_twilio_clients = {}
+
+def _build_session():
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    # No automatic retries: a POST may already have been delivered, the alert queue retries
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def http_session():
+    """The shared keep-alive session for gateway requests."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+def set_http_session(session):
+    """Replace the gateway session (None restores the default) and drop cached clients using the old one."""
+    global _session
+    with _lock:
+        if _session is not None and _session is not session:
+            _session.close()
+        _session = session
+        _twilio_clients.clear()
+
+def post_fast2sms(api_key, numbers, message):
+    """POST one message to the Fast2SMS bulk API. Returns the response."""
+    return http_session().post(
+        FAST2SMS_API_URL,
+        headers={'authorization': api_key},
+        data={'variables_values': message, 'route': 'otp', 'numbers': numbers},
+        timeout=TIMEOUT
+    )
+
+def twilio_client(account_sid, auth_token):
+    """A Twilio client for the credentials, built once and reused on the shared session."""
+    key = (account_sid, auth_token)
+    client = _twilio_clients.get(key)
+    if client is None:
+        from twilio.rest import Client
+        from twilio.http.http_client import TwilioHttpClient
+
+        session = http_session()
+        with _lock:
+            client = _twilio_clients.get(key)
+            if client is None:
+                http_client = TwilioHttpClient(pool_connections=True, timeout=TIMEOUT[1])
+                http_client.session = session
+                client = Client(account_sid, auth_token, http_client=http_client)
+                _twilio_clients[key] = client
+    return client
+
+def async_http_session(limit):
+    """
+    A new aiohttp session allowing `limit` concurrent keep-alive connections.
+    Must be created and closed inside the running event loop.
+    """
+    try:
+        import aiohttp
+    except ImportError:
+        raise ImportError('aiohttp is required for asynchronous sending. Install it with: pip install aiohttp')
+
+    connector = aiohttp.TCPConnector(limit=limit, limit_per_host=limit)
+    timeout = aiohttp.ClientTimeout(sock_connect=TIMEOUT[0], total=TIMEOUT[0] + TIMEOUT[1])
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+async def post_fast2sms_async(session, api_key, numbers, message):
+    """POST one message to the Fast2SMS bulk API on an aiohttp session. Returns (status, body)."""
+    async with session.post(
+        FAST2SMS_API_URL,
+        headers={'authorization': api_key},
+        data={'variables_values': message, 'route': 'otp', 'numbers': numbers}
+    ) as response:
+        return response.status, await response.text()
+
+_timeout_http_client_class = None
+
+def _timeout_async_http_client():
+    """
+    AsyncTwilioHttpClient that applies its own timeout. Twilio passes timeout=None
+    to session.request(), which aiohttp takes as no timeout at all, overriding the
+    session's ClientTimeout.
+    """
+    global _timeout_http_client_class
+    if _timeout_http_client_class is None:
+        from twilio.http.async_http_client import AsyncTwilioHttpClient
+
+        class TimeoutAsyncTwilioHttpClient(AsyncTwilioHttpClient):
+            async def request(self, *args, timeout=None, **kwargs):
+                return await super().request(*args, timeout=timeout or self.timeout, **kwargs)
+
+        _timeout_http_client_class = TimeoutAsyncTwilioHttpClient
+    return _timeout_http_client_class
+
+def async_twilio_client(account_sid, auth_token, session):
+    """A Twilio client that sends with create_async() over the given aiohttp session."""
+    from twilio.rest import Client
+
+    http_client = _timeout_async_http_client()(pool_connections=False, timeout=sum(TIMEOUT))
+    http_client.session = session
+    return Client(account_sid, auth_token, http_client=http_client)
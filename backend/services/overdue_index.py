@@ -0,0 +1,166 @@
+"""
+Materialized index of customers with overdue interest.
+
+The `overdue` collection holds one document per customer (document id = customer
+id) listing their active tickets whose pending interest months reached the item
+type threshold (Gold >= 12, Silver and others >= 6). It is kept current two ways:
+
+- refresh_overdue_customers() recomputes the entries of the given customers from
+  their tickets; write paths call it after changing a customer's tickets or
+  payments.
+- sweep_overdue_index() rebuilds every entry from one pass over active tickets,
+  grouped by customer in a dict. Pending months grow with the calendar, so the
+  index is swept once per day; ensure_overdue_index_current() sweeps when the
+  last sweep was not today.
+"""
+import threading
+from datetime import datetime
+from services.db import ChunkedBatch
+from services.dates import parse_date
+
+OVERDUE_COLLECTION = 'overdue'
+META_COLLECTION = 'meta'
+OVERDUE_META_DOC = 'overdue_index'
+
+_sweep_lock = threading.Lock()
+
+def overdue_threshold(item_type):
+    """Months of pending interest after which a ticket is overdue."""
+    return 12 if (item_type or 'Silver').lower() == 'gold' else 6
+
+def overdue_ticket_entry(ticket_id, ticket, current_date):
+    """Index entry for a ticket if it is active and overdue at current_date, else None."""
+    from routes.tickets import calculate_completed_months
+
+    if ticket.get('status') != 'Active':
+        return None
+    start_date_str = ticket.get('startDate')
+    if not start_date_str:
+        return None
+    try:
+        start_date = parse_date(start_date_str)
+        completed_months = calculate_completed_months(start_date, current_date)
+    except Exception as e:
+        print(f"Error parsing date {start_date_str}: {e}")
+        return None
+
+    interest_received_months = ticket.get('interestReceivedMonths', 0)
+    pending_interest_months = max(0, completed_months - interest_received_months)
+    if pending_interest_months < overdue_threshold(ticket.get('itemType', 'Silver')):
+        return None
+
+    return {
+        'id': ticket_id,
+        'articleName': ticket.get('articleName'),
+        'principal': ticket.get('principal'),
+        'pendingPrincipal': ticket.get('pendingPrincipal'),
+        'interestPercentage': ticket.get('interestPercentage'),
+        'startDate': ticket.get('startDate'),
+        'monthsPending': pending_interest_months,
+        'interestReceivedMonths': interest_received_months,
+        'status': ticket.get('status')
+    }
+
+def _customer_entry(customer_id, ticket, tickets, current_date):
+    return {
+        'customerId': customer_id,
+        'customerName': ticket.get('customerName'),
+        'customerPhone': ticket.get('customerPhone'),
+        'customerAddress': ticket.get('customerAddress'),
+        'ticketCount': len(tickets),
+        'tickets': tickets,
+        'asOf': current_date.date().isoformat(),
+        'updatedAt': datetime.now().isoformat()
+    }
+
+def refresh_overdue_customers(db, customer_ids):
+    """
+    Recompute the index entries of the given customers from their tickets.
+    Best effort: failures are logged, the daily sweep repairs the entry.
+    """
+    current_date = datetime.now()
+    for customer_id in {customer_id for customer_id in customer_ids if customer_id}:
+        try:
+            overdue_tickets = []
+            contact_ticket = None
+            for doc in db.collection('tickets').where('customerId', '==', customer_id).stream():
+                ticket = doc.to_dict()
+                entry = overdue_ticket_entry(doc.id, ticket, current_date)
+                if entry:
+                    overdue_tickets.append(entry)
+                    contact_ticket = contact_ticket or ticket
+
+            entry_ref = db.collection(OVERDUE_COLLECTION).document(customer_id)
+            if overdue_tickets:
+                entry_ref.set(_customer_entry(customer_id, contact_ticket, overdue_tickets, current_date))
+            elif entry_ref.get().exists:
+                entry_ref.delete()
+        except Exception as e:
+            print(f"[OVERDUE] Could not refresh customer {customer_id}: {str(e)}")
+
+def remove_overdue_customer(writer, db, customer_id):
+    """Queue the removal of a customer's index entry on a batch."""
+    writer.delete(db.collection(OVERDUE_COLLECTION).document(customer_id))
+
+def sweep_overdue_index(db):
+    """Rebuild the whole index from active tickets. Returns the counts written."""
+    current_date = datetime.now()
+
+    # Hash-based grouping: customerId -> (ticket used for the contact fields, overdue tickets)
+    customers = {}
+    scanned = 0
+    without_customer = 0
+    for doc in db.collection('tickets').where('status', '==', 'Active').stream():
+        scanned += 1
+        ticket = doc.to_dict()
+        entry = overdue_ticket_entry(doc.id, ticket, current_date)
+        if entry:
+            customer_id = ticket.get('customerId')
+            # Entries are keyed by customer id; document(None) would create a random-id entry
+            if not customer_id:
+                without_customer += 1
+                continue
+            customers.setdefault(customer_id, (ticket, []))[1].append(entry)
+
+    writer = ChunkedBatch(db)
+    for customer_id, (ticket, tickets) in customers.items():
+        writer.set(db.collection(OVERDUE_COLLECTION).document(customer_id),
+                   _customer_entry(customer_id, ticket, tickets, current_date))
+    removed = 0
+    for doc in db.collection(OVERDUE_COLLECTION).stream():
+        if doc.id not in customers:
+            writer.delete(db.collection(OVERDUE_COLLECTION).document(doc.id))
+            removed += 1
+
+    stats = {
+        'sweptOn': current_date.date().isoformat(),
+        'sweptAt': datetime.now().isoformat(),
+        'ticketsScanned': scanned,
+        'customers': len(customers),
+        'tickets': sum(len(tickets) for _, tickets in customers.values()),
+        'removed': removed,
+        'skippedWithoutCustomer': without_customer
+    }
+    writer.set(db.collection(META_COLLECTION).document(OVERDUE_META_DOC), stats)
+    written = writer.commit()
+    return {
+        **stats,
+        'documentsWritten': written,
+        'durationMs': round((datetime.now() - current_date).total_seconds() * 1000)
+    }
+
+def ensure_overdue_index_current(db):
+    """Sweep the index unless it was already swept today. Returns True if a sweep ran."""
+    today = datetime.now().date().isoformat()
+    meta_ref = db.collection(META_COLLECTION).document(OVERDUE_META_DOC)
+    meta_doc = meta_ref.get()
+    if meta_doc.exists and (meta_doc.to_dict() or {}).get('sweptOn') == today:
+        return False
+
+    with _sweep_lock:
+        # Another request may have swept while this one waited
+        meta_doc = meta_ref.get()
+        if meta_doc.exists and (meta_doc.to_dict() or {}).get('sweptOn') == today:
+            return False
+        sweep_overdue_index(db)
+    return True
@@ -0,0 +1,73 @@
+"""
+Scheduled overdue computation.
+
+run_overdue_job() is the nightly run: it rebuilds the overdue index in one
+batched pass over active tickets (sweep_overdue_index), optionally queues a
+reminder campaign to the overdue customers, and records the run in the
+`overdue_runs` collection with its duration and document counts. Daytime
+requests then only read the precomputed index; ensure_overdue_index_current()
+stays as the fallback when a night's run did not happen.
+
+It is started by run_overdue_job.py (cron inside the container) or by Cloud
+Scheduler calling POST /api/alerts/overdue-interests/nightly.
+
+Reminders default to OVERDUE_REMINDER_METHOD and OVERDUE_REMINDER_MESSAGE.
+Customers alerted within ALERT_THROTTLE_HOURS are skipped, so keep the throttle
+window below the schedule's interval for them to be reminded on every run.
+"""
+import os
+import time
+from datetime import datetime
+from services.overdue_index import sweep_overdue_index
+
+OVERDUE_RUNS_COLLECTION = 'overdue_runs'
+DEFAULT_REMINDER_METHOD = os.getenv('OVERDUE_REMINDER_METHOD', 'sms')
+DEFAULT_REMINDER_MESSAGE = os.getenv(
+    'OVERDUE_REMINDER_MESSAGE',
+    'Dear {customerName}, interest on your pledge is pending for {monthsPending} months. Please visit us to renew.'
+)
+
+def run_overdue_job(db, send_reminders=False, method=None, message=None, trigger='cli'):
+    """
+    Sweep the overdue index and, if send_reminders, queue reminders to the overdue
+    customers. Records and returns the run document.
+    """
+    started_at = datetime.now()
+    started = time.perf_counter()
+    run = {'trigger': trigger, 'startedAt': started_at.isoformat(), 'status': 'completed'}
+
+    try:
+        run['sweep'] = sweep_overdue_index(db)
+        if send_reminders:
+            from routes.alerts import queue_overdue_reminders
+
+            reminders = queue_overdue_reminders(
+                db, message or DEFAULT_REMINDER_MESSAGE, method or DEFAULT_REMINDER_METHOD
+            )
+            run['reminders'] = {
+                'campaignId': reminders['campaignId'],
+                'method': reminders['method'],
+                'queued': reminders['queued'],
+                'skipped': len(reminders['skipped'])
+            }
+    except Exception as e:
+        run['status'] = 'failed'
+        run['error'] = str(e)
+
+    run['finishedAt'] = datetime.now().isoformat()
+    run['durationMs'] = round((time.perf_counter() - started) * 1000)
+
+    run_ref = db.collection(OVERDUE_RUNS_COLLECTION).document()
+    run_ref.set(run)
+    run['id'] = run_ref.id
+    return run
+
+def recent_overdue_runs(db, limit=10):
+    """The latest recorded runs, newest first."""
+    query = db.collection(OVERDUE_RUNS_COLLECTION).order_by('startedAt', direction='DESCENDING').limit(limit)
+    runs = []
+    for doc in query.stream():
+        run = doc.to_dict()
+        run['id'] = doc.id
+        runs.append(run)
+    return runs
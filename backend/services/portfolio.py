@@ -0,0 +1,221 @@
+"""
+Portfolio analytics over columnar active-ticket data.
+
+Active tickets are read in one streaming pass into NumPy arrays (start date,
+pending principal, interest rate, interest months received, item type) and kept
+until the tickets or payments data version changes. Month arithmetic is done for
+all tickets at once by completed_months_array(), a vectorized version of
+routes.tickets.calculate_completed_months that works on calendar dates.
+
+NumPy is imported lazily; without it the functions raise ImportError.
+"""
+import re
+import threading
+from services.data_versions import get_data_versions
+
+DEFAULT_ITEM_TYPE = 'Silver'
+# Aging buckets by months of interest pending: [0, 3), [3, 6), [6, 12), [12, ...)
+AGING_EDGES = (3, 6, 12)
+AGING_BUCKETS = ('0-3', '3-6', '6-12', '12+')
+MAX_FORECAST_MONTHS = 60
+
+_DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}')
+_cache_lock = threading.Lock()
+_cached = {'versions': None, 'columns': None, 'aging_key': None, 'aging': None}
+
+def _numpy():
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError('NumPy is required for portfolio reports. Install it with: pip install numpy')
+    return np
+
+def completed_months_array(np, start_dates, end_date):
+    """
+    calculate_completed_months for an array of datetime64[D] start dates and one end date:
+    whole months plus 0.5 for 1-15 extra days or 1.0 for 16+ extra days.
+    """
+    end = np.datetime64(end_date, 'D')
+    start_months = start_dates.astype('datetime64[M]')
+    end_month = end.astype('datetime64[M]')
+    start_days = (start_dates - start_months).astype(np.int64) + 1
+    end_day = int((end - end_month).astype(np.int64)) + 1
+
+    months_diff = (end_month - start_months).astype(np.int64)
+    same_month = months_diff == 0
+    before_start_day = end_day < start_days
+
+    # Within the start month the fraction comes from the days elapsed
+    days_elapsed = (end - start_dates).astype(np.int64)
+    # Otherwise from the days into the current, possibly incomplete, month
+    days_into_month = np.where(before_start_day, end_day, end_day - start_days)
+    days = np.where(same_month, days_elapsed, days_into_month)
+    fraction = np.where(days > 15, 1.0, np.where(days > 0, 0.5, 0.0))
+
+    whole_months = np.where(same_month, 0, np.maximum(months_diff - before_start_day, 0))
+    return np.round(whole_months + fraction, 1)
+
+def _read_active_ticket_columns(db, np):
+    type_codes = {}
+    start_dates, pending, rates, received, types = [], [], [], [], []
+    for doc in db.collection('tickets').where('status', '==', 'Active').stream():
+        ticket = doc.to_dict()
+        start_date = str(ticket.get('startDate') or '')
+        if not _DATE_PATTERN.match(start_date):
+            continue
+        item_type = str(ticket.get('itemType') or DEFAULT_ITEM_TYPE).strip().title()
+        start_dates.append(start_date[:10])
+        pending.append(ticket.get('pendingPrincipal', ticket.get('principal', 0)) or 0)
+        rates.append(ticket.get('interestPercentage', 0) or 0)
+        received.append(ticket.get('interestReceivedMonths', 0) or 0)
+        types.append(type_codes.setdefault(item_type, len(type_codes)))
+
+    return {
+        'startDate': np.array(start_dates, dtype='datetime64[D]'),
+        'pendingPrincipal': np.array(pending, dtype=np.float64),
+        'interestPercentage': np.array(rates, dtype=np.float64),
+        'interestReceivedMonths': np.array(received, dtype=np.float64),
+        'itemType': np.array(types, dtype=np.int32),
+        'itemTypeNames': list(type_codes)
+    }
+
+def load_active_ticket_columns(db):
+    """Active ticket columns for the current tickets/payments versions, loaded at most once per version."""
+    np = _numpy()
+    versions = get_data_versions(db, 'tickets', 'payments')
+    with _cache_lock:
+        if _cached['versions'] != versions:
+            _cached['columns'] = _read_active_ticket_columns(db, np)
+            _cached['versions'] = versions
+        return _cached['versions'], _cached['columns']
+
+def _totals(count, principal, interest):
+    return {
+        'ticketCount': int(count),
+        'outstandingPrincipal': round(float(principal), 2),
+        'interestDue': round(float(interest), 2)
+    }
+
+def aging_report(columns, as_of):
+    """
+    Outstanding principal and interest due per aging bucket and item type, where a
+    ticket's age is its months of interest pending (elapsed months minus months paid).
+    """
+    np = _numpy()
+    elapsed = completed_months_array(np, columns['startDate'], as_of)
+    pending_months = np.maximum(elapsed - columns['interestReceivedMonths'], 0)
+    principal = columns['pendingPrincipal']
+    interest_due = principal * columns['interestPercentage'] / 100 * pending_months
+
+    bucket_count = len(AGING_BUCKETS)
+    type_names = columns['itemTypeNames']
+    groups = columns['itemType'] * bucket_count + np.digitize(pending_months, AGING_EDGES)
+    size = len(type_names) * bucket_count
+    counts = np.bincount(groups, minlength=size).reshape(-1, bucket_count)
+    principal_sums = np.bincount(groups, weights=principal, minlength=size).reshape(-1, bucket_count)
+    interest_sums = np.bincount(groups, weights=interest_due, minlength=size).reshape(-1, bucket_count)
+
+    by_item_type = {
+        name: {
+            bucket: _totals(counts[code, b], principal_sums[code, b], interest_sums[code, b])
+            for b, bucket in enumerate(AGING_BUCKETS)
+        }
+        for code, name in enumerate(type_names)
+    }
+    totals = {
+        bucket: _totals(counts[:, b].sum(), principal_sums[:, b].sum(), interest_sums[:, b].sum())
+        for b, bucket in enumerate(AGING_BUCKETS)
+    }
+    return {
+        'asOf': as_of.isoformat(),
+        'buckets': list(AGING_BUCKETS),
+        'byItemType': by_item_type,
+        'totals': totals,
+        'portfolio': _totals(counts.sum(), principal.sum(), interest_due.sum())
+    }
+
+def cached_aging_report(db, as_of):
+    """aging_report for the current data, recomputed only when the data or the day changes."""
+    versions, columns = load_active_ticket_columns(db)
+    key = (versions, as_of.isoformat())
+    with _cache_lock:
+        if _cached['aging_key'] == key:
+            return _cached['aging']
+    report = aging_report(columns, as_of)
+    with _cache_lock:
+        _cached['aging_key'] = key
+        _cached['aging'] = report
+    return report
+
+def next_due_months_array(np, start_dates, received_months, as_of):
+    """
+    Calendar month (datetime64[M]) of each ticket's next interest due date. Month n
+    of interest is due n - 1 months after the start date (clamped to the month's
+    last day), so the next due date is the first one after as_of that is not
+    already covered by the months received (a partly paid month counts as paid).
+    """
+    as_of = np.datetime64(as_of, 'D')
+    as_of_month = as_of.astype('datetime64[M]')
+    as_of_day = int((as_of - as_of_month).astype(np.int64)) + 1
+    days_in_month = int(((as_of_month + 1).astype('datetime64[D]') - as_of_month.astype('datetime64[D]')).astype(np.int64))
+
+    start_months = start_dates.astype('datetime64[M]')
+    start_days = (start_dates - start_months).astype(np.int64) + 1
+    # Months after the start of the first due date later than as_of
+    months_diff = (as_of_month - start_months).astype(np.int64)
+    due_day_passed = np.minimum(start_days, days_in_month) <= as_of_day
+    first_future = np.maximum(months_diff + due_day_passed, 0)
+
+    next_due = np.maximum(np.ceil(received_months).astype(np.int64), first_future)
+    return start_months + next_due
+
+def interest_forecast(columns, as_of, months):
+    """
+    Expected interest inflow per calendar month for the next `months` months,
+    starting with the rest of the current month. Each active ticket pays
+    pendingPrincipal * interestPercentage% on every monthly due date from its next
+    one (see next_due_months_array), so it adds one month of interest to each
+    forecast month from the month of that date on; the principal is assumed to stay
+    outstanding. Interest already accrued but not yet received, counted with the
+    calculate_completed_months half/full month rules, is reported separately as
+    arrears.
+    """
+    np = _numpy()
+    if not 1 <= months <= MAX_FORECAST_MONTHS:
+        raise ValueError(f'months must be between 1 and {MAX_FORECAST_MONTHS}')
+
+    starts = columns['startDate']
+    monthly_interest = columns['pendingPrincipal'] * columns['interestPercentage'] / 100
+    type_names = columns['itemTypeNames']
+    type_codes = columns['itemType']
+
+    def by_item_type(amounts):
+        sums = np.bincount(type_codes, weights=amounts, minlength=len(type_names))
+        return {name: round(float(sums[code]), 2) for code, name in enumerate(type_names)}
+
+    accrued = completed_months_array(np, starts, as_of)
+    arrears = monthly_interest * np.maximum(accrued - columns['interestReceivedMonths'], 0)
+
+    next_due = next_due_months_array(np, starts, columns['interestReceivedMonths'], as_of)
+    forecast_months = np.datetime64(as_of, 'M') + np.arange(months)
+
+    forecast = []
+    for month in forecast_months:
+        inflow = np.where(next_due <= month, monthly_interest, 0.0)
+        forecast.append({
+            'month': str(month),
+            'expectedInterest': round(float(inflow.sum()), 2),
+            'byItemType': by_item_type(inflow)
+        })
+
+    return {
+        'asOf': as_of.isoformat(),
+        'months': months,
+        'activeTickets': int(len(starts)),
+        'arrears': {
+            'interest': round(float(arrears.sum()), 2),
+            'byItemType': by_item_type(arrears)
+        },
+        'forecast': forecast,
+        'totalExpectedInterest': round(sum(month['expectedInterest'] for month in forecast), 2)
+    }
@@ -0,0 +1,61 @@
+"""
+On-disk cache of generated report files.
+
+A report result is identified by (report type, params, data versions): as long as
+none of the collections the report reads has been written to, the same request
+maps to the same key and the stored file is served as-is. Files are written to a
+temporary name and renamed into place, so readers never see a partial file.
+
+The cache is local to each instance (REPORT_CACHE_DIR, defaulting to the system
+temp directory); another instance simply regenerates the file.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+REPORT_CACHE_DIR = os.getenv('REPORT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'report_cache'))
+# Oldest files beyond this count are removed whenever a report is stored
+MAX_CACHED_REPORTS = 100
+
+def report_cache_key(report, params, versions):
+    """Stable key for a report request at the given data versions."""
+    payload = json.dumps([report, params, list(versions)], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def cached_report_path(key, extension):
+    return os.path.join(REPORT_CACHE_DIR, f'{key}{extension}')
+
+def get_cached_report(key, extension):
+    """Path of the cached file for key, or None if it has not been generated here."""
+    path = cached_report_path(key, extension)
+    return path if os.path.exists(path) else None
+
+def store_report(key, extension, write):
+    """Generate a report file with write(path) and move it into the cache. Returns the path."""
+    os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+    path = cached_report_path(key, extension)
+    fd, temp_path = tempfile.mkstemp(dir=REPORT_CACHE_DIR, suffix='.tmp')
+    os.close(fd)
+    try:
+        write(temp_path)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    prune_report_cache()
+    return path
+
+def prune_report_cache(max_files=MAX_CACHED_REPORTS):
+    """Remove the least recently written reports beyond max_files."""
+    try:
+        entries = [entry for entry in os.scandir(REPORT_CACHE_DIR) if entry.is_file() and not entry.name.endswith('.tmp')]
+    except FileNotFoundError:
+        return
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in entries[max_files:]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
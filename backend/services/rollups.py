@@ -0,0 +1,104 @@
+"""
+Pre-aggregated monthly payment totals.
+
+Every payment create/edit/delete adjusts the rollup document of the month of its
+`date` with atomic increments, so the monthly interest report reads one document
+instead of scanning the payments collection. Rollups live in the `rollups`
+collection with ids like `monthly_2025-01` (Firestore document paths cannot end in
+a collection, so `rollups/monthly/{YYYY-MM}` is flattened into the id).
+migrations/rebuild_monthly_rollups.py recomputes each month from its payments in a
+transaction (rebuild_monthly_rollup) and then records `rebuiltAt` on
+meta/monthly_rollups. Until that marker exists the rollups only hold
+the deltas written since deploy, so readers must not treat them as totals.
+"""
+import re
+from services.db import increment
+
+ROLLUPS_COLLECTION = 'rollups'
+META_COLLECTION = 'meta'
+ROLLUPS_META_DOC = 'monthly_rollups'
+_MONTH_PATTERN = re.compile(r'^\d{4}-\d{2}')
+
+def month_key(date_str):
+    """Return YYYY-MM for a YYYY-MM-DD or ISO datetime string, or None if it has no month."""
+    if not date_str or not _MONTH_PATTERN.match(str(date_str)):
+        return None
+    return str(date_str)[:7]
+
+def monthly_rollup_ref(db, month):
+    """Document reference of the rollup for a YYYY-MM month."""
+    return db.collection(ROLLUPS_COLLECTION).document(f'monthly_{month}')
+
+def rollups_meta_ref(db):
+    """Document recording when the monthly rollups were last rebuilt from the payments."""
+    return db.collection(META_COLLECTION).document(ROLLUPS_META_DOC)
+
+def monthly_rollup_deltas(old_payment, new_payment):
+    """
+    Per-month (interest, principal, count) changes when old_payment becomes new_payment.
+    Either side may be None (payment created/deleted). Months without change are omitted.
+    """
+    deltas = {}
+    for payment, sign in ((old_payment, -1), (new_payment, 1)):
+        if not payment:
+            continue
+        month = month_key(payment.get('date'))
+        if not month:
+            continue
+        interest, principal, count = deltas.get(month, (0, 0, 0))
+        deltas[month] = (
+            interest + sign * (payment.get('interestPaid', 0) or 0),
+            principal + sign * (payment.get('principalPaid', 0) or 0),
+            count + sign
+        )
+    return {month: delta for month, delta in deltas.items() if any(delta)}
+
+def merge_rollup_deltas(into, deltas):
+    """Add per-month deltas into an accumulator dict (used to combine many payments)."""
+    for month, delta in deltas.items():
+        current = into.get(month, (0, 0, 0))
+        into[month] = tuple(a + b for a, b in zip(current, delta))
+    return into
+
+def write_rollup_deltas(writer, db, deltas):
+    """Queue rollup increments for per-month deltas on a batch or transaction."""
+    for month, (interest, principal, count) in deltas.items():
+        if not (interest or principal or count):
+            continue
+        writer.set(monthly_rollup_ref(db, month), {
+            'period': 'monthly',
+            'month': month,
+            'interest': increment(interest),
+            'principal': increment(principal),
+            'count': increment(count)
+        }, merge=True)
+
+def apply_monthly_rollups(writer, db, old_payment, new_payment):
+    """Queue the rollup increments for a payment change on a batch or transaction."""
+    write_rollup_deltas(writer, db, monthly_rollup_deltas(old_payment, new_payment))
+
+def next_month_key(month):
+    """The YYYY-MM month after a YYYY-MM month."""
+    year, month_number = int(month[:4]), int(month[5:7])
+    return f'{year + month_number // 12:04d}-{month_number % 12 + 1:02d}'
+
+def rebuild_monthly_rollup(transaction, db, month):
+    """
+    Transaction body: recompute a month's rollup from its payments and store it.
+    Every payment write also increments the month's rollup, which is read here, so a
+    payment written meanwhile makes the transaction retry instead of being lost.
+    Returns the rollup written.
+    """
+    rollup_ref = monthly_rollup_ref(db, month)
+    rollup_ref.get(transaction=transaction)
+
+    rollup = {'period': 'monthly', 'month': month, 'interest': 0, 'principal': 0, 'count': 0}
+    # Dates are stored as YYYY-MM-DD or ISO strings, so a string range selects the month
+    payments = db.collection('payments').where('date', '>=', month).where('date', '<', next_month_key(month))
+    for payment_doc in payments.stream(transaction=transaction):
+        payment = payment_doc.to_dict()
+        rollup['interest'] += payment.get('interestPaid', 0) or 0
+        rollup['principal'] += payment.get('principalPaid', 0) or 0
+        rollup['count'] += 1
+    transaction.set(rollup_ref, rollup)
+    return rollup
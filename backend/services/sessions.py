@@ -0,0 +1,77 @@
+"""
+Login sessions.
+
+Each login creates a `sessions` document whose id is the SHA-256 of the token
+(the token itself is never stored), so verifying a token is one point read
+instead of a users query, a user can be signed in on several devices at once,
+and logging in no longer writes to the user document. Users therefore have no
+lastLogin field; a session's createdAt is the time of that login.
+
+A session holds the user id, the profile fields and role copied at login, and
+its expiry. Deactivating a user or changing a password deletes the user's
+sessions, so the copies never outlive the state they were taken from. Expired
+sessions are rejected when read and removed in batches by
+cleanup_expired_sessions() (see cleanup_sessions.py).
+"""
+from datetime import datetime, timedelta
+from services.db import ChunkedBatch
+from services.token_cache import token_key
+
+SESSIONS_COLLECTION = 'sessions'
+SESSION_DAYS = 30
+SESSION_USER_FIELDS = ('username', 'name', 'email')
+
+def session_ref(db, token):
+    return db.collection(SESSIONS_COLLECTION).document(token_key(token))
+
+def session_data(user_id, user_data, expires_at, now=None):
+    """Session document for a user signing in."""
+    return {
+        'userId': user_id,
+        **{field: user_data.get(field) for field in SESSION_USER_FIELDS},
+        'role': user_data.get('role', 'user'),
+        'createdAt': (now or datetime.now()).isoformat(),
+        'expiresAt': expires_at.isoformat()
+    }
+
+def create_session(db, token, user_id, user_data):
+    """Store a session for a new token. Returns the session document."""
+    now = datetime.now()
+    session = session_data(user_id, user_data, now + timedelta(days=SESSION_DAYS), now)
+    session_ref(db, token).set(session)
+    return session
+
+def session_expired(session, now=None):
+    """Whether a session document is past its expiry (or has no valid expiry)."""
+    try:
+        return datetime.fromisoformat(session['expiresAt']) <= (now or datetime.now())
+    except (KeyError, TypeError, ValueError):
+        return True
+
+def get_session(db, token):
+    """The token's session document, or None if there is none or it has expired."""
+    session_doc = session_ref(db, token).get()
+    if not session_doc.exists:
+        return None
+    session = session_doc.to_dict()
+    return None if session_expired(session) else session
+
+def delete_session(db, token):
+    session_ref(db, token).delete()
+
+def delete_user_sessions(db, user_id, keep_token=None):
+    """Delete every session of a user, except the one of keep_token. Returns the number deleted."""
+    keep_id = token_key(keep_token) if keep_token else None
+    writer = ChunkedBatch(db)
+    for doc in db.collection(SESSIONS_COLLECTION).where('userId', '==', user_id).stream():
+        if doc.id != keep_id:
+            writer.delete(db.collection(SESSIONS_COLLECTION).document(doc.id))
+    return writer.commit()
+
+def cleanup_expired_sessions(db, now=None):
+    """Delete sessions past their expiry in batches. Returns the number deleted."""
+    cutoff = (now or datetime.now()).isoformat()
+    writer = ChunkedBatch(db)
+    for doc in db.collection(SESSIONS_COLLECTION).where('expiresAt', '<', cutoff).stream():
+        writer.delete(db.collection(SESSIONS_COLLECTION).document(doc.id))
+    return writer.commit()
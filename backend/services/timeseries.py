@@ -0,0 +1,133 @@
+"""
+Interest/principal trends over columnar payment data.
+
+Payment dates and amounts are loaded once into NumPy arrays (with the item type
+of each payment's ticket) and kept in memory until the payments or tickets data
+version changes. Each request then only masks the arrays and groups them into
+day/week/month buckets with np.bincount, so it does not touch the database
+beyond reading the data versions.
+
+NumPy is imported lazily; without it the functions raise ImportError.
+"""
+import re
+import threading
+from services.data_versions import get_data_versions
+
+GRANULARITIES = ('day', 'week', 'month')
+# A request may not produce more buckets than this (about 13 years of days)
+MAX_BUCKETS = 5000
+DEFAULT_ITEM_TYPE = 'Silver'
+
+_DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}')
+_cache_lock = threading.Lock()
+_cached = {'versions': None, 'columns': None}
+
+def _numpy():
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError('NumPy is required for time series reports. Install it with: pip install numpy')
+    return np
+
+def _read_payment_columns(db, np):
+    item_types = {}
+    for doc in db.collection('tickets').stream():
+        item_types[doc.id] = (doc.to_dict().get('itemType') or DEFAULT_ITEM_TYPE).lower()
+
+    type_names = sorted(set(item_types.values()))
+    type_codes = {name: code for code, name in enumerate(type_names)}
+    unknown_code = type_codes.setdefault(DEFAULT_ITEM_TYPE.lower(), len(type_codes))
+
+    dates, interest, principal, types = [], [], [], []
+    for doc in db.collection('payments').stream():
+        payment = doc.to_dict()
+        date = str(payment.get('date') or '')
+        if not _DATE_PATTERN.match(date):
+            continue
+        dates.append(date[:10])
+        interest.append(payment.get('interestPaid', 0) or 0)
+        principal.append(payment.get('principalPaid', 0) or 0)
+        item_type = item_types.get(payment.get('ticketId'))
+        types.append(type_codes[item_type] if item_type else unknown_code)
+
+    return {
+        'dates': np.array(dates, dtype='datetime64[D]'),
+        'interest': np.array(interest, dtype=np.float64),
+        'principal': np.array(principal, dtype=np.float64),
+        'itemType': np.array(types, dtype=np.int32),
+        'itemTypeCodes': type_codes
+    }
+
+def load_payment_columns(db):
+    """Payment columns for the current payments/tickets versions, loaded at most once per version."""
+    np = _numpy()
+    # Versions are read before the data, see services/data_versions.py
+    versions = get_data_versions(db, 'payments', 'tickets')
+    with _cache_lock:
+        if _cached['versions'] != versions:
+            _cached['columns'] = _read_payment_columns(db, np)
+            _cached['versions'] = versions
+        return _cached['columns']
+
+def _period_indexes(np, dates, granularity, start, end):
+    """Return (bucket index per date, bucket count, bucket labels) for the window."""
+    if granularity == 'month':
+        base = start.astype('datetime64[M]').astype(np.int64)
+        last = end.astype('datetime64[M]').astype(np.int64)
+        indexes = dates.astype('datetime64[M]').astype(np.int64) - base
+        labels = (base + np.arange(last - base + 1)).astype('datetime64[M]')
+    elif granularity == 'week':
+        # Weeks start on Monday; 1970-01-01 was a Thursday
+        base = (start.astype(np.int64) + 3) // 7
+        last = (end.astype(np.int64) + 3) // 7
+        indexes = (dates.astype(np.int64) + 3) // 7 - base
+        labels = ((base + np.arange(last - base + 1)) * 7 - 3).astype('datetime64[D]')
+    else:
+        base = start.astype(np.int64)
+        indexes = dates.astype(np.int64) - base
+        labels = start + np.arange(end.astype(np.int64) - base + 1)
+    return indexes, len(labels), labels
+
+def payment_timeseries(columns, granularity, start_date, end_date, item_type=None):
+    """
+    Bucket payment interest, principal and count between two dates (inclusive).
+    start_date/end_date are datetime.date values; item_type is matched case-insensitively.
+    Raises ValueError for an unknown granularity or a window with too many buckets.
+    """
+    np = _numpy()
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+
+    start = np.datetime64(start_date, 'D')
+    end = np.datetime64(end_date, 'D')
+    dates = columns['dates']
+    mask = (dates >= start) & (dates <= end)
+    if item_type:
+        code = columns['itemTypeCodes'].get(item_type.lower())
+        mask &= columns['itemType'] == code if code is not None else False
+
+    indexes, bucket_count, labels = _period_indexes(np, dates[mask], granularity, start, end)
+    if bucket_count > MAX_BUCKETS:
+        raise ValueError(f'Too many {granularity} buckets ({bucket_count}); narrow the date range')
+
+    interest = np.bincount(indexes, weights=columns['interest'][mask], minlength=bucket_count)
+    principal = np.bincount(indexes, weights=columns['principal'][mask], minlength=bucket_count)
+    counts = np.bincount(indexes, minlength=bucket_count)
+
+    buckets = [
+        {
+            'period': str(label),
+            'interest': round(float(interest[i]), 2),
+            'principal': round(float(principal[i]), 2),
+            'count': int(counts[i])
+        }
+        for i, label in enumerate(labels)
+    ]
+    return {
+        'buckets': buckets,
+        'totals': {
+            'interest': round(float(interest.sum()), 2),
+            'principal': round(float(principal.sum()), 2),
+            'count': int(counts.sum())
+        }
+    }
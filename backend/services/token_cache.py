@@ -0,0 +1,107 @@
+"""
+In-memory cache of verified auth tokens.
+
+Verifying a token otherwise costs a session read per request. Verified tokens are
+kept here, keyed by the SHA-256 of the token (the token itself is never held), with
+the user id, profile fields, role, active flag and session expiry. Entries live for
+AUTH_TOKEN_CACHE_SECONDS and the least recently used ones are evicted beyond
+AUTH_TOKEN_CACHE_SIZE.
+
+Login, logout, password changes and deactivation drop the affected entries on this
+instance and bump the `auth_tokens` data version
+(meta/data_versions_auth_tokens). Other instances compare that version at most
+every AUTH_TOKEN_VERSION_CHECK_SECONDS and clear their cache when it moved; set it
+to 0 to rely on the TTL alone.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from services.data_versions import bump_data_versions, get_data_versions
+
+TOKEN_CACHE_TTL = float(os.getenv('AUTH_TOKEN_CACHE_SECONDS', '60'))
+TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', '1024'))
+VERSION_CHECK_SECONDS = float(os.getenv('AUTH_TOKEN_VERSION_CHECK_SECONDS', '5'))
+AUTH_TOKENS_VERSION = 'auth_tokens'
+USER_FIELDS = ('username', 'name', 'email')
+
+_tokens = OrderedDict()
+_lock = threading.Lock()
+_version = None
+_version_checked = 0.0
+
+def token_key(token):
+    """SHA-256 hex digest of a token."""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+def _parse_expiry(value):
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+def token_entry(user_id, session):
+    """Cache entry for a session document."""
+    return {
+        'userId': user_id,
+        **{field: session.get(field) for field in USER_FIELDS},
+        'role': session.get('role', 'user'),
+        'isActive': session.get('isActive', True),
+        'expiresAt': _parse_expiry(session.get('expiresAt'))
+    }
+
+def cache_token(token, user_id, session):
+    """Remember a verified token. Returns its entry."""
+    entry = token_entry(user_id, session)
+    with _lock:
+        _tokens[token_key(token)] = (time.monotonic() + TOKEN_CACHE_TTL, entry)
+        _tokens.move_to_end(token_key(token))
+        while len(_tokens) > TOKEN_CACHE_SIZE:
+            _tokens.popitem(last=False)
+    return entry
+
+def cached_token(token):
+    """Entry of a cached token that is still fresh and unexpired, or None."""
+    key = token_key(token)
+    with _lock:
+        cached = _tokens.get(key)
+        if cached is None:
+            return None
+        cached_until, entry = cached
+        if time.monotonic() >= cached_until or (entry['expiresAt'] and datetime.now() > entry['expiresAt']):
+            del _tokens[key]
+            return None
+        _tokens.move_to_end(key)
+        return entry
+
+def sync_token_cache(db):
+    """Clear the cache if another instance invalidated tokens since the last check."""
+    global _version, _version_checked
+    if VERSION_CHECK_SECONDS <= 0 or time.monotonic() - _version_checked < VERSION_CHECK_SECONDS:
+        return
+    (version,) = get_data_versions(db, AUTH_TOKENS_VERSION)
+    with _lock:
+        if _version is not None and version != _version:
+            _tokens.clear()
+        _version = version
+        _version_checked = time.monotonic()
+
+def invalidate_tokens(db, token=None, user_id=None):
+    """
+    Drop a token and/or every cached token of a user here, and bump the version so
+    other instances drop theirs.
+    """
+    with _lock:
+        if token:
+            _tokens.pop(token_key(token), None)
+        if user_id:
+            for key in [key for key, (_, entry) in _tokens.items() if entry['userId'] == user_id]:
+                del _tokens[key]
+    if VERSION_CHECK_SECONDS > 0:
+        bump_data_versions(None, db, AUTH_TOKENS_VERSION)
+
+def clear_token_cache():
+    with _lock:
+        _tokens.clear()
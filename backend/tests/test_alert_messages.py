@@ -0,0 +1,67 @@
+import itertools
+import json
+import os
+import pytest
+from services import alert_messages
+from services.local_db import LocalDB
+from services.alert_messages import (
+    summarize_counts, matching_total, record_alert_message, record_alert_messages, message_counts,
+    all_messages_shard, HISTORY_FILTERS, ALERT_STATS_COLLECTION, ALL_MESSAGES_DOC, ALL_MESSAGES_SHARDS
+)
+
+INDEXES_FILE = os.path.join(os.path.dirname(__file__), '..', '..', 'firestore.indexes.json')
+
+def test_summary_splits_counters_by_status_and_method():
+    """Test that flat counters are grouped into byStatus and byMethod."""
+    counts = summarize_counts({'total': 5, 'status_sent': 4, 'status_failed': 1, 'method_sms': 5})
+    assert counts == {'total': 5, 'byStatus': {'sent': 4, 'failed': 1}, 'byMethod': {'sms': 5}}
+
+def test_matching_total_only_when_a_counter_covers_the_filters():
+    """Test that status and method together have no single counter."""
+    counts = summarize_counts({'total': 5, 'status_sent': 4, 'method_sms': 5})
+    assert matching_total(counts, {}) == 5
+    assert matching_total(counts, {'customerId': 'c1', 'status': 'sent'}) == 4
+    assert matching_total(counts, {'method': 'email'}) == 0
+    assert matching_total(counts, {'status': 'sent', 'method': 'sms'}) is None
+
+def test_every_history_filter_combination_has_an_index():
+    """Test that firestore.indexes.json covers each filter combination ordered by timestamp."""
+    with open(INDEXES_FILE) as f:
+        indexes = {
+            tuple(field['fieldPath'] for field in index['fields'])
+            for index in json.load(f)['indexes'] if index['collectionGroup'] == 'alert_messages'
+        }
+    for size in range(1, len(HISTORY_FILTERS) + 1):
+        for filters in itertools.combinations(HISTORY_FILTERS, size):
+            assert filters + ('timestamp',) in indexes
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return LocalDB()
+
+def test_whole_log_counts_are_spread_over_shards_and_summed(db, monkeypatch):
+    """Test that each batch increments one shard of the whole-log summary and reads add them up."""
+    shards = itertools.cycle(range(ALL_MESSAGES_SHARDS))
+    monkeypatch.setattr(alert_messages.random, 'randrange', lambda stop: next(shards))
+    for _ in range(ALL_MESSAGES_SHARDS):
+        record_alert_message(db, {'customerId': 'c1', 'status': 'sent', 'method': 'sms'})
+    batch = db.batch()
+    record_alert_messages(batch, db, [
+        {'customerId': 'c2', 'status': 'failed', 'method': 'sms'},
+        {'customerId': 'c2', 'status': 'sent', 'method': 'email'},
+    ])
+    batch.commit()
+
+    stats = db.collection(ALERT_STATS_COLLECTION)
+    assert stats.document(all_messages_shard(0)).get().to_dict()['total'] == 3
+    assert all(stats.document(all_messages_shard(shard)).get().to_dict()['total'] == 1 for shard in range(1, ALL_MESSAGES_SHARDS))
+    assert not stats.document(ALL_MESSAGES_DOC).get().exists
+
+    assert message_counts(db) == {'total': 12, 'byStatus': {'sent': 11, 'failed': 1}, 'byMethod': {'sms': 11, 'email': 1}}
+    assert message_counts(db, 'c2') == {'total': 2, 'byStatus': {'failed': 1, 'sent': 1}, 'byMethod': {'sms': 1, 'email': 1}}
+
+    # Counts kept in the unsharded document before the shards still add up
+    stats.document(ALL_MESSAGES_DOC).set({'total': 5, 'status_sent': 5, 'method_sms': 5})
+    assert message_counts(db)['total'] == 17
+    assert message_counts(db)['byMethod'] == {'sms': 16, 'email': 1}
@@ -0,0 +1,46 @@
+import time
+from services import db as db_service
+from services.local_db import LocalDB
+from services.background_jobs import create_job
+from services.alert_queue import (
+    RateLimiter, backoff_delay, campaign_counts, stored_campaign_counts, ALERT_QUEUE_COLLECTION, ALERT_CAMPAIGN_JOB
+)
+
+def test_rate_limiter_spaces_calls():
+    """Test that calls beyond the rate wait for their slot."""
+    limiter = RateLimiter(50)
+    started = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+    assert time.monotonic() - started >= 5 / 50 * 0.9
+
+def test_backoff_grows_exponentially():
+    """Test that each retry waits about twice as long as the previous one."""
+    assert 1 <= backoff_delay(1) <= 3
+    assert 4 <= backoff_delay(3) <= 12
+
+def test_campaign_counts_include_every_status():
+    """Test that statuses without items are reported as zero."""
+    counts = campaign_counts([('a', {'status': 'sent'}), ('b', {'status': 'sent'}), ('c', {'status': 'failed'})])
+    assert counts == {'queued': 0, 'sending': 0, 'sent': 2, 'failed': 1, 'pending_configuration': 0}
+
+def test_progress_serves_stored_counts_and_failed_items(client, tmp_path, monkeypatch):
+    """Test that campaign progress comes from the job's counts plus the failed items only."""
+    monkeypatch.chdir(tmp_path)
+    db = LocalDB()
+    monkeypatch.setattr(db_service, '_db', db)
+    create_job(ALERT_CAMPAIGN_JOB, {'campaignId': 'alerts_1', 'method': 'sms', 'total': 3}, 'alerts_1')
+    assert stored_campaign_counts(db.collection('jobs').document('alerts_1').get().to_dict())['queued'] == 3
+
+    db.collection('jobs').document('alerts_1').update({
+        'status': 'running', 'progress': {'queued': 1, 'sending': 0, 'sent': 1, 'failed': 1, 'pending_configuration': 0}
+    })
+    for item_id, status in (('a', 'sent'), ('b', 'failed'), ('c', 'queued')):
+        db.collection(ALERT_QUEUE_COLLECTION).document(item_id).set({
+            'campaignId': 'alerts_1', 'customerId': f'c_{item_id}', 'status': status, 'attempts': 3, 'lastError': 'timeout'
+        })
+
+    report = client.get('/api/alerts/send-bulk/alerts_1').json
+    assert report['total'] == 3
+    assert report['counts'] == {'queued': 1, 'sending': 0, 'sent': 1, 'failed': 1, 'pending_configuration': 0}
+    assert report['failed'] == [{'customerId': 'c_b', 'customerName': None, 'attempts': 3, 'error': 'timeout'}]
@@ -0,0 +1,80 @@
+import pytest
+from datetime import datetime, timedelta
+import services.db
+from services import alert_throttle
+from services.alert_throttle import last_alerted, reserve_alert, release_alert, recently_alerted
+from services.local_db import LocalDB
+
+def test_last_alerted_reads_the_method_timestamp():
+    """Test that the per-method time is parsed and bad values are ignored."""
+    customer = {'lastAlerted': {'sms': '2026-03-01T10:00:00', 'email': 'not a date', 'whatsapp': None}}
+    assert last_alerted(customer, 'sms') == datetime(2026, 3, 1, 10, 0)
+    assert last_alerted(customer, 'email') is None
+    assert last_alerted(customer, 'whatsapp') is None
+    assert last_alerted({}, 'sms') is None
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh local database with two customers, used by get_db()."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(alert_throttle, 'THROTTLE_WINDOW', timedelta(hours=24))
+    monkeypatch.setattr(alert_throttle, '_recent', {})
+    local = LocalDB()
+    monkeypatch.setattr(services.db, '_db', local)
+    for customer_id, name in (('c1', 'Ravi'), ('c2', 'Anita')):
+        local.collection('customers').document(customer_id).set({'name': name, 'phone': '9876543210'})
+    return local
+
+def test_reserve_alert_throttles_a_repeat(db):
+    """Test that a second alert inside the window is refused, from the cache and from the database."""
+    reserved, previous, throttled_until = reserve_alert(db, 'c1', 'sms')
+    assert reserved and previous is None and throttled_until is None
+
+    reserved, previous, throttled_until = reserve_alert(db, 'c1', 'sms')
+    assert not reserved and throttled_until
+
+    alert_throttle._recent.clear()
+    assert reserve_alert(db, 'c1', 'sms')[0] is False
+    assert reserve_alert(db, 'c1', 'email')[0] is True
+
+def test_release_alert_after_an_unsent_message(db):
+    """Test that releasing a reservation lets the next alert through."""
+    reserved, previous, _ = reserve_alert(db, 'c1', 'sms')
+    release_alert(db, 'c1', 'sms', previous)
+    assert db.collection('customers').document('c1').get().to_dict()['lastAlerted']['sms'] is None
+    assert reserve_alert(db, 'c1', 'sms')[0] is True
+
+def test_bulk_prefilter_skips_recent_and_missing_customers_unless_forced(db, monkeypatch):
+    """Test that bulk campaigns skip throttled and deleted customers, and force only bypasses the window."""
+    from routes import alerts
+    from services.overdue_index import OVERDUE_COLLECTION, META_COLLECTION, OVERDUE_META_DOC
+
+    reserve_alert(db, 'c1', 'stub')
+    for customer_id in ('c1', 'c2', 'gone'):
+        db.collection(OVERDUE_COLLECTION).document(customer_id).set(
+            {'customerId': customer_id, 'customerName': customer_id, 'customerPhone': '9876543210', 'tickets': []})
+    db.collection(META_COLLECTION).document(OVERDUE_META_DOC).set({'sweptOn': datetime.now().strftime('%Y-%m-%d')})
+
+    throttled, missing = recently_alerted(db, ['c1', 'c2', 'gone'], 'stub')
+    assert list(throttled) == ['c1'] and missing == {'gone'}
+
+    queued = []
+    monkeypatch.setattr(alerts, 'enqueue_campaign', lambda recipients, method, concurrency: queued.append(recipients) or 'alerts_test')
+    result = alerts.queue_overdue_reminders(db, 'Dear {customerName}', 'stub')
+    assert [recipient['customerId'] for recipient in queued[-1]] == ['c2']
+    assert {skip['customerId'] for skip in result['skipped']} == {'c1', 'gone'}
+
+    alerts.queue_overdue_reminders(db, 'Dear {customerName}', 'stub', force=True)
+    assert sorted(recipient['customerId'] for recipient in queued[-1]) == ['c1', 'c2']
+
+def test_send_message_repeat_returns_429(db, client):
+    """Test that a repeated single alert is throttled with 429 and force sends it anyway."""
+    body = {'message': 'Interest is pending', 'method': 'email'}
+    assert client.post('/api/alerts/send-message/c1', json=body).status_code == 200
+
+    response = client.post('/api/alerts/send-message/c1', json=body)
+    assert response.status_code == 429
+    assert response.json['status'] == 'throttled'
+    assert response.json['throttledUntil']
+
+    assert client.post('/api/alerts/send-message/c1', json={**body, 'force': True}).status_code == 200
@@ -0,0 +1,70 @@
+import threading
+import time
+from datetime import timedelta
+import pytest
+from services import db as db_service, background_jobs, report_cache
+from services.local_db import LocalDB
+from services.background_jobs import register_job_handler, start_job, get_job, resume_stale_jobs
+from routes import report_jobs
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    local = LocalDB()
+    monkeypatch.setattr(db_service, '_db', local)
+    return local
+
+def wait_for(job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = get_job(job_id)
+        if job.get('status') in ('completed', 'failed'):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f'Job {job_id} did not finish')
+
+def test_long_job_is_not_resubmitted_while_it_runs(db, monkeypatch):
+    """Test that the heartbeat keeps a silent long handler from being run twice."""
+    monkeypatch.setattr(background_jobs, 'STALE_AFTER', timedelta(seconds=0.2))
+    monkeypatch.setattr(background_jobs, 'HEARTBEAT_INTERVAL', timedelta(seconds=0.05))
+    calls = []
+    release = threading.Event()
+
+    def slow_handler(params, report_progress):
+        calls.append(params)
+        release.wait(5)
+        return {'done': True}
+
+    register_job_handler('test_slow', slow_handler)
+    job_id = start_job('test_slow', {'n': 1})
+    # Poll and resume for well past STALE_AFTER while the handler is still working
+    for _ in range(20):
+        get_job(job_id)
+        resume_stale_jobs()
+        time.sleep(0.03)
+    release.set()
+
+    job = wait_for(job_id)
+    assert job['status'] == 'completed'
+    assert job['attempts'] == 1
+    assert len(calls) == 1
+
+def test_report_job_reuses_the_cached_file(db, tmp_path, monkeypatch):
+    """Test that a second run of a report job serves the cached file without rebuilding."""
+    monkeypatch.setattr(report_cache, 'REPORT_CACHE_DIR', str(tmp_path / 'cache'))
+    builds = []
+
+    def spec(report, params):
+        def build(db, path):
+            builds.append(path)
+            with open(path, 'w') as output:
+                output.write('a,b\n')
+        return ('tickets',), '.csv', 'text/csv', build
+    monkeypatch.setattr(report_jobs, '_report_spec', spec)
+
+    params = {'report': 'outstanding-loans', 'params': {}, 'cacheKey': 'k' * 64}
+    first = report_jobs.run_report_job(params, lambda **progress: None)
+    second = report_jobs.run_report_job(params, lambda **progress: None)
+    assert first == second
+    assert first['size'] == 4
+    assert len(builds) == 1
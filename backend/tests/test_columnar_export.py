@@ -0,0 +1,78 @@
+from datetime import datetime
+from io import BytesIO
+import pytest
+from services import db as db_service
+from services.local_db import LocalDB
+from services.columnar_export import write_collection, export_schema, EXPORT_COLUMNS
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+pytest.importorskip('pyarrow.ipc')
+
+PAYMENTS = {
+    'p1': {'ticketId': 't1', 'billNumber': 'B-1', 'customerName': 'Ravi', 'date': '2025-03-10',
+           'interestPaid': 120, 'principalPaid': 0, 'monthsPaid': 1.5, 'remainingPrincipal': 5000},
+    # Offset dates are stored in UTC
+    'p2': {'ticketId': 't1', 'date': '2025-03-11T10:30:00+05:30', 'interestPaid': '80.5'},
+    # Missing, empty and unconvertible values all become nulls
+    'p3': {'ticketId': 't2', 'billNumber': '', 'date': 'not a date', 'interestPaid': 'n/a'},
+}
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    local = LocalDB()
+    monkeypatch.setattr(db_service, '_db', local)
+    for payment_id, payment in PAYMENTS.items():
+        local.collection('payments').document(payment_id).set(payment)
+    return local
+
+def rows_by_id(table):
+    return {row['id']: row for row in table.to_pylist()}
+
+def check_payments(table):
+    assert table.schema == export_schema(pa, 'payments')
+    assert table.num_rows == len(PAYMENTS)
+    rows = rows_by_id(table)
+    assert rows['p1']['date'] == datetime(2025, 3, 10)
+    assert rows['p1']['monthsPaid'] == 1.5
+    assert rows['p2']['date'] == datetime(2025, 3, 11, 5, 0)
+    assert rows['p2']['interestPaid'] == 80.5
+    assert rows['p2']['billNumber'] is None and rows['p2']['principalPaid'] is None
+    assert rows['p3'] == {**{name: None for name, _ in EXPORT_COLUMNS['payments']}, 'id': 'p3', 'ticketId': 't2'}
+
+def test_parquet_round_trip(db, tmp_path):
+    """Test that the Parquet file reads back with the export schema, every row and nulls for missing fields."""
+    path = str(tmp_path / 'payments.parquet')
+    assert write_collection(db, 'payments', path, 'parquet', row_group_size=2) == 3
+    assert pq.ParquetFile(path).num_row_groups == 2
+    check_payments(pq.read_table(path))
+
+def test_arrow_round_trip(db):
+    """Test that the Arrow IPC file reads back the same as the Parquet one."""
+    sink = BytesIO()
+    assert write_collection(db, 'payments', sink, 'arrow') == 3
+    check_payments(pa.ipc.open_file(BytesIO(sink.getvalue())).read_all())
+
+def test_customers_skip_deleted_and_empty_collection(db, tmp_path):
+    """Test that customers being deleted are left out and an empty collection still has a schema."""
+    db.collection('customers').document('c1').set({'name': 'Ravi', 'totalTickets': '2', 'createdAt': '2025-01-05T09:00:00'})
+    db.collection('customers').document('c2').set({'name': 'Old', 'deletionJobId': 'job1'})
+    path = str(tmp_path / 'customers.parquet')
+    assert write_collection(db, 'customers', path) == 1
+    table = pq.read_table(path)
+    assert table.schema == export_schema(pa, 'customers')
+    assert table.column('totalTickets').to_pylist() == [2]
+    assert table.column('activeTickets').null_count == 1
+
+    path = str(tmp_path / 'tickets.parquet')
+    assert write_collection(db, 'tickets', path) == 0
+    table = pq.read_table(path)
+    assert table.num_rows == 0 and table.schema == export_schema(pa, 'tickets')
+
+def test_unknown_collection_or_format(db, tmp_path):
+    """Test that only the exportable collections and formats are accepted."""
+    with pytest.raises(ValueError):
+        write_collection(db, 'users', str(tmp_path / 'users.parquet'))
+    with pytest.raises(ValueError):
+        write_collection(db, 'payments', str(tmp_path / 'payments.csv'), 'csv')
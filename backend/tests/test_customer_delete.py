@@ -0,0 +1,92 @@
+import pytest
+from services import db as db_service
+from services.db import ChunkedBatch
+from services.local_db import LocalDB, WriteBatch
+from services.rollups import ROLLUPS_COLLECTION, apply_monthly_rollups, month_key
+from routes import customers
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    local = LocalDB()
+    monkeypatch.setattr(db_service, '_db', local)
+    return local
+
+def seed_customer(db, customer_id, tickets=2, payments_per_ticket=6):
+    """A customer with tickets and payments spread over three months, rollups included."""
+    db.collection('customers').document(customer_id).set({'name': f'Customer {customer_id}'})
+    payments = {}
+    seed = db.batch()
+    for ticket_index in range(tickets):
+        ticket_id = f'{customer_id}_t{ticket_index}'
+        db.collection('tickets').document(ticket_id).set({'customerId': customer_id})
+        for payment_index in range(payments_per_ticket):
+            payment = {'ticketId': ticket_id, 'date': f'2024-0{payment_index % 3 + 1}-10',
+                       'interestPaid': 100, 'principalPaid': 0}
+            payment_id = f'{ticket_id}_p{payment_index}'
+            db.collection('payments').document(payment_id).set(payment)
+            apply_monthly_rollups(seed, db, None, payment)
+            payments[payment_id] = payment
+    seed.commit()
+    return payments
+
+def rollup_totals(db):
+    return {doc.id: (doc.to_dict()['interest'], doc.to_dict()['count']) for doc in db.collection(ROLLUPS_COLLECTION).stream()}
+
+def test_cascade_delete_keeps_rollup_deltas_with_their_payments(db, monkeypatch):
+    """Test that every batch deleting payments also carries those payments' rollup deltas."""
+    payments = seed_customer(db, 'c1')
+
+    batches = []
+    original_commit = WriteBatch.commit
+    def recording_commit(batch):
+        batches.append(list(batch._writes))
+        return original_commit(batch)
+    monkeypatch.setattr(WriteBatch, 'commit', recording_commit)
+    monkeypatch.setattr(customers, 'ChunkedBatch', lambda db: ChunkedBatch(db, limit=5))
+
+    result = customers.cascade_delete_customer({'customerId': 'c1'}, lambda **progress: None)
+
+    assert result['deletedPayments'] == 12
+    for writes in batches:
+        deleted_months = {month_key(payments[ref.id]['date']) for op, ref, _ in writes
+                          if op == 'delete' and ref.collection_name == 'payments'}
+        rollup_months = {ref.id.replace('monthly_', '') for op, ref, _ in writes
+                         if ref.collection_name == ROLLUPS_COLLECTION}
+        assert deleted_months <= rollup_months
+        assert len(writes) <= 5
+    for rollup in db.collection(ROLLUPS_COLLECTION).stream():
+        assert rollup.to_dict()['count'] == 0
+        assert rollup.to_dict()['interest'] == 0
+
+def test_cascade_delete_resumes_after_a_crash(db, monkeypatch):
+    """Test that re-running an interrupted delete, and running it again, ends consistent."""
+    seed_customer(db, 'c1')
+    seed_customer(db, 'c2', tickets=1, payments_per_ticket=3)
+    monkeypatch.setattr(customers, 'ChunkedBatch', lambda db: ChunkedBatch(db, limit=5))
+
+    # The third commit fails, as if the worker stopped partway through the payments
+    commits = []
+    original_commit = WriteBatch.commit
+    def crashing_commit(batch):
+        commits.append(len(batch._writes))
+        if len(commits) == 3:
+            raise RuntimeError('worker stopped')
+        return original_commit(batch)
+    monkeypatch.setattr(WriteBatch, 'commit', crashing_commit)
+    with pytest.raises(RuntimeError):
+        customers.cascade_delete_customer({'customerId': 'c1'}, lambda **progress: None)
+    monkeypatch.setattr(WriteBatch, 'commit', original_commit)
+    left = [doc.id for doc in db.collection('payments').stream() if doc.id.startswith('c1_')]
+    assert 0 < len(left) < 12
+
+    result = customers.cascade_delete_customer({'customerId': 'c1'}, lambda **progress: None)
+    assert result['deletedPayments'] == len(left)
+    again = customers.cascade_delete_customer({'customerId': 'c1'}, lambda **progress: None)
+    assert (again['deletedPayments'], again['deletedTickets']) == (0, 0)
+
+    # Only the other customer's tickets, payments and rollup amounts remain
+    assert {doc.id for doc in db.collection('tickets').stream()} == {'c2_t0'}
+    assert {doc.id for doc in db.collection('payments').stream()} == {'c2_t0_p0', 'c2_t0_p1', 'c2_t0_p2'}
+    assert not db.collection('customers').document('c1').get().exists
+    assert rollup_totals(db) == {'monthly_2024-01': (100, 1), 'monthly_2024-02': (100, 1), 'monthly_2024-03': (100, 1)}
@@ -0,0 +1,41 @@
+import pytest
+from services.local_db import LocalDB
+from services.customer_keys import claim_keys_and_create, claim_keys_and_update, KEYS_COLLECTION
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return LocalDB()
+
+def create(db, customer_id, **customer):
+    return db.run_transaction(claim_keys_and_create, db, db.collection('customers').document(customer_id), customer)
+
+def update(db, customer_id, **update_data):
+    return db.run_transaction(claim_keys_and_update, db, db.collection('customers').document(customer_id), update_data)
+
+def key_owner(db, key_id):
+    doc = db.collection(KEYS_COLLECTION).document(key_id).get()
+    return doc.to_dict()['customerId'] if doc.exists else None
+
+def test_create_and_update_reject_keys_held_by_another_customer(db):
+    """Test that a taken phone number is rejected on create and on update."""
+    assert create(db, 'a', name='Ravi', phone='98765 43210') is None
+    assert create(db, 'b', name='Suresh', phone='9876543210') == 'Customer with this phone number already exists'
+    assert create(db, 'b', name='Suresh', phone='9123456780') is None
+
+    assert update(db, 'b', phone='9876543210') == (True, 'Customer with this phone number already exists')
+    assert update(db, 'b', phone='9000000000') == (True, None)
+    assert key_owner(db, 'phone:9123456780') is None
+    assert key_owner(db, 'phone:9000000000') == 'b'
+    assert update(db, 'missing', phone='1') == (False, None)
+
+def test_legacy_duplicate_can_update_unchanged_fields(db):
+    """Test that a customer sharing a key claimed by another can still edit other fields."""
+    assert create(db, 'a', name='Ravi', phone='9876543210') is None
+    # Migrated duplicate: same phone, the claim went to the older customer
+    db.collection('customers').document('b').set({'name': 'Ravi K', 'phone': '9876543210'})
+
+    assert update(db, 'b', address='12 Main Road') == (True, None)
+    assert db.collection('customers').document('b').get().to_dict()['address'] == '12 Main Road'
+    assert key_owner(db, 'phone:9876543210') == 'a'
+    assert key_owner(db, 'name:ravi k') == 'b'
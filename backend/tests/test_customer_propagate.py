@@ -0,0 +1,75 @@
+import pytest
+from services import db as db_service
+from services.db import ChunkedBatch
+from services.local_db import LocalDB, WriteBatch
+from services.data_versions import get_data_versions
+from routes import customers
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    local = LocalDB()
+    monkeypatch.setattr(db_service, '_db', local)
+    local.collection('customers').document('c1').set({'name': 'Ravi Kumar', 'phone': '9876543210', 'address': 'New Street'})
+    for ticket_index in range(3):
+        ticket_id = f't{ticket_index}'
+        local.collection('tickets').document(ticket_id).set({
+            'customerId': 'c1', 'customerName': 'Ravi', 'customerPhone': '9000000000', 'customerAddress': 'Old Street',
+            'pendingPrincipal': 1000
+        })
+        for payment_index in range(2):
+            local.collection('payments').document(f'{ticket_id}_p{payment_index}').set({
+                'ticketId': ticket_id, 'customerName': 'Ravi', 'interestPaid': 20
+            })
+    # Another customer's documents are left alone
+    local.collection('tickets').document('other').set({'customerId': 'c2', 'customerName': 'Suresh'})
+    return local
+
+def assert_propagated(db):
+    for doc in db.collection('tickets').stream():
+        ticket = doc.to_dict()
+        if doc.id == 'other':
+            assert ticket['customerName'] == 'Suresh'
+            continue
+        assert (ticket['customerName'], ticket['customerPhone'], ticket['customerAddress']) == ('Ravi Kumar', '9876543210', 'New Street')
+        assert ticket['pendingPrincipal'] == 1000
+    for doc in db.collection('payments').stream():
+        assert doc.to_dict()['customerName'] == 'Ravi Kumar'
+        assert doc.to_dict()['interestPaid'] == 20
+
+def run_job(db):
+    return customers.propagate_customer_profile({'customerId': 'c1'}, lambda **progress: None)
+
+def test_propagation_updates_cached_fields_and_is_idempotent(db):
+    """Test that a second run finds nothing to rewrite and does not bump the data versions."""
+    assert run_job(db) == {'customerId': 'c1', 'updatedTickets': 3, 'updatedPayments': 6}
+    assert_propagated(db)
+
+    versions = get_data_versions(db, 'tickets', 'payments')
+    assert run_job(db) == {'customerId': 'c1', 'updatedTickets': 0, 'updatedPayments': 0}
+    assert get_data_versions(db, 'tickets', 'payments') == versions
+    assert_propagated(db)
+
+def test_propagation_resumes_after_a_crash(db, monkeypatch):
+    """Test that re-running a job interrupted between batches finishes the remaining documents."""
+    monkeypatch.setattr(customers, 'ChunkedBatch', lambda db: ChunkedBatch(db, limit=2))
+    commits = []
+    original_commit = WriteBatch.commit
+    def crashing_commit(batch):
+        commits.append(len(batch._writes))
+        if len(commits) == 3:
+            raise RuntimeError('worker stopped')
+        return original_commit(batch)
+    monkeypatch.setattr(WriteBatch, 'commit', crashing_commit)
+    with pytest.raises(RuntimeError):
+        run_job(db)
+    monkeypatch.setattr(WriteBatch, 'commit', original_commit)
+
+    result = run_job(db)
+    assert 0 < result['updatedTickets'] + result['updatedPayments'] < 9
+    assert_propagated(db)
+
+def test_propagation_of_a_deleted_customer_does_nothing(db):
+    """Test that a job for a customer deleted meanwhile writes nothing."""
+    db.collection('customers').document('c1').delete()
+    assert run_job(db) == {'customerId': 'c1', 'updatedTickets': 0, 'updatedPayments': 0}
@@ -0,0 +1,14 @@
+from services.customer_search import build_search_tokens, query_tokens
+
+def test_search_tokens_cover_name_prefixes_phone_suffixes_and_id_proof():
+    """Test that the index tokens support typeahead on name, phone and ID proof."""
+    tokens = build_search_tokens({'name': 'Ramesh Kumar', 'phone': '98765-43210', 'idProofNumber': 'AB 1234'})
+    assert {'r', 'ram', 'ramesh', 'k', 'kumar'} <= set(tokens)
+    assert {'210', '43210', '9876543210'} <= set(tokens)
+    assert {'ab1', 'ab1234'} <= set(tokens)
+    assert '987' not in tokens
+
+def test_query_tokens_treat_spaced_digits_as_one_number():
+    """Test that query normalization matches the token normalization."""
+    assert query_tokens('  Ram  KU ') == ['ram', 'ku']
+    assert query_tokens('98765 43210') == ['9876543210']
@@ -0,0 +1,58 @@
+import pytest
+from services import db as db_service
+from services.local_db import LocalDB
+from services.customer_stats import customer_stats_meta_ref, rebuild_customer_stats
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    local = LocalDB()
+    monkeypatch.setattr(db_service, '_db', local)
+    return local
+
+def mark_migrated(db):
+    customer_stats_meta_ref(db).set({'migratedAt': '2025-01-01T00:00:00'})
+
+def stats(client, customer_id):
+    (customer,) = [c for c in client.get('/api/customers').json if c['id'] == customer_id]
+    return customer['totalTickets'], customer['activeTickets'], customer['totalOutstanding']
+
+def test_stats_follow_ticket_create_payment_and_close(client, db):
+    """Test the stored stats through creating, repaying and closing a ticket."""
+    mark_migrated(db)
+    customer_id = client.post('/api/customers', json={'name': 'Ravi', 'phone': '9876543210'}).json['id']
+    assert stats(client, customer_id) == (0, 0, 0)
+
+    response = client.post('/api/tickets', json={'customerId': customer_id, 'billNumber': '101', 'principal': 1000,
+                                                 'interestPercentage': 2, 'startDate': '2025-01-10'})
+    ticket_id = response.json['id']
+    assert stats(client, customer_id) == (1, 1, 1000)
+
+    client.post(f'/api/tickets/{ticket_id}/payments', json={'date': '2025-02-10', 'principalPaid': 1000})
+    assert stats(client, customer_id) == (1, 1, 0)
+
+    assert client.put(f'/api/tickets/{ticket_id}/close').status_code == 200
+    assert stats(client, customer_id) == (1, 0, 0)
+
+def test_ticket_edit_moves_outstanding(client, db):
+    """Test that changing an unpaid ticket's principal shifts the customer's outstanding."""
+    mark_migrated(db)
+    db.collection('customers').document('c1').set({'name': 'Ravi', 'totalTickets': 1, 'activeTickets': 1, 'totalOutstanding': 500})
+    db.collection('tickets').document('t1').set({'customerId': 'c1', 'status': 'Active', 'principal': 500,
+                                                 'pendingPrincipal': 500, 'totalInterestReceived': 0, 'interestReceivedMonths': 1})
+
+    assert client.put('/api/tickets/t1', json={'principal': 800}).status_code == 200
+    assert stats(client, 'c1') == (1, 1, 800)
+
+def test_stats_are_computed_until_the_migration_has_run(client, db):
+    """Test the fallback for legacy customers and the transactional rebuild."""
+    db.collection('customers').document('c1').set({'name': 'Ravi'})
+    db.collection('tickets').document('t1').set({'customerId': 'c1', 'status': 'Active', 'pendingPrincipal': 700})
+    db.collection('tickets').document('t2').set({'customerId': 'c1', 'status': 'Closed', 'pendingPrincipal': 0})
+    assert stats(client, 'c1') == (2, 1, 700)
+
+    mark_migrated(db)
+    assert stats(client, 'c1') == (0, 0, 0)
+    assert db.run_transaction(rebuild_customer_stats, db, 'c1') == {'totalTickets': 2, 'activeTickets': 1, 'totalOutstanding': 700}
+    assert stats(client, 'c1') == (2, 1, 700)
+    assert db.run_transaction(rebuild_customer_stats, db, 'missing') is None
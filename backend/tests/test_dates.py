@@ -0,0 +1,14 @@
+from datetime import datetime, timezone
+from services.dates import parse_date, format_date
+
+def test_parse_date_handles_plain_and_iso_dates():
+    """Test that both stored date formats parse to the same values as before."""
+    assert parse_date('2025-01-05') == datetime(2025, 1, 5)
+    assert parse_date('2025-01-05T10:30:00') == datetime(2025, 1, 5, 10, 30)
+    assert parse_date('2025-01-05T10:30:00.000Z') == datetime(2025, 1, 5, 10, 30, tzinfo=timezone.utc)
+
+def test_format_date_passes_unparseable_values_through():
+    """Test that bad dates are written as-is instead of failing an export."""
+    assert format_date('2025-01-05T10:30:00Z', '%Y-%m-%d') == '2025-01-05'
+    assert format_date('not a date', '%Y-%m-%d') == 'not a date'
+    assert format_date(None, '%Y-%m-%d') == ''
@@ -0,0 +1,13 @@
+from services.local_db import _apply_update, Increment
+
+def test_update_mixes_dotted_and_plain_keys():
+    """Test that keys after a dotted field path are written at the top level."""
+    doc = {'lastAlerted': {'email': 'e'}, 'count': 1}
+    _apply_update(doc, {'lastAlerted.sms': 'x', 'name': 'N', 'count': Increment(2)}, field_paths=True)
+    assert doc == {'lastAlerted': {'email': 'e', 'sms': 'x'}, 'name': 'N', 'count': 3}
+
+def test_set_keeps_dotted_keys_literal():
+    """Test that without field paths a dotted key is an ordinary field name."""
+    doc = {}
+    _apply_update(doc, {'a.b': 1})
+    assert doc == {'a.b': 1}
@@ -0,0 +1,56 @@
+import threading
+import pytest
+from services import login_limits
+from services.login_limits import (
+    run_hashing, PasswordHashBusy, start_login_attempt, cancel_login_attempt, clear_login_attempts
+)
+
+def test_attempts_block_only_that_username_and_address_until_cleared():
+    """Test that LOGIN_FAILURE_LIMIT attempts block one (username, address) key."""
+    key = ('mallory', '10.0.0.1')
+    for _ in range(login_limits.LOGIN_FAILURE_LIMIT):
+        assert start_login_attempt(key) == 0
+    assert 0 < start_login_attempt(key) <= login_limits.LOGIN_FAILURE_WINDOW
+    assert start_login_attempt(('mallory', '10.0.0.2')) == 0
+    assert start_login_attempt(('alice', '10.0.0.1')) == 0
+
+    clear_login_attempts(key)
+    assert start_login_attempt(key) == 0
+    clear_login_attempts(key)
+
+def test_cancelled_attempt_is_not_counted():
+    """Test that cancelling the latest attempt gives it back."""
+    key = ('bob', '10.0.0.3')
+    for _ in range(login_limits.LOGIN_FAILURE_LIMIT):
+        start_login_attempt(key)
+    cancel_login_attempt(key)
+    assert start_login_attempt(key) == 0
+    assert start_login_attempt(key) > 0
+    clear_login_attempts(key)
+
+def test_concurrent_attempts_are_counted_before_hashing():
+    """Test that a concurrent burst lets through only LOGIN_FAILURE_LIMIT attempts."""
+    key = ('carol', '10.0.0.4')
+    barrier = threading.Barrier(20)
+    allowed = []
+
+    def attempt():
+        barrier.wait()
+        allowed.append(start_login_attempt(key) == 0)
+
+    threads = [threading.Thread(target=attempt) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert allowed.count(True) == login_limits.LOGIN_FAILURE_LIMIT
+    clear_login_attempts(key)
+
+def test_run_hashing_rejects_when_the_queue_is_full(monkeypatch):
+    """Test that hashing runs on the pool and is rejected without a free slot."""
+    assert run_hashing(lambda a, b: a + b, 2, 3) == 5
+
+    monkeypatch.setattr(login_limits, '_slots', threading.BoundedSemaphore(1))
+    login_limits._slots.acquire()
+    with pytest.raises(PasswordHashBusy):
+        run_hashing(lambda: None)
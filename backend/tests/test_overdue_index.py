@@ -0,0 +1,46 @@
+import pytest
+from services import db as db_service
+from services.local_db import LocalDB
+from services.overdue_index import sweep_overdue_index, OVERDUE_COLLECTION
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return LocalDB()
+
+def test_sweep_skips_tickets_without_a_customer(db):
+    """Test that overdue tickets without a customerId do not create index entries."""
+    ticket = {'status': 'Active', 'itemType': 'Gold', 'startDate': '2020-01-01', 'customerName': 'Ravi'}
+    db.collection('tickets').document('t1').set({**ticket, 'customerId': 'c1'})
+    db.collection('tickets').document('t2').set(ticket)
+    db.collection(OVERDUE_COLLECTION).document('stale-random-id').set({'customerId': None})
+
+    stats = sweep_overdue_index(db)
+
+    assert [doc.id for doc in db.collection(OVERDUE_COLLECTION).stream()] == ['c1']
+    assert stats['customers'] == 1
+    assert stats['skippedWithoutCustomer'] == 1
+    assert stats['removed'] == 1
+
+def test_nightly_run_refuses_reminders_without_scheduler_token(client, db, monkeypatch):
+    """Test that without SCHEDULER_TOKEN the nightly run rebuilds the index but queues no reminders."""
+    monkeypatch.setattr(db_service, '_db', db)
+    monkeypatch.delenv('SCHEDULER_TOKEN', raising=False)
+    db.collection('tickets').document('t1').set({
+        'status': 'Active', 'itemType': 'Gold', 'startDate': '2020-01-01', 'customerName': 'Ravi', 'customerId': 'c1'
+    })
+
+    response = client.post('/api/alerts/overdue-interests/nightly', json={'sendReminders': True})
+    assert response.status_code == 403
+    assert list(db.collection('alert_queue').stream()) == []
+    assert list(db.collection(OVERDUE_COLLECTION).stream()) == []
+
+    response = client.post('/api/alerts/overdue-interests/nightly', json={})
+    assert response.status_code == 200
+    assert response.json['sweep']['customers'] == 1
+
+    monkeypatch.setenv('SCHEDULER_TOKEN', 'secret')
+    response = client.post('/api/alerts/overdue-interests/nightly', json={'sendReminders': True})
+    assert response.status_code == 401
+    response = client.post('/api/alerts/overdue-interests/nightly', json={}, headers={'X-Scheduler-Token': 'secret'})
+    assert response.status_code == 200
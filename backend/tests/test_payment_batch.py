@@ -0,0 +1,105 @@
+import pytest
+from services import db as db_service
+from services.local_db import LocalDB, WriteBatch
+from services.data_versions import get_data_versions
+from services.rollups import monthly_rollup_ref
+from routes.payments_api import _parse_batch_item, MAX_BATCH_PAYMENTS, VERSIONED_COLLECTIONS
+
+def test_batch_item_date_is_trimmed_to_the_day():
+    """Test that a timestamp date keeps only its date part."""
+    parsed, error = _parse_batch_item({'ticketId': 't1', 'date': '2024-03-05T10:00:00', 'interestPaid': '120'})
+    assert error is None
+    assert parsed['date'] == '2024-03-05'
+    assert parsed['interestPaid'] == 120.0
+
+def test_batch_item_rejects_non_string_fields():
+    """Test that non-string dates and ticket ids are item errors, not exceptions."""
+    parsed, error = _parse_batch_item({'ticketId': 't1', 'date': 20240305})
+    assert parsed is None and 'date' in error
+
+    parsed, error = _parse_batch_item({'ticketId': 42, 'date': '2024-03-05'})
+    assert parsed is None and 'ticketId' in error
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    local = LocalDB()
+    monkeypatch.setattr(db_service, '_db', local)
+    for suffix in ('1', '2'):
+        local.collection('customers').document(f'c{suffix}').set({
+            'name': 'Ravi', 'totalTickets': 1, 'activeTickets': 1, 'totalOutstanding': 5000
+        })
+        local.collection('tickets').document(f't{suffix}').set({
+            'customerId': f'c{suffix}', 'customerName': 'Ravi', 'status': 'Active', 'principal': 5000,
+            'pendingPrincipal': 5000, 'totalInterestReceived': 100, 'interestReceivedMonths': 1
+        })
+    return local
+
+PAYMENTS = [
+    {'date': '2025-02-10', 'interestPaid': 100, 'principalPaid': 0, 'monthsPaid': 1},
+    {'date': '2025-03-10', 'interestPaid': 100, 'principalPaid': 1000, 'monthsPaid': 1},
+    {'date': '2025-03-28', 'interestPaid': 80, 'principalPaid': 500, 'monthsPaid': 1},
+]
+TOTAL_FIELDS = ('pendingPrincipal', 'totalInterestReceived', 'interestReceivedMonths')
+STAT_FIELDS = ('totalTickets', 'activeTickets', 'totalOutstanding')
+
+def rollups(db):
+    totals = {}
+    for month in ('2025-02', '2025-03'):
+        rollup = monthly_rollup_ref(db, month).get().to_dict() or {}
+        totals[month] = (rollup.get('interest', 0), rollup.get('principal', 0), rollup.get('count', 0))
+    return totals
+
+def rollup_change(before, after):
+    return {month: tuple(b - a for a, b in zip(before[month], after[month])) for month in before}
+
+def test_batch_combines_a_tickets_payments_into_one_update(client, db, monkeypatch):
+    """Test that several payments on one ticket produce a single ticket update."""
+    ticket_updates = []
+    original_update = WriteBatch.update
+    def recording_update(batch, ref, data):
+        if ref.collection_name == 'tickets':
+            ticket_updates.append(ref.id)
+        return original_update(batch, ref, data)
+    monkeypatch.setattr(WriteBatch, 'update', recording_update)
+
+    response = client.post('/api/payments/batch', json={'payments': [{'ticketId': 't1', **p} for p in PAYMENTS]})
+    assert response.json['recorded'] == 3
+    assert ticket_updates == ['t1']
+    assert [r['remainingPrincipal'] for r in response.json['results']] == [5000, 4000, 3500]
+    assert response.json['newPendingPrincipals'] == {'t1': 3500}
+
+def test_batch_reports_item_errors_next_to_recorded_items(client, db):
+    """Test that invalid items fail individually without failing the batch."""
+    response = client.post('/api/payments/batch', json={'payments': [
+        {'ticketId': 't1', **PAYMENTS[0]}, {'ticketId': 'missing', **PAYMENTS[1]}, {'ticketId': 't1'}, 'bad'
+    ]})
+    assert response.status_code == 200
+    assert [r['status'] for r in response.json['results']] == ['recorded', 'error', 'error', 'error']
+    assert response.json['results'][1]['error'] == 'Ticket not found'
+    assert (response.json['recorded'], response.json['failed']) == (1, 3)
+
+def test_batch_rejects_more_than_the_maximum(client, db):
+    """Test that an oversized batch is rejected as a whole."""
+    items = [{'ticketId': 't1', **PAYMENTS[0]}] * (MAX_BATCH_PAYMENTS + 1)
+    assert client.post('/api/payments/batch', json={'payments': items}).status_code == 400
+    assert client.post('/api/payments/batch', json={'payments': []}).status_code == 400
+
+def test_batch_matches_the_single_payment_path(client, db):
+    """Test that the batch leaves totals, stats, rollups and versions as one-by-one payments do."""
+    versions = get_data_versions(db, *VERSIONED_COLLECTIONS)
+    before = rollups(db)
+    for payment in PAYMENTS:
+        assert client.post('/api/tickets/t1/payments', json=payment).status_code == 200
+    single = rollups(db)
+    single_versions = get_data_versions(db, *VERSIONED_COLLECTIONS)
+
+    client.post('/api/payments/batch', json={'payments': [{'ticketId': 't2', **p} for p in PAYMENTS]})
+
+    tickets = [db.collection('tickets').document(t).get().to_dict() for t in ('t1', 't2')]
+    customers = [db.collection('customers').document(c).get().to_dict() for c in ('c1', 'c2')]
+    assert [tickets[0][f] for f in TOTAL_FIELDS] == [tickets[1][f] for f in TOTAL_FIELDS] == [3500, 380, 4]
+    assert [customers[0][f] for f in STAT_FIELDS] == [customers[1][f] for f in STAT_FIELDS]
+    assert rollup_change(before, single) == rollup_change(single, rollups(db))
+    assert all(after > prior for prior, after in zip(versions, single_versions))
+    assert all(after > prior for prior, after in zip(single_versions, get_data_versions(db, *VERSIONED_COLLECTIONS)))
@@ -0,0 +1,74 @@
+import csv
+from io import StringIO
+import pytest
+from dateutil import parser
+from services import db as db_service
+from services.local_db import LocalDB
+
+# Stored dates in every format the app has written; several of them are out of
+# order when compared as strings (a space separator, a trailing Z, an offset)
+TICKETS = [
+    ('t1', 'B-1', '2025-03-10T10:00:00Z', 5000),
+    ('t2', 'B-2', '2025-03-09 18:00:00', 3000),
+    ('t3', 'B-3', '2025-03-09T08:00:00.250000', 2000),
+    ('t4', 'B-4', '2025-02-28', 1000),
+]
+PAYMENTS = [
+    ('p1', 't1', '2025-03-10T10:00:00.500000', 100, 0),
+    ('p2', 't2', '2025-03-10T09:59:59+05:30', 50, 500),
+    ('p3', 't3', '2025-03-10', 20, 0),
+    ('p4', 't2', '2025-03-09T12:00:00', 30, 0),
+    ('p5', 't4', '2025-03-01T00:00:01Z', 10, 0),
+]
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    local = LocalDB()
+    monkeypatch.setattr(db_service, '_db', local)
+    for ticket_id, bill_number, start_date, principal in TICKETS:
+        local.collection('tickets').document(ticket_id).set({
+            'billNumber': bill_number, 'name': f'Customer {ticket_id}', 'customerName': f'Customer {ticket_id}',
+            'startDate': start_date, 'principal': principal
+        })
+    for payment_id, ticket_id, date, interest, principal in PAYMENTS:
+        local.collection('payments').document(payment_id).set({
+            'ticketId': ticket_id, 'customerName': f'Customer {ticket_id}',
+            'date': date, 'interestPaid': interest, 'principalPaid': principal
+        })
+    return local
+
+def buffered_report(db):
+    """The payment report as built before streaming: every row loaded, then sorted by parsed date."""
+    transactions = []
+    for doc in db.collection('tickets').stream():
+        ticket = doc.to_dict()
+        transactions.append((ticket['startDate'], ticket['billNumber'], ticket['name'], 'Invested', 0, ticket['principal']))
+    for doc in db.collection('payments').stream():
+        payment = doc.to_dict()
+        bill_number = db.collection('tickets').document(payment['ticketId']).get().to_dict()['billNumber']
+        transactions.append((payment['date'], bill_number, payment['customerName'], 'Received',
+                             payment['interestPaid'], payment['principalPaid']))
+    transactions.sort(key=lambda t: parser.isoparse(t[0]).replace(tzinfo=None), reverse=True)
+    return [
+        [parser.isoparse(date).strftime('%Y-%m-%d %H:%M:%S'), bill_number, name, kind, f'{interest:.2f}', f'{principal:.2f}']
+        for date, bill_number, name, kind, interest, principal in transactions
+    ]
+
+def test_streamed_report_matches_buffered_order(client, db):
+    """Test that the streamed CSV lists rows in the same parsed date order as the buffered export."""
+    response = client.get('/api/reports/export/payment-report?filterType=all')
+    assert response.status_code == 200
+    rows = list(csv.reader(StringIO(response.get_data(as_text=True))))
+    count = len(TICKETS) + len(PAYMENTS)
+    assert rows[1:1 + count] == buffered_report(db)
+    assert rows[-1] == ['Number of Transactions', '', str(count), '', '']
+    assert rows[-4] == ['Total Principal Invested', '', '', '', '11000.00']
+
+def test_month_report_keeps_parsed_order(client, db):
+    """Test the month filter: only March rows, still in parsed date order."""
+    response = client.get('/api/reports/export/payment-report?filterType=month&month=2025-03')
+    rows = list(csv.reader(StringIO(response.get_data(as_text=True))))
+    dates = [row[0] for row in rows[1:9]]
+    assert dates == sorted(dates, reverse=True)
+    assert [row[1] for row in rows[1:9]] == ['B-1', 'B-1', 'B-2', 'B-3', 'B-2', 'B-2', 'B-3', 'B-4']
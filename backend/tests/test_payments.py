@@ -0,0 +1,78 @@
+import pytest
+from services import db as db_service
+from services.local_db import LocalDB
+from services.data_versions import get_data_versions
+from services.rollups import monthly_rollup_ref
+
+VERSIONED = ('tickets', 'payments', 'customers')
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    local = LocalDB()
+    monkeypatch.setattr(db_service, '_db', local)
+    local.collection('customers').document('c1').set({'name': 'Ravi', 'activeTickets': 1, 'totalOutstanding': 10000})
+    local.collection('tickets').document('t1').set({
+        'customerId': 'c1', 'status': 'Active', 'principal': 10000, 'pendingPrincipal': 10000,
+        'totalInterestReceived': 0, 'interestReceivedMonths': 0
+    })
+    return local
+
+def ticket(db):
+    return db.collection('tickets').document('t1').get().to_dict()
+
+def rollup(db, month):
+    doc = monthly_rollup_ref(db, month).get()
+    data = doc.to_dict() if doc.exists else {}
+    return data.get('interest', 0), data.get('principal', 0), data.get('count', 0)
+
+def add_payment(client, **payment):
+    response = client.post('/api/tickets/t1/payments', json=payment)
+    assert response.status_code == 200
+    return response.json
+
+def only_payment_id(db):
+    (doc,) = list(db.collection('payments').stream())
+    return doc.id
+
+def test_add_payment_updates_totals_rollups_and_versions(client, db):
+    """Test that a new payment moves the ticket and customer totals by its amounts."""
+    before = get_data_versions(db, *VERSIONED)
+    result = add_payment(client, date='2025-02-10', interestPaid=200, principalPaid=1000, monthsPaid=1)
+
+    assert result['newPendingPrincipal'] == 9000
+    data = ticket(db)
+    assert (data['pendingPrincipal'], data['totalInterestReceived'], data['interestReceivedMonths']) == (9000, 200, 1)
+    assert db.collection('customers').document('c1').get().to_dict()['totalOutstanding'] == 9000
+    assert rollup(db, '2025-02') == (200, 1000, 1)
+    assert get_data_versions(db, *VERSIONED) == tuple(version + 1 for version in before)
+
+def test_edit_payment_shifts_totals_and_rollups_by_the_difference(client, db):
+    """Test that editing amounts and moving the date to another month keeps every total in step."""
+    add_payment(client, date='2025-02-10', interestPaid=200, principalPaid=1000, monthsPaid=1)
+    before = get_data_versions(db, *VERSIONED)
+
+    response = client.put(f'/api/payments/{only_payment_id(db)}',
+                          json={'date': '2025-03-05', 'interestPaid': 300, 'principalPaid': 500, 'monthsPaid': 2})
+    assert response.status_code == 200
+
+    data = ticket(db)
+    assert (data['pendingPrincipal'], data['totalInterestReceived'], data['interestReceivedMonths']) == (9500, 300, 2)
+    assert db.collection('customers').document('c1').get().to_dict()['totalOutstanding'] == 9500
+    assert rollup(db, '2025-02') == (0, 0, 0)
+    assert rollup(db, '2025-03') == (300, 500, 1)
+    assert get_data_versions(db, *VERSIONED) == tuple(version + 1 for version in before)
+
+def test_delete_payment_removes_its_amounts(client, db):
+    """Test that deleting a payment restores the ticket, customer and rollup totals."""
+    add_payment(client, date='2025-02-10', interestPaid=200, principalPaid=1000, monthsPaid=1)
+    before = get_data_versions(db, *VERSIONED)
+
+    assert client.delete(f'/api/payments/{only_payment_id(db)}').status_code == 200
+
+    data = ticket(db)
+    assert (data['pendingPrincipal'], data['totalInterestReceived'], data['interestReceivedMonths']) == (10000, 0, 0)
+    assert db.collection('customers').document('c1').get().to_dict()['totalOutstanding'] == 10000
+    assert rollup(db, '2025-02') == (0, 0, 0)
+    assert get_data_versions(db, *VERSIONED) == tuple(version + 1 for version in before)
+    assert client.delete('/api/payments/missing').status_code == 404
@@ -0,0 +1,105 @@
+from datetime import date, datetime, timedelta
+import pytest
+from routes.tickets import calculate_completed_months
+from services import db as db_service, portfolio
+from services.local_db import LocalDB
+from services.portfolio import completed_months_array, aging_report, interest_forecast
+from routes import reports
+
+np = pytest.importorskip('numpy')
+
+def test_vectorized_months_match_calculate_completed_months():
+    """Test that the array version follows the half/full month rules of the scalar one."""
+    end = date(2025, 3, 14)
+    starts = [date(2023, 1, 1) + timedelta(days=offset) for offset in range(0, 900, 3)]
+    expected = [calculate_completed_months(datetime.combine(start, datetime.min.time()), datetime(2025, 3, 14)) for start in starts]
+    actual = completed_months_array(np, np.array(starts, dtype='datetime64[D]'), end)
+    assert actual.tolist() == expected
+
+def test_aging_report_buckets_pending_interest_months_by_item_type():
+    """Test that tickets land in buckets by months of interest pending."""
+    columns = {
+        'startDate': np.array(['2024-12-01', '2024-06-01', '2023-01-01'], dtype='datetime64[D]'),
+        'pendingPrincipal': np.array([1000.0, 2000.0, 500.0]),
+        'interestPercentage': np.array([2.0, 1.0, 2.0]),
+        'interestReceivedMonths': np.array([1.0, 1.0, 0.0]),
+        'itemType': np.array([0, 1, 0], dtype=np.int32),
+        'itemTypeNames': ['Gold', 'Silver']
+    }
+    report = aging_report(columns, date(2025, 3, 1))
+    assert report['byItemType']['Gold']['0-3'] == {'ticketCount': 1, 'outstandingPrincipal': 1000.0, 'interestDue': 40.0}
+    assert report['byItemType']['Silver']['6-12']['ticketCount'] == 1
+    assert report['byItemType']['Gold']['12+']['outstandingPrincipal'] == 500.0
+    assert report['portfolio']['ticketCount'] == 3
+
+# Hand-computed tickets for the forecast as of 2025-03-10: (ticket, months accrued at
+# 2025-03-10, 03-31, 04-30 and 05-31). The first one starts at a month end, so it only
+# completes a month on the last day of a 31-day month. Next interest due dates:
+# 2025-03-31, 2025-04-05 (03-05 has passed) and 2025-03-20 (three months received).
+FORECAST_TICKETS = [
+    ({'startDate': '2025-01-31', 'pendingPrincipal': 1000, 'interestPercentage': 2, 'interestReceivedMonths': 0, 'itemType': 'Gold'},
+     [1.5, 2.0, 3.0, 4.0]),
+    ({'startDate': '2025-03-05', 'pendingPrincipal': 2000, 'interestPercentage': 1, 'interestReceivedMonths': 0, 'itemType': 'Silver'},
+     [0.5, 1.0, 2.0, 3.0]),
+    ({'startDate': '2024-12-20', 'pendingPrincipal': 500, 'interestPercentage': 3, 'interestReceivedMonths': 3, 'itemType': 'Gold'},
+     [2.5, 3.5, 4.5, 5.5]),
+]
+FORECAST_DATES = [date(2025, 3, 10), date(2025, 3, 31), date(2025, 4, 30), date(2025, 5, 31)]
+
+def test_vectorized_months_match_hand_computed_tickets():
+    """Test the month counts behind the forecast, including a ticket started at month end."""
+    starts = np.array([ticket['startDate'] for ticket, _ in FORECAST_TICKETS], dtype='datetime64[D]')
+    for index, end in enumerate(FORECAST_DATES):
+        assert completed_months_array(np, starts, end).tolist() == [months[index] for _, months in FORECAST_TICKETS]
+
+def test_interest_forecast_endpoint(client, tmp_path, monkeypatch):
+    """Test the forecast endpoint against the hand-computed tickets."""
+    monkeypatch.chdir(tmp_path)
+    local = LocalDB()
+    monkeypatch.setattr(db_service, '_db', local)
+    monkeypatch.setattr(portfolio, '_cached', {'versions': None, 'columns': None, 'aging_key': None, 'aging': None})
+    for index, (ticket, _) in enumerate(FORECAST_TICKETS):
+        local.collection('tickets').document(f't{index}').set({**ticket, 'status': 'Active'})
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2025, 3, 10, 9, 0)
+    monkeypatch.setattr(reports, 'datetime', FrozenDatetime)
+
+    response = client.get('/api/reports/forecast?months=3')
+    assert response.status_code == 200
+    report = response.json
+    # 20/month, 20/month and 15/month; arrears exclude the third ticket's paid months
+    assert report['arrears'] == {'interest': 40.0, 'byItemType': {'Gold': 30.0, 'Silver': 10.0}}
+    assert [(month['month'], month['expectedInterest']) for month in report['forecast']] == [
+        ('2025-03', 35.0), ('2025-04', 55.0), ('2025-05', 55.0)
+    ]
+    assert report['forecast'][0]['byItemType'] == {'Gold': 35.0, 'Silver': 0.0}
+    assert report['forecast'][1]['byItemType'] == {'Gold': 35.0, 'Silver': 20.0}
+    assert report['totalExpectedInterest'] == 145.0
+
+    assert client.get('/api/reports/forecast?months=0').status_code == 400
+
+def single_ticket(start_date, received_months):
+    return {
+        'startDate': np.array([start_date], dtype='datetime64[D]'),
+        'pendingPrincipal': np.array([1000.0]),
+        'interestPercentage': np.array([2.0]),
+        'interestReceivedMonths': np.array([float(received_months)]),
+        'itemType': np.array([0], dtype=np.int32),
+        'itemTypeNames': ['Gold']
+    }
+
+def forecast_values(columns, as_of):
+    return [month['expectedInterest'] for month in interest_forecast(columns, as_of, 3)['forecast']]
+
+def test_forecast_places_one_month_of_interest_on_each_due_date():
+    """Test a single ticket's forecast month by month: one month of interest per due date."""
+    # Started on 31 Jan with the first month paid: due 28 Feb, 31 Mar, 30 Apr
+    columns = single_ticket('2025-01-31', 1)
+    assert forecast_values(columns, date(2025, 2, 10)) == [20.0, 20.0, 20.0]
+    # On the due day itself the month's payment is no longer in the future
+    assert forecast_values(columns, date(2025, 2, 28)) == [0.0, 20.0, 20.0]
+    # Months paid in advance push the next due date out (31 Mar -> 30 Apr)
+    assert forecast_values(single_ticket('2025-01-31', 3), date(2025, 2, 10)) == [0.0, 0.0, 20.0]
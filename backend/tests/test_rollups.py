@@ -0,0 +1,72 @@
+import pytest
+from services import db as db_service
+from services.local_db import LocalDB
+from services.rollups import (
+    apply_monthly_rollups, monthly_rollup_ref, rollups_meta_ref, rebuild_monthly_rollup, next_month_key
+)
+
+MONTHS = ('2025-01', '2025-02', '2025-03')
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    local = LocalDB()
+    monkeypatch.setattr(db_service, '_db', local)
+    return local
+
+def stored_rollup(db, month):
+    rollup = monthly_rollup_ref(db, month).get().to_dict() or {}
+    return rollup.get('interest', 0), rollup.get('principal', 0), rollup.get('count', 0)
+
+def test_next_month_key_rolls_over_the_year():
+    """Test that December is followed by January of the next year."""
+    assert next_month_key('2024-12') == '2025-01'
+    assert next_month_key('2025-09') == '2025-10'
+
+def test_incremental_rollups_match_a_rebuild(db):
+    """Test that create, edit (across months) and delete deltas equal a rebuild from the payments."""
+    payments = {
+        'p1': {'date': '2025-01-05', 'interestPaid': 100, 'principalPaid': 0},
+        'p2': {'date': '2025-01-20T10:00:00', 'interestPaid': 50, 'principalPaid': 500},
+        'p3': {'date': '2025-02-01', 'interestPaid': 70, 'principalPaid': 0},
+    }
+    batch = db.batch()
+    for payment_id, payment in payments.items():
+        batch.set(db.collection('payments').document(payment_id), payment)
+        apply_monthly_rollups(batch, db, None, payment)
+    batch.commit()
+
+    batch = db.batch()
+    # p2 moves to March with new amounts, p3 is deleted
+    edited = {**payments['p2'], 'date': '2025-03-02', 'interestPaid': 80}
+    batch.set(db.collection('payments').document('p2'), edited)
+    apply_monthly_rollups(batch, db, payments['p2'], edited)
+    batch.delete(db.collection('payments').document('p3'))
+    apply_monthly_rollups(batch, db, payments['p3'], None)
+    batch.commit()
+
+    incremental = {month: stored_rollup(db, month) for month in MONTHS}
+    assert incremental == {'2025-01': (100, 0, 1), '2025-02': (0, 0, 0), '2025-03': (80, 500, 1)}
+    for month in MONTHS:
+        rebuilt = db.run_transaction(rebuild_monthly_rollup, db, month)
+        assert (rebuilt['interest'], rebuilt['principal'], rebuilt['count']) == incremental[month]
+
+def test_rollup_report_matches_the_full_scan(client, db):
+    """Test that the monthly report gives the same totals from the rollups as from the payments."""
+    customer_id = client.post('/api/customers', json={'name': 'Ravi', 'phone': '9876543210'}).json['id']
+    ticket_id = client.post('/api/tickets', json={'customerId': customer_id, 'billNumber': '7', 'principal': 1000,
+                                                  'interestPercentage': 2, 'startDate': '2025-01-10'}).json['id']
+    for date, principal in (('2025-02-10', 100), ('2025-02-25', 0), ('2025-03-10', 200)):
+        client.post(f'/api/tickets/{ticket_id}/payments', json={'date': date, 'interestPaid': 20, 'monthsPaid': 1,
+                                                                  'principalPaid': principal})
+    (march,) = [doc.id for doc in db.collection('payments').where('date', '==', '2025-03-10').stream()]
+    client.put(f'/api/payments/{march}', json={'date': '2025-02-28', 'interestPaid': 35})
+
+    def report(month):
+        data = client.get(f'/api/reports/monthly-interest?month={month}').json
+        return data['totalInterest'], data['totalPrincipal'], data['paymentCount']
+
+    scanned = {month: report(month) for month in MONTHS}
+    rollups_meta_ref(db).set({'rebuiltAt': '2025-03-31T00:00:00'})
+    assert {month: report(month) for month in MONTHS} == scanned
+    assert scanned['2025-02'] == (75, 300, 3)
@@ -0,0 +1,19 @@
+from datetime import datetime
+from services.sessions import session_data, session_expired
+
+def test_session_data_copies_the_user_profile():
+    """Test that a session holds the user id, profile, role and expiry but no password."""
+    user = {'username': 'admin', 'name': 'Admin', 'email': 'a@b.c', 'password_hash': 'x$y'}
+    session = session_data('u1', user, datetime(2026, 2, 1), now=datetime(2026, 1, 1))
+    assert session == {
+        'userId': 'u1', 'username': 'admin', 'name': 'Admin', 'email': 'a@b.c', 'role': 'user',
+        'createdAt': '2026-01-01T00:00:00', 'expiresAt': '2026-02-01T00:00:00'
+    }
+
+def test_sessions_past_their_expiry_are_expired():
+    """Test that sessions at or past expiresAt, or without a valid one, count as expired."""
+    now = datetime(2026, 1, 15)
+    assert not session_expired({'expiresAt': '2026-02-01T00:00:00'}, now)
+    assert session_expired({'expiresAt': '2026-01-01T00:00:00'}, now)
+    assert session_expired({'expiresAt': 'soon'}, now)
+    assert session_expired({}, now)
@@ -0,0 +1,26 @@
+from datetime import date
+import pytest
+from services.timeseries import payment_timeseries
+
+np = pytest.importorskip('numpy')
+
+def _columns():
+    return {
+        'dates': np.array(['2025-01-05', '2025-01-31', '2025-02-03', '2025-03-10'], dtype='datetime64[D]'),
+        'interest': np.array([10.0, 20.0, 30.0, 40.0]),
+        'principal': np.array([0.0, 100.0, 0.0, 50.0]),
+        'itemType': np.array([0, 1, 0, 0], dtype=np.int32),
+        'itemTypeCodes': {'gold': 0, 'silver': 1}
+    }
+
+def test_monthly_buckets_include_empty_months_and_respect_the_window():
+    """Test that every month in the window gets a bucket and out-of-window payments are dropped."""
+    series = payment_timeseries(_columns(), 'month', date(2025, 1, 1), date(2025, 2, 28))
+    assert [b['period'] for b in series['buckets']] == ['2025-01', '2025-02']
+    assert [b['interest'] for b in series['buckets']] == [30.0, 30.0]
+    assert series['totals'] == {'interest': 60.0, 'principal': 100.0, 'count': 3}
+
+def test_weekly_buckets_start_on_monday_and_filter_item_type():
+    """Test that weeks are labelled by their Monday and itemType matches case-insensitively."""
+    series = payment_timeseries(_columns(), 'week', date(2025, 1, 27), date(2025, 2, 9), 'GOLD')
+    assert [(b['period'], b['count']) for b in series['buckets']] == [('2025-01-27', 0), ('2025-02-03', 1)]
@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+from services import token_cache
+from services.token_cache import cache_token, cached_token, token_key, clear_token_cache
+
+def user(expiry=None, **fields):
+    return {'username': 'admin', 'name': 'Admin', 'email': '', 'role': 'admin',
+            'expiresAt': (expiry or datetime.now() + timedelta(days=1)).isoformat(), **fields}
+
+def test_token_key_is_a_sha256_digest():
+    """Test that tokens are keyed by their hash, not the token itself."""
+    assert len(token_key('abc')) == 64
+    assert token_key('abc') != 'abc'
+
+def test_cached_token_returns_the_entry():
+    """Test that a cached token returns the user id, role and active flag."""
+    clear_token_cache()
+    cache_token('t1', 'u1', user(isActive=False))
+    entry = cached_token('t1')
+    assert entry['userId'] == 'u1'
+    assert entry['role'] == 'admin'
+    assert entry['isActive'] is False
+    assert cached_token('unknown') is None
+
+def test_expired_tokens_and_stale_entries_are_dropped(monkeypatch):
+    """Test that expired tokens and entries older than the TTL are not served."""
+    clear_token_cache()
+    cache_token('expired', 'u1', user(expiry=datetime.now() - timedelta(seconds=1)))
+    assert cached_token('expired') is None
+
+    monkeypatch.setattr(token_cache, 'TOKEN_CACHE_TTL', 0)
+    cache_token('stale', 'u1', user())
+    assert cached_token('stale') is None
+
+def test_least_recently_used_entries_are_evicted(monkeypatch):
+    """Test that the cache keeps at most TOKEN_CACHE_SIZE entries."""
+    clear_token_cache()
+    monkeypatch.setattr(token_cache, 'TOKEN_CACHE_SIZE', 2)
+    cache_token('a', 'u1', user())
+    cache_token('b', 'u2', user())
+    cached_token('a')
+    cache_token('c', 'u3', user())
+    assert cached_token('b') is None
+    assert cached_token('a') and cached_token('c')